@@ -5,18 +5,26 @@ from django.urls import path
 from django.shortcuts import render, redirect
 from django.db import transaction
 
-from .models import AttendanceDay
+from .models import AttendanceDay, PunchDay, RawPunch
 from employees.models import Employee
 from org.models import Department
 from core.jalali import jalali_month_range, jalali_day_to_gregorian, format_gregorian_to_jalali_with_day
 from django.http import HttpResponse
+from datetime import timedelta
+import jdatetime
+from .forms import ShiftPatternForm
+from .services import copy_shift_pattern
+from core.calendar import month_calendar
 from .exports import build_attendance_xlsx
+from .imports import import_attendance
 from employees.models import Employee
 from jalali_date.admin import ModelAdminJalaliMixin
-from core.admin import JalaliDateAdminMixin
+from core.admin import JalaliDateAdminMixin, MonthImportAdminMixin, RollupStaleAdminMixin
+from core.rollups import mark_stale
+from core import metrics
 
 @admin.register(AttendanceDay)
-class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.ModelAdmin):
+class AttendanceDayAdmin(RollupStaleAdminMixin, MonthImportAdminMixin, ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.ModelAdmin):
     list_display = ("jalali_date", "employee", "status", "note")
     def jalali_date(self, obj):
         return format_gregorian_to_jalali_with_day(obj.date)
@@ -26,12 +34,15 @@ class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
     search_fields = ("employee__first_name", "employee__father_name", "note")
 
     change_list_template = "admin/attendance/attendance_changelist.html"
+    import_function = import_attendance
+    import_help = "Same layout as the attendance export: ID, Name, Department, then one column per day."
     
     def get_urls(self):
         urls = super().get_urls()
         custom = [
             path("bulk/", self.admin_site.admin_view(self.bulk_attendance_view), name="attendance_bulk"),
             path("export/", self.admin_site.admin_view(self.export_attendance_view), name="attendance_export"),
+            path("shift-pattern/", self.admin_site.admin_view(self.shift_pattern_view), name="attendance_shift_pattern"),
         ]
         return custom + urls
 
@@ -49,16 +60,55 @@ class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
         employee_ordering = ("id", "first_name", "father_name") if order_by == "id" else ("first_name", "father_name", "id")
         employees = list(emp_qs.order_by(*employee_ordering))
 
-        wb = build_attendance_xlsx(jy, jm, employees)
-
         filename = f"attendance_{jy}_{jm:02d}_{order_by}.xlsx"
         response = HttpResponse(
             content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        wb.save(response)
+        with metrics.timed("hrms_export_seconds", kind="attendance"):
+            wb = build_attendance_xlsx(jy, jm, employees)
+            wb.save(response)
+        metrics.inc("hrms_export_bytes_total", len(response.content), kind="attendance")
         return response
 
+    def shift_pattern_view(self, request):
+        if request.method == "POST":
+            form = ShiftPatternForm(request.POST)
+            if form.is_valid():
+                data = form.cleaned_data
+                jy, jm, department = data["jy"], data["jm"], data["department"]
+                source = (data["source_jy"], data["source_jm"]) if data["source_jy"] and data["source_jm"] else None
+                try:
+                    rng = jalali_month_range(jy, jm)
+                    if source:
+                        jalali_month_range(*source)
+                except ValueError:
+                    messages.error(request, "Invalid Jalali year/month.")
+                    return redirect(request.path)
+                created = copy_shift_pattern(
+                    department.id, jy, jm,
+                    mode=data["mode"], source=source, cycle=data["cycle"] or 2, pattern=data["pattern"],
+                )
+                mark_stale(jy, jm)
+                metrics.inc("hrms_grid_save_cells_total", created, grid="shift_pattern")
+                messages.success(request, f"{created} SHIFT_OFF days written for {department} ({jy}-{jm:02d}).")
+                return redirect(f"../bulk/?jy={jy}&jm={jm}&department_id={department.id}")
+        else:
+            today = jdatetime.date.today()
+            prev = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+            form = ShiftPatternForm(initial={
+                "department": request.GET.get("department_id") or None,
+                "jy": today.year, "jm": today.month,
+                "source_jy": prev[0], "source_jm": prev[1],
+            })
+
+        return render(request, "admin/attendance/shift_pattern.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Copy Shift Pattern",
+            "form": form,
+        })
+
     def bulk_attendance_view(self, request):
         # GET params
         jy = int(request.GET.get("jy") or request.POST.get("jy") or 1404)
@@ -82,13 +132,11 @@ class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
             return redirect(request.path)
 
         days = list(range(1, rng.days + 1))
+        calendar = month_calendar(jy, jm)
+        day_dates = {d: rng.g_start + timedelta(days=d - 1) for d in days}
 
         # compute friday days
-        friday_days = set()
-        for d in days:
-            g = jalali_day_to_gregorian(jy, jm, d)
-            if g.weekday() == 4:
-                friday_days.add(d)
+        friday_days = {d for d, g in day_dates.items() if g.weekday() == 4}
 
         # Employee query
         emp_qs = Employee.objects.filter(status=Employee.Status.WORKING).select_related("department", "position")
@@ -97,39 +145,56 @@ class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
 
         employees = list(emp_qs.order_by("first_name", "father_name"))
 
-        # If POST: save exceptions
+        # If POST: save exceptions (one load, then bulk create/update/delete of the differences)
         if request.method == "POST":
-            with transaction.atomic():
+            allowed = (AttendanceDay.Status.ABSENT, AttendanceDay.Status.SHIFT_OFF, AttendanceDay.Status.HOLIDAY, AttendanceDay.Status.LEAVE)
+            with metrics.timed("hrms_grid_save_seconds", grid="attendance"), transaction.atomic():
+                existing = {
+                    (obj.employee_id, obj.date): obj
+                    for obj in AttendanceDay.objects.filter(
+                        date__range=(rng.g_start, rng.g_end), employee__in=employees
+                    ).only("id", "employee_id", "date", "status")
+                }
+                to_create, to_update, to_delete = [], [], []
                 for emp in employees:
                     for d in days:
-                        key = f"st_{emp.id}_{d}"
-                        val = (request.POST.get(key) or "").strip()
-
-                        g_date = jalali_day_to_gregorian(jy, jm, d)
+                        g_date = day_dates[d]
+                        obj = existing.get((emp.id, g_date))
 
                         # ✅ ENFORCE: Friday cannot be changed / stored
                         if d in friday_days:
                             # ensure nothing is stored for Fridays
-                            AttendanceDay.objects.filter(employee=emp, date=g_date).delete()
+                            if obj:
+                                to_delete.append(obj.id)
+                            continue
+
+                        # calendar holidays are not editable per employee (and never stored)
+                        if calendar.holiday(g_date, emp.department_id):
                             continue
 
-                        obj = AttendanceDay.objects.filter(employee=emp, date=g_date).first()
+                        val = (request.POST.get(f"st_{emp.id}_{d}") or "").strip()
 
                         # Blank means OK/present -> delete exception if exists
                         if val == "":
                             if obj:
-                                obj.delete()
+                                to_delete.append(obj.id)
                             continue
 
-                        if val not in (AttendanceDay.Status.ABSENT, AttendanceDay.Status.SHIFT_OFF, AttendanceDay.Status.HOLIDAY, AttendanceDay.Status.LEAVE):
+                        if val not in allowed:
                             continue
 
-                        if obj:
+                        if obj is None:
+                            to_create.append(AttendanceDay(employee=emp, date=g_date, status=val))
+                        elif obj.status != val:
                             obj.status = val
-                            obj.save(update_fields=["status"])
-                        else:
-                            AttendanceDay.objects.create(employee=emp, date=g_date, status=val)
+                            to_update.append(obj)
 
+                AttendanceDay.objects.filter(id__in=to_delete).delete()
+                AttendanceDay.objects.bulk_update(to_update, ["status"], batch_size=1000)
+                AttendanceDay.objects.bulk_create(to_create, batch_size=1000)
+                mark_stale(jy, jm)
+
+            metrics.inc("hrms_grid_save_cells_total", len(employees) * len(days), grid="attendance")
             messages.success(request, "Attendance exceptions saved.")
             # reload as GET to prevent resubmission
             return redirect(f"{request.path}?jy={jy}&jm={jm}&department_id={department_id}")
@@ -147,8 +212,12 @@ class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
             for emp in employees:
                 cells = []
                 for d in days:
-                    g_date = jalali_day_to_gregorian(jy, jm, d)
-                    cells.append({"day": d, "value": exc_map.get((emp.id, g_date), "")})
+                    g_date = day_dates[d]
+                    cells.append({
+                        "day": d,
+                        "value": exc_map.get((emp.id, g_date), ""),
+                        "holiday": calendar.holiday(g_date, emp.department_id),
+                    })
                 rows.append({"employee": emp, "cells": cells})
 
         ctx = {
@@ -160,5 +229,22 @@ class AttendanceDayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
             "days": days,
             "rows": rows,
             "friday_days": friday_days,
+            "holiday_days": {d: calendar.holidays[g] for d, g in day_dates.items() if g in calendar.holidays},
         }
-        return render(request, "admin/attendance/bulk_grid.html", ctx)
\ No newline at end of file
+        return render(request, "admin/attendance/bulk_grid.html", ctx)
+
+@admin.register(RawPunch)
+class RawPunchAdmin(admin.ModelAdmin):
+    list_display = ("employee", "ts", "direction")
+    list_filter = ("direction",)
+    search_fields = ("employee__first_name", "employee__father_name", "employee__clock_code")
+    raw_id_fields = ("employee",)
+    show_full_result_count = False  # the table grows by tens of thousands of rows a day
+
+
+@admin.register(PunchDay)
+class PunchDayAdmin(admin.ModelAdmin):
+    list_display = ("jalali_date", "date", "marked_at", "derived_at")
+    def jalali_date(self, obj):
+        return format_gregorian_to_jalali_with_day(obj.date)
+    jalali_date.short_description = "Jalali Date"
@@ -2,6 +2,7 @@ from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 
 from core.jalali import jalali_month_range, jalali_day_to_gregorian, get_weekday_names_from_jalali
+from core.calendar import month_calendar
 from attendance.models import AttendanceDay
 
 STATUS_CODE = {
@@ -15,6 +16,7 @@ STATUS_CODE = {
 def build_attendance_xlsx(jy: int, jm: int, employees):
     rng = jalali_month_range(jy, jm)
     days = list(range(1, rng.days + 1))
+    calendar = month_calendar(jy, jm)
 
     friday_days = set()
     for d in days:
@@ -49,6 +51,8 @@ def build_attendance_xlsx(jy: int, jm: int, employees):
             st = exc_map.get((emp.id, g_date))
             if st:
                 cell = STATUS_CODE.get(st, st)
+            elif d not in friday_days and calendar.holiday(g_date, emp.department_id):
+                cell = STATUS_CODE["HOLIDAY"]
 
             row.append(cell)
 
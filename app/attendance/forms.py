@@ -0,0 +1,31 @@
+from django import forms
+
+from org.models import Department
+
+from .services import ShiftPatternMode
+
+
+class ShiftPatternForm(forms.Form):
+    department = forms.ModelChoiceField(queryset=Department.objects.order_by("name"))
+    jy = forms.IntegerField(label="Target Jalali Year", min_value=1300, max_value=1600)
+    jm = forms.IntegerField(label="Target Jalali Month", min_value=1, max_value=12)
+    mode = forms.ChoiceField(choices=ShiftPatternMode.choices, initial=ShiftPatternMode.ROTATE)
+    source_jy = forms.IntegerField(label="Source Jalali Year", min_value=1300, max_value=1600, required=False)
+    source_jm = forms.IntegerField(label="Source Jalali Month", min_value=1, max_value=12, required=False)
+    cycle = forms.IntegerField(label="Rotation Days", min_value=2, max_value=14, initial=2, required=False)
+    pattern = forms.RegexField(
+        regex=r"^[01]{2,14}$", initial="10", required=False,
+        help_text='Template only: one digit per rotation day, 1 = off ("10" = even/odd).',
+    )
+
+    def clean(self):
+        data = super().clean()
+        mode = data.get("mode")
+        if mode == ShiftPatternMode.TEMPLATE:
+            if not data.get("pattern"):
+                self.add_error("pattern", "Required for a template.")
+        elif not (data.get("source_jy") and data.get("source_jm")):
+            self.add_error("source_jm", "Choose the source month.")
+        if mode == ShiftPatternMode.ROTATE and not data.get("cycle"):
+            self.add_error("cycle", "Required for a rotation.")
+        return data
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from core.calendar import month_calendar
+from core.importing import ImportResult, cell_text, chunked, iter_rows, parse_employee_id
+from core.jalali import jalali_month_range
+from core.rollups import mark_stale
+from employees.models import Employee
+
+from .exports import STATUS_CODE
+from .models import AttendanceDay
+
+# file cell -> stored exception (None = no exception). Accepts the export's Dari labels and the status codes.
+CELL_STATUS = {label: status for status, label in STATUS_CODE.items()}
+CELL_STATUS.update({status: status for status in STATUS_CODE})
+CELL_STATUS.update({"": None, "حاضر": None, "جمعه": None, "PRESENT": None})
+
+FIRST_DAY_COLUMN = 3  # Employee ID, First Name, Father Name, day 1 ...
+
+
+@transaction.atomic
+def import_attendance(fh, filename: str, jy: int, jm: int, chunk_size: int = 1000) -> ImportResult:
+    """
+    Import a month in the build_attendance_xlsx layout. Each file row replaces that
+    employee's exceptions for the month: listed cells are upserted, others deleted.
+    Fridays and calendar holidays are never stored.
+    """
+    rng = jalali_month_range(jy, jm)
+    calendar = month_calendar(jy, jm)
+    dates = [rng.g_start + timedelta(days=i) for i in range(rng.days)]
+    result = ImportResult()
+    departments = dict(Employee.objects.values_list("id", "department_id"))
+    employee_ids = set(departments)
+
+    rows = iter_rows(fh, filename)
+    next(rows, None)  # header
+
+    for chunk in chunked(rows, chunk_size):
+        wanted = {}  # (employee_id, date) -> status
+        chunk_employees = set()
+
+        for number, row in chunk:
+            if not any(cell_text(v) for v in row):
+                continue
+            result.rows += 1
+            try:
+                emp_id = parse_employee_id(row[0] if row else None, employee_ids)
+                cells = {}
+                for i, g_date in enumerate(dates):
+                    col = FIRST_DAY_COLUMN + i
+                    text = cell_text(row[col]) if col < len(row) else ""
+                    if text not in CELL_STATUS:
+                        raise ValueError(f"day {i + 1}: unknown status {text!r}")
+                    status = CELL_STATUS[text]
+                    if status and calendar.is_working_day(g_date, departments[emp_id]):
+                        cells[(emp_id, g_date)] = status
+            except ValueError as exc:
+                result.error(number, str(exc))
+                continue
+            chunk_employees.add(emp_id)
+            wanted.update(cells)
+
+        if not chunk_employees:
+            continue
+
+        existing = AttendanceDay.objects.filter(
+            employee_id__in=chunk_employees,
+            date__range=(rng.g_start, rng.g_end),
+        ).values_list("id", "employee_id", "date")
+        stale = [
+            pk for pk, emp_id, d in existing
+            if (emp_id, d) not in wanted and not calendar.holiday(d, departments[emp_id])  # holidays are left as they are
+        ]
+        if stale:
+            result.deleted += AttendanceDay.objects.filter(id__in=stale).delete()[0]
+
+        AttendanceDay.objects.bulk_create(
+            [AttendanceDay(employee_id=e, date=d, status=s) for (e, d), s in wanted.items()],
+            update_conflicts=True,
+            unique_fields=["employee", "date"],
+            update_fields=["status"],
+            batch_size=chunk_size,
+        )
+        result.upserted += len(wanted)
+
+    mark_stale(jy, jm)
+    return result.finish()
@@ -0,0 +1,33 @@
+import datetime as dt
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.models import PunchDay
+from attendance.punches import derive_day, derive_pending
+
+
+class Command(BaseCommand):
+    help = "Fold ingested time-clock punches into AttendanceDay / OvertimeEntry exceptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--include-today", action="store_true", help="Also derive today (punches still arriving).")
+        parser.add_argument("--date", help="Re-derive one Gregorian date (YYYY-MM-DD) even if it is not pending.")
+
+    def handle(self, *args, **opts):
+        if opts["date"]:
+            try:
+                d = dt.date.fromisoformat(opts["date"])
+            except ValueError:
+                raise CommandError("--date must be YYYY-MM-DD") from None
+            started = timezone.now()
+            counts = derive_day(d)
+            PunchDay.objects.filter(date=d).update(derived_at=started)
+            self.stdout.write(self.style.SUCCESS(f"{d}: {counts}"))
+            return
+
+        totals = derive_pending(
+            include_today=opts["include_today"],
+            log=self.stdout.write if opts["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Derived {totals}"))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.punches import IngestStats, derive_pending, ingest_file
+
+
+class Command(BaseCommand):
+    help = "Load time-clock dump files into RawPunch (optionally following them as they grow)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Device dump files.")
+        parser.add_argument("--follow", action="store_true", help="Keep polling the files for appended lines.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --follow.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--derive", action="store_true", help="Derive attendance/overtime for finished days after each pass.")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        try:
+            while True:
+                self._pass(opts)
+                if not opts["follow"]:
+                    break
+                time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            pass
+
+    def _pass(self, opts):
+        stats = IngestStats()
+        start = time.perf_counter()
+        for path in opts["paths"]:
+            try:
+                ingest_file(path, batch_size=opts["batch_size"], stats=stats)
+            except FileNotFoundError:
+                if not opts["follow"]:
+                    raise CommandError(f"{path} does not exist")
+        elapsed = time.perf_counter() - start
+
+        if stats.lines or not opts["follow"]:
+            self.stdout.write(
+                f"{stats.lines:,} lines, {stats.punches:,} punches, {stats.rejected:,} rejected in {elapsed:.1f}s"
+            )
+        if stats.unknown_codes:
+            codes = ", ".join(sorted(stats.unknown_codes)[:20])
+            self.stderr.write(f"Unknown employee codes: {codes}")
+
+        if opts["derive"]:
+            totals = derive_pending(log=self.stdout.write if opts["verbosity"] > 1 else None)
+            if totals["days"]:
+                self.stdout.write(self.style.SUCCESS(f"Derived {totals}"))
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_alter_attendanceday_status'),
+        ('employees', '0002_employee_clock_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PunchDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('marked_at', models.DateTimeField()),
+                ('derived_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PunchFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True)),
+                ('inode', models.BigIntegerField(default=0)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RawPunch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ts', models.DateTimeField()),
+                ('direction', models.CharField(choices=[('I', 'In'), ('O', 'Out')], max_length=1)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='punches', to='employees.employee')),
+            ],
+            options={
+                'ordering': ['-ts'],
+                'indexes': [models.Index(fields=['ts'], name='attendance__ts_196fd3_idx')],
+                'unique_together': {('employee', 'ts', 'direction')},
+            },
+        ),
+    ]
@@ -19,4 +19,55 @@ class AttendanceDay(models.Model):
         ordering = ["-date", "employee__first_name"]
 
     def __str__(self):
-        return f"{self.employee} - {self.date} - {self.status}"
\ No newline at end of file
+        return f"{self.employee} - {self.date} - {self.status}"
+
+
+class RawPunch(models.Model):
+    """
+    One time-clock event as dumped by the devices. (employee, ts, direction) is the
+    natural key, so re-reading a file never duplicates punches.
+    """
+    class Direction(models.TextChoices):
+        IN = "I", "In"
+        OUT = "O", "Out"
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="punches")
+    ts = models.DateTimeField()
+    direction = models.CharField(max_length=1, choices=Direction.choices)
+
+    class Meta:
+        unique_together = ("employee", "ts", "direction")
+        indexes = [models.Index(fields=["ts"])]
+        ordering = ["-ts"]
+
+    def __str__(self):
+        return f"{self.employee} {self.ts} {self.direction}"
+
+
+class PunchDay(models.Model):
+    """
+    Days that received punches. A day is pending derivation while
+    derived_at is empty or older than the last ingested punch (marked_at).
+    """
+    date = models.DateField(unique=True)
+    marked_at = models.DateTimeField()
+    derived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return str(self.date)
+
+
+class PunchFile(models.Model):
+    """
+    Read position of a device dump file, so a restarted ingester resumes where it stopped.
+    """
+    path = models.CharField(max_length=500, unique=True)
+    inode = models.BigIntegerField(default=0)
+    offset = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
@@ -0,0 +1,294 @@
+"""
+Time-clock punches: device dump files -> RawPunch (ingest), then each day's punches
+-> AttendanceDay / OvertimeEntry exceptions (derive).
+
+Dump lines look like "1042,2025-05-22 07:58:12,I" (comma, semicolon or tab separated;
+direction I/O, IN/OUT or 0/1). Only days that received punches are derived, and only
+again when new punches arrive for them (PunchDay.marked_at > derived_at).
+"""
+from __future__ import annotations
+
+import datetime as dt
+import os
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import jdatetime
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import metrics
+from core.calendar import calendar_for_date
+from core.models import MonthConfig
+from core.rollups import mark_stale_dates
+from employees.models import Employee
+from overtime.models import OvertimeEntry
+
+from .models import AttendanceDay, PunchDay, PunchFile, RawPunch
+
+DERIVED_NOTE = "Time clock"  # rows written by derivation; anything else was entered by hand
+
+DIRECTIONS = {
+    "I": RawPunch.Direction.IN, "IN": RawPunch.Direction.IN, "0": RawPunch.Direction.IN,
+    "O": RawPunch.Direction.OUT, "OUT": RawPunch.Direction.OUT, "1": RawPunch.Direction.OUT,
+}
+TS_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M")
+_SPLIT_RE = re.compile(r"[,;\t]")
+
+
+def parse_line(line: str) -> tuple[str, dt.datetime, str]:
+    """
+    (code, naive local timestamp, direction); raises ValueError for a malformed line.
+    """
+    parts = [p.strip() for p in _SPLIT_RE.split(line.strip())]
+    if len(parts) != 3:
+        parts = line.split()  # "1042 2025-05-22 07:58:12 I"
+        if len(parts) != 4:
+            raise ValueError("expected: code, timestamp, direction")
+        parts = [parts[0], f"{parts[1]} {parts[2]}", parts[3]]
+    code, stamp, direction = parts
+    direction = DIRECTIONS.get(direction.upper())
+    if direction is None:
+        raise ValueError(f"unknown direction {parts[2]!r}")
+    for fmt in TS_FORMATS:
+        try:
+            return code, dt.datetime.strptime(stamp, fmt), direction
+        except ValueError:
+            continue
+    raise ValueError(f"bad timestamp {stamp!r}")
+
+
+def employee_code_map() -> dict[str, int]:
+    return {
+        (code or str(emp_id)): emp_id
+        for emp_id, code in Employee.objects.values_list("id", "clock_code")
+    }
+
+
+@dataclass
+class IngestStats:
+    lines: int = 0
+    punches: int = 0
+    rejected: int = 0
+    unknown_codes: set[str] = field(default_factory=set)
+
+
+class PunchIngester:
+    """
+    Buffers parsed punches and writes them with bulk_create(ignore_conflicts=True)
+    every `batch_size` rows; the days they fall on are marked for derivation.
+    """
+
+    def __init__(self, batch_size: int = 5000, stats: IngestStats | None = None):
+        self.batch_size = batch_size
+        self.stats = stats or IngestStats()
+        self.codes = employee_code_map()
+        self.tz = timezone.get_current_timezone()
+        self.buffer: list[RawPunch] = []
+        self.dates: set[dt.date] = set()
+
+    def add(self, line: str):
+        if not line.strip():
+            return
+        self.stats.lines += 1
+        try:
+            code, stamp, direction = parse_line(line)
+        except ValueError:
+            self.stats.rejected += 1
+            return
+        emp_id = self.codes.get(code)
+        if emp_id is None:
+            self.stats.rejected += 1
+            self.stats.unknown_codes.add(code)
+            return
+        self.buffer.append(RawPunch(employee_id=emp_id, ts=stamp.replace(tzinfo=self.tz), direction=direction))
+        self.dates.add(stamp.date())
+
+    @property
+    def full(self) -> bool:
+        return len(self.buffer) >= self.batch_size
+
+    def flush(self):
+        if not self.buffer:
+            return
+        RawPunch.objects.bulk_create(self.buffer, ignore_conflicts=True, batch_size=self.batch_size)
+        now = timezone.now()
+        PunchDay.objects.bulk_create(
+            [PunchDay(date=d, marked_at=now) for d in self.dates],
+            update_conflicts=True,
+            unique_fields=["date"],
+            update_fields=["marked_at"],
+        )
+        metrics.inc("hrms_punches_ingested_total", len(self.buffer))
+        self.stats.punches += len(self.buffer)
+        self.buffer = []
+        self.dates = set()
+
+
+def ingest_file(path, batch_size: int = 5000, stats: IngestStats | None = None) -> IngestStats:
+    """
+    Read the complete lines appended to `path` since the last call. A file that was
+    replaced (new inode) or truncated is read from the start; duplicates are ignored.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    source, _ = PunchFile.objects.get_or_create(path=path)
+    offset = source.offset
+    if source.inode != st.st_ino or offset > st.st_size:
+        offset = 0
+
+    ingester = PunchIngester(batch_size, stats)
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        for raw in fh:
+            if not raw.endswith(b"\n"):
+                break  # the device is still writing this line
+            ingester.add(raw.decode("utf-8", "replace"))
+            offset += len(raw)
+            if ingester.full:
+                with transaction.atomic():
+                    ingester.flush()
+                    PunchFile.objects.filter(pk=source.pk).update(inode=st.st_ino, offset=offset)
+
+    with transaction.atomic():
+        ingester.flush()
+        source.inode, source.offset = st.st_ino, offset
+        source.save(update_fields=["inode", "offset", "updated_at"])
+    return ingester.stats
+
+
+def worked_hours(punches) -> Decimal:
+    """
+    Sum of IN -> OUT intervals of one employee's day (punches sorted by time).
+    A repeated IN keeps the first one; an OUT without an open IN is ignored.
+    """
+    seconds = 0.0
+    opened = None
+    for ts, direction in punches:
+        if direction == RawPunch.Direction.IN:
+            if opened is None:
+                opened = ts
+        elif opened is not None:
+            seconds += (ts - opened).total_seconds()
+            opened = None
+    return (Decimal(seconds) / 3600).quantize(Decimal("0.01"))
+
+
+def _daily_hours(d: dt.date, cache: dict) -> Decimal:
+    j = jdatetime.date.fromgregorian(date=d)
+    key = (j.year, j.month)
+    if key not in cache:
+        cfg = MonthConfig.objects.filter(year=j.year, month=j.month).first()
+        cache[key] = cfg.daily_work_hours if cfg else MonthConfig._meta.get_field("daily_work_hours").default
+    return Decimal(cache[key])
+
+
+@transaction.atomic
+def derive_day(d: dt.date, hours_cache: dict | None = None) -> dict[str, int]:
+    """
+    Fold one day's punches into exceptions:
+    - ABSENT for working employees with no punch on a working day and no other exception;
+      a derived ABSENT is removed again once punches show up.
+    - OvertimeEntry for hours above MonthConfig.daily_work_hours (all punched hours on
+      Fridays and holidays of the employee's department, see core.calendar).
+    Rows entered by hand (note other than DERIVED_NOTE) are never touched.
+    """
+    tz = timezone.get_current_timezone()
+    day_start = dt.datetime.combine(d, dt.time.min, tzinfo=tz)
+    calendar = calendar_for_date(d)
+    daily_hours = _daily_hours(d, hours_cache if hours_cache is not None else {})
+    working = dict(
+        Employee.objects.filter(status=Employee.Status.WORKING, date_hired__lte=d).values_list("id", "department_id")
+    )
+
+    by_employee = {}
+    for emp_id, ts, direction in (
+        RawPunch.objects
+        .filter(ts__gte=day_start, ts__lt=day_start + dt.timedelta(days=1))
+        .order_by("employee_id", "ts")
+        .values_list("employee_id", "ts", "direction")
+    ):
+        by_employee.setdefault(emp_id, []).append((ts, direction))
+
+    attendance = {
+        emp_id: (pk, status, note)
+        for pk, emp_id, status, note in AttendanceDay.objects.filter(date=d).values_list("id", "employee_id", "status", "note")
+    }
+    overtime = {
+        emp_id: (pk, note)
+        for pk, emp_id, note in OvertimeEntry.objects.filter(date=d).values_list("id", "employee_id", "note")
+    }
+
+    # departments of the employees involved: working ones, plus anyone else with punches
+    # or a derived row that day (left or not yet hired)
+    departments = dict(working)
+    others = (by_employee.keys() | attendance.keys()) - working.keys()
+    if others:
+        departments.update(Employee.objects.filter(id__in=others).values_list("id", "department_id"))
+
+    absent_new, absent_stale = [], []
+    for emp_id in working:
+        if emp_id not in by_employee and emp_id not in attendance and calendar.is_working_day(d, departments[emp_id]):
+            absent_new.append(AttendanceDay(employee_id=emp_id, date=d, status=AttendanceDay.Status.ABSENT, note=DERIVED_NOTE))
+    for emp_id, (pk, status, note) in attendance.items():
+        if status == AttendanceDay.Status.ABSENT and note == DERIVED_NOTE and (
+            emp_id in by_employee or not calendar.is_working_day(d, departments[emp_id])
+        ):
+            absent_stale.append(pk)
+
+    extra = {}
+    for emp_id, punches in by_employee.items():
+        threshold = daily_hours if calendar.is_working_day(d, departments[emp_id]) else Decimal(0)
+        hours = worked_hours(punches) - threshold
+        if hours > 0 and overtime.get(emp_id, (None, DERIVED_NOTE))[1] == DERIVED_NOTE:
+            extra[emp_id] = hours
+    overtime_stale = [pk for emp_id, (pk, note) in overtime.items() if note == DERIVED_NOTE and emp_id not in extra]
+
+    AttendanceDay.objects.bulk_create(absent_new, batch_size=1000)
+    AttendanceDay.objects.filter(id__in=absent_stale).delete()
+    OvertimeEntry.objects.bulk_create(
+        [OvertimeEntry(employee_id=e, date=d, hours=h, note=DERIVED_NOTE) for e, h in extra.items()],
+        update_conflicts=True,
+        unique_fields=["employee", "date"],
+        update_fields=["hours"],
+        batch_size=1000,
+    )
+    OvertimeEntry.objects.filter(id__in=overtime_stale).delete()
+    mark_stale_dates([d])
+
+    return {
+        "absent": len(absent_new),
+        "absent_removed": len(absent_stale),
+        "overtime": len(extra),
+        "overtime_removed": len(overtime_stale),
+    }
+
+
+def pending_days(include_today: bool = False):
+    """
+    Days with punches newer than their last derivation. Today is left out by default:
+    its punches are still coming in, so everyone not yet clocked in would be ABSENT.
+    """
+    qs = PunchDay.objects.filter(Q(derived_at__isnull=True) | Q(derived_at__lt=F("marked_at")))
+    if not include_today:
+        qs = qs.filter(date__lt=timezone.localdate())
+    return qs.order_by("date")
+
+
+def derive_pending(include_today: bool = False, log=None) -> dict[str, int]:
+    totals = {"days": 0}
+    hours_cache = {}
+    for day in pending_days(include_today):
+        started = timezone.now()
+        counts = derive_day(day.date, hours_cache)
+        # a punch ingested while we were deriving keeps the day pending
+        PunchDay.objects.filter(pk=day.pk).update(derived_at=started)
+        totals["days"] += 1
+        for key, n in counts.items():
+            totals[key] = totals.get(key, 0) + n
+        if log:
+            log(f"  {day.date}: {counts}")
+    metrics.inc("hrms_punch_days_derived_total", totals["days"])
+    return totals
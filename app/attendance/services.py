@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import datetime as dt
+
+from django.db import connection, transaction
+
+from core.calendar import month_calendar
+from employees.models import Employee
+
+from .models import AttendanceDay
+
+SHIFT_PATTERN_NOTE = "Shift pattern"
+
+
+class ShiftPatternMode:
+    COPY = "copy"          # same Jalali day number as the source month
+    ROTATE = "rotate"      # continue an N-day rotation from the source month
+    TEMPLATE = "template"  # no source: off days from a pattern such as "10" (even/odd)
+
+    choices = (
+        (COPY, "Copy source month (same day numbers)"),
+        (ROTATE, "Continue rotation from source month"),
+        (TEMPLATE, "Rotation template"),
+    )
+
+
+def _target_dates(jy: int, jm: int, department_id: int) -> list[dt.date]:
+    """
+    Target days that may hold a SHIFT_OFF: no Fridays, no holidays of the department.
+    """
+    calendar = month_calendar(jy, jm)
+    return [d for d in calendar.dates() if calendar.is_working_day(d, department_id)]
+
+
+def _source_slots(
+    mode: str, department_id: int, source: tuple[int, int], cycle: int
+) -> list[tuple[dt.date, int, int]]:
+    """
+    (source_date, slot, needed): an employee is off on a target day of `slot` when
+    they had SHIFT_OFF on at least `needed` source days of that slot.
+
+    copy:   slot = day offset in the month, needed = 1
+    rotate: slot = day ordinal % cycle, needed = majority of the slot's working source
+            days, so Fridays, holidays and a stray leave day do not break the phase
+    """
+    src = month_calendar(*source)
+    days = [d for d in src.dates() if src.is_working_day(d, department_id)]
+    if mode == ShiftPatternMode.COPY:
+        return [(d, (d - src.g_start).days, 1) for d in days]
+
+    per_slot = {}
+    for d in days:
+        per_slot.setdefault(d.toordinal() % cycle, []).append(d)
+    return [(d, slot, len(ds) // 2 + 1) for slot, ds in per_slot.items() for d in ds]
+
+
+def _target_slot(mode: str, d: dt.date, month_start: dt.date, cycle: int) -> int:
+    return (d - month_start).days if mode == ShiftPatternMode.COPY else d.toordinal() % cycle
+
+
+def _values_cte(name: str, columns: tuple[str, ...], rows: list[tuple]) -> tuple[str, list]:
+    placeholders = ", ".join("(" + ", ".join(["%s"] * len(columns)) + ")" for _ in rows)
+    params = [value for row in rows for value in row]
+    return f"{name} ({', '.join(columns)}) AS (VALUES {placeholders})", params
+
+
+@transaction.atomic
+def copy_shift_pattern(
+    department_id: int,
+    jy: int,
+    jm: int,
+    mode: str = ShiftPatternMode.ROTATE,
+    source: tuple[int, int] | None = None,
+    cycle: int = 2,
+    pattern: str = "10",
+) -> int:
+    """
+    Write SHIFT_OFF exceptions for WORKING employees of a department into Jalali month jy/jm
+    with one INSERT ... SELECT. Fridays, department holidays and days that already have an
+    exception are skipped. Returns the number of rows inserted.
+
+    - copy / rotate: employees who had SHIFT_OFF in `source` get the same pattern
+      (by day number, or by continuing a `cycle`-day rotation, see _source_slots).
+    - template: `pattern` is one character per rotation day, "1" = off; employees are
+      spread over the phases by id ("10" = even/odd).
+    """
+    targets = _target_dates(jy, jm, department_id)
+    if not targets:
+        return 0
+
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datefield_value
+    att = qn(AttendanceDay._meta.db_table)
+    emp = qn(Employee._meta.db_table)
+    params_head = [AttendanceDay.Status.SHIFT_OFF, SHIFT_PATTERN_NOTE]
+
+    if mode == ShiftPatternMode.TEMPLATE:
+        n = len(pattern)
+        offsets = [i for i, ch in enumerate(pattern) if ch == "1"]
+        if not offsets:
+            return 0
+        cte, cte_params = _values_cte("m", ("target_date", "slot"), [(adapt(t), t.toordinal() % n) for t in targets])
+        sql = f"""
+            INSERT INTO {att} (employee_id, date, status, note)
+            WITH {cte}
+            SELECT e.id, m.target_date, %s, %s
+            FROM {emp} e
+            CROSS JOIN m
+            WHERE e.department_id = %s
+              AND e.status = %s
+              AND ((m.slot + e.id) %% {n}) IN ({", ".join(str(o) for o in offsets)})
+              AND NOT EXISTS (
+                  SELECT 1 FROM {att} x WHERE x.employee_id = e.id AND x.date = m.target_date
+              )
+        """
+        params = cte_params + params_head + [department_id, Employee.Status.WORKING]
+    else:
+        if source is None:
+            raise ValueError("copy/rotate needs a source month")
+        month_start = month_calendar(jy, jm).g_start
+        t_cte, t_params = _values_cte(
+            "t", ("target_date", "slot"), [(adapt(d), _target_slot(mode, d, month_start, cycle)) for d in targets]
+        )
+        s_cte, s_params = _values_cte(
+            "s", ("source_date", "slot", "needed"),
+            [(adapt(d), slot, needed) for d, slot, needed in _source_slots(mode, department_id, source, cycle)],
+        )
+        sql = f"""
+            INSERT INTO {att} (employee_id, date, status, note)
+            WITH {t_cte}, {s_cte}
+            SELECT a.employee_id, t.target_date, %s, %s
+            FROM {att} a
+            JOIN s ON a.date = s.source_date
+            JOIN t ON t.slot = s.slot
+            JOIN {emp} e ON e.id = a.employee_id
+            WHERE a.status = %s
+              AND e.department_id = %s
+              AND e.status = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM {att} x WHERE x.employee_id = a.employee_id AND x.date = t.target_date
+              )
+            GROUP BY a.employee_id, t.target_date, s.needed
+            HAVING COUNT(*) >= s.needed
+        """
+        params = t_params + s_params + params_head + [AttendanceDay.Status.SHIFT_OFF, department_id, Employee.Status.WORKING]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -1,3 +1,149 @@
+import datetime as dt
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+
+from core.calendar import month_calendar
+from core.models import Holiday
+
+from employees.models import Employee
+from org.models import Department, Position
+from overtime.models import OvertimeEntry
+
+from .models import AttendanceDay, RawPunch
+from .punches import DERIVED_NOTE, derive_day
+from .services import ShiftPatternMode, copy_shift_pattern
+
+SATURDAY = dt.date(2025, 5, 3)
+FRIDAY = dt.date(2025, 5, 2)
+
+
+class PunchDerivationTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Ops")
+        position = Position.objects.create(department=department, name="Clerk")
+        self.present, self.missing = [
+            Employee.objects.create(
+                first_name=name, father_name="F", department=department, position=position,
+                employee_type=Employee.EmployeeType.PERMANENT, base_salary=Decimal("30000"),
+                date_hired=dt.date(2020, 1, 1),
+            )
+            for name in ("Present", "Missing")
+        ]
+
+    def punch(self, employee, d, *times):
+        tz = timezone.get_current_timezone()
+        RawPunch.objects.bulk_create([
+            RawPunch(
+                employee=employee, ts=dt.datetime.combine(d, dt.time(hour), tzinfo=tz),
+                direction=RawPunch.Direction.IN if i % 2 == 0 else RawPunch.Direction.OUT,
+            )
+            for i, hour in enumerate(times)
+        ])
+
+    def test_working_day(self):
+        self.punch(self.present, SATURDAY, 8, 12, 13, 19)  # 10 hours
+
+        self.assertEqual(
+            derive_day(SATURDAY),
+            {"absent": 1, "absent_removed": 0, "overtime": 1, "overtime_removed": 0},
+        )
+        absence = AttendanceDay.objects.get(date=SATURDAY)
+        self.assertEqual((absence.employee, absence.status, absence.note), (self.missing, "ABSENT", DERIVED_NOTE))
+        self.assertEqual(OvertimeEntry.objects.get(employee=self.present, date=SATURDAY).hours, Decimal("2.00"))
+
+        # late punches remove the derived absence; deriving again changes nothing else
+        self.punch(self.missing, SATURDAY, 9, 17)
+        self.assertEqual(
+            derive_day(SATURDAY),
+            {"absent": 0, "absent_removed": 1, "overtime": 1, "overtime_removed": 0},
+        )
+        self.assertFalse(AttendanceDay.objects.filter(date=SATURDAY).exists())
+        self.assertEqual(OvertimeEntry.objects.filter(date=SATURDAY).count(), 1)
+
+    def test_friday_hours_are_all_overtime(self):
+        self.punch(self.present, FRIDAY, 9, 12)
+        self.assertEqual(derive_day(FRIDAY)["absent"], 0)
+        self.assertEqual(OvertimeEntry.objects.get(employee=self.present, date=FRIDAY).hours, Decimal("3.00"))
+
+    def test_rows_entered_by_hand_are_kept(self):
+        AttendanceDay.objects.create(employee=self.missing, date=SATURDAY, status=AttendanceDay.Status.ABSENT, note="Sick")
+        OvertimeEntry.objects.create(employee=self.present, date=SATURDAY, hours=Decimal("5"), note="Approved")
+        self.punch(self.present, SATURDAY, 8, 19)
+        self.punch(self.missing, SATURDAY, 8, 9)
+
+        derive_day(SATURDAY)
+        self.assertEqual(AttendanceDay.objects.get(employee=self.missing, date=SATURDAY).note, "Sick")
+        self.assertEqual(OvertimeEntry.objects.get(employee=self.present, date=SATURDAY).hours, Decimal("5.00"))
+
+
+class ShiftPatternTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name="Guards")
+        other = Department.objects.create(name="Office")
+        self.a, self.b, self.left = [
+            self.employee(name, self.department) for name in ("A", "B", "Left")
+        ]
+        self.left.status = Employee.Status.RESIGNED
+        self.left.save()
+        self.elsewhere = self.employee("Elsewhere", other)
+        self.calendar = month_calendar(1404, 2)
+        self.days = [d for d in self.calendar.dates() if d.weekday() != 4]
+
+    def employee(self, name, department):
+        return Employee.objects.create(
+            first_name=name, father_name="F", department=department,
+            position=Position.objects.get_or_create(department=department, name="Guard")[0],
+            employee_type=Employee.EmployeeType.PERMANENT, base_salary=Decimal("30000"),
+            date_hired=dt.date(2020, 1, 1),
+        )
+
+    def off_days(self, employee, jy=1404, jm=2):
+        month = month_calendar(jy, jm)
+        return set(
+            AttendanceDay.objects.filter(
+                employee=employee, status=AttendanceDay.Status.SHIFT_OFF, date__range=(month.g_start, month.g_end)
+            ).values_list("date", flat=True)
+        )
+
+    def test_template_splits_the_department_over_the_phases(self):
+        holiday = self.days[3]
+        Holiday.objects.create(date=holiday, name="Holiday", department=self.department)
+        sick = self.days[0] if (self.days[0].toordinal() + self.a.id) % 2 == 0 else self.days[1]
+        AttendanceDay.objects.create(employee=self.a, date=sick, status=AttendanceDay.Status.ABSENT)
+
+        inserted = copy_shift_pattern(self.department.id, 1404, 2, mode=ShiftPatternMode.TEMPLATE, pattern="10")
+
+        working = [d for d in self.days if d != holiday]
+        self.assertEqual(self.off_days(self.a), {d for d in working if (d.toordinal() + self.a.id) % 2 == 0} - {sick})
+        self.assertEqual(self.off_days(self.b), {d for d in working if (d.toordinal() + self.b.id) % 2 == 0})
+        self.assertEqual(inserted, len(self.off_days(self.a)) + len(self.off_days(self.b)))
+        self.assertFalse(self.off_days(self.left) or self.off_days(self.elsewhere))
+        self.assertEqual(AttendanceDay.objects.get(employee=self.a, date=sick).status, AttendanceDay.Status.ABSENT)
+        # days that already have an exception are skipped, so a second run adds nothing
+        self.assertEqual(copy_shift_pattern(self.department.id, 1404, 2, mode=ShiftPatternMode.TEMPLATE), 0)
+
+    def test_rotation_continues_from_the_source_month(self):
+        source = month_calendar(1404, 1)
+        even = [d for d in source.dates() if d.weekday() != 4 and d.toordinal() % 2 == 0]
+        AttendanceDay.objects.bulk_create(
+            [AttendanceDay(employee=self.a, date=d, status=AttendanceDay.Status.SHIFT_OFF) for d in even]
+        )
+        # a stray leave day on an even day does not break the phase
+        AttendanceDay.objects.filter(employee=self.a, date=even[5]).update(status=AttendanceDay.Status.LEAVE)
+
+        copy_shift_pattern(self.department.id, 1404, 2, mode=ShiftPatternMode.ROTATE, source=(1404, 1))
+        self.assertEqual(self.off_days(self.a), {d for d in self.days if d.toordinal() % 2 == 0})
+        self.assertEqual(self.off_days(self.b), set())
 
-# Create your tests here.
+    def test_copy_keeps_the_day_numbers(self):
+        source = month_calendar(1404, 1)
+        offsets = [i for i, d in enumerate(source.dates()) if i < 28 and d.weekday() != 4][:3]
+        AttendanceDay.objects.bulk_create([
+            AttendanceDay(employee=self.b, date=source.g_start + dt.timedelta(days=i), status=AttendanceDay.Status.SHIFT_OFF)
+            for i in offsets
+        ])
+        copy_shift_pattern(self.department.id, 1404, 2, mode=ShiftPatternMode.COPY, source=(1404, 1))
+        expected = {self.calendar.g_start + dt.timedelta(days=i) for i in offsets}
+        self.assertEqual(self.off_days(self.b), {d for d in expected if d.weekday() != 4})
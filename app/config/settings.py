@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",  # first, so session/auth queries are counted too
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",  # for Dari later if you want
@@ -119,4 +120,86 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
-DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
\ No newline at end of file
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Request metrics (core.middleware.RequestMetricsMiddleware)
+REQUEST_METRICS_SAMPLE_RATE = env("REQUEST_METRICS_SAMPLE_RATE", default=1.0, cast=float)
+# tracemalloc is process-wide: the logged process_peak_kb covers every thread of the process
+REQUEST_METRICS_TRACK_MEMORY = env("REQUEST_METRICS_TRACK_MEMORY", default=DEBUG, cast=bool)
+# Server-Timing / X-DB-Queries for every client (staff users always get them)
+REQUEST_METRICS_HEADERS = env("REQUEST_METRICS_HEADERS", default=DEBUG, cast=bool)
+QUERY_BUDGET_STRICT = env("QUERY_BUDGET_STRICT", default=False, cast=bool)  # raise instead of warn (tests)
+
+# max SQL queries per view name; unlisted views are not checked
+QUERY_BUDGETS = {
+    "admin:attendance_bulk": 20,
+    "admin:overtime_bulk": 20,
+    "admin:payroll_report": 15,
+    "admin:attendance_export": 15,
+    "admin:overtime_export": 15,
+    "admin:payroll_export": 15,
+    "admin:attendance_attendanceday_changelist": 15,
+    "admin:overtime_overtimeentry_changelist": 15,
+    "admin:payroll_payrollrun_change": 20,
+}
+
+# Slow-query log (core.slow_queries): statements >= SLOW_QUERY_MS are logged with their EXPLAIN plan.
+# Set SLOW_QUERY_MS to an empty value to disable.
+SLOW_QUERY_MS = env("SLOW_QUERY_MS", default=200, cast=lambda v: float(v) if v not in ("", None) else None)
+# Appended to by every process and never rotated in-process: without an external logrotate it grows
+# without limit. Rotate by moving it (the processes reopen the file), e.g. /etc/logrotate.d/hrms:
+#     /srv/hrms/logs/slow_queries.log { daily rotate 7 delaycompress compress missingok notifempty }
+# (delaycompress keeps slow_queries.log.1 readable for the admin summary)
+SLOW_QUERY_LOG = Path(env("SLOW_QUERY_LOG", default=str(BASE_DIR / "logs" / "slow_queries.log")))
+# The admin summary reads only the newest this-many bytes of the current + rotated files
+SLOW_QUERY_SUMMARY_BYTES = env("SLOW_QUERY_SUMMARY_BYTES", default=20 * 1024 * 1024, cast=int)
+
+# Metrics (core.metrics): shared by all worker processes through this SQLite file
+METRICS_DB = Path(env("METRICS_DB", default=str(BASE_DIR / "logs" / "metrics.sqlite3")))
+# seconds between writes of each process's buffered samples to METRICS_DB
+METRICS_FLUSH_SECONDS = env("METRICS_FLUSH_SECONDS", default=5, cast=float)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")  # bearer token for the scraper; staff login works too
+
+# Bulk grids post one field per cell (31 days x a whole department); Django's default cap is 1000
+DATA_UPLOAD_MAX_NUMBER_FIELDS = env("DATA_UPLOAD_MAX_NUMBER_FIELDS", default=100000, cast=int)
+
+# Holiday calendar (core.calendar): per-process cache lifetime; edits in this process clear it at once
+CALENDAR_CACHE_SECONDS = env("CALENDAR_CACHE_SECONDS", default=300, cast=int)
+# Dashboard rollups (core.rollups): refresh stale months in a background thread after commit (off = inline)
+ROLLUPS_REFRESH_IN_BACKGROUND = env("ROLLUPS_REFRESH_IN_BACKGROUND", default=True, cast=bool)
+
+# Payroll recalculation: delete the replaced line generation in a background thread (off = inline)
+PAYROLL_GC_IN_BACKGROUND = env("PAYROLL_GC_IN_BACKGROUND", default=True, cast=bool)
+# Payroll calculation lock (payroll.locking): a lock older than this is taken over as abandoned
+PAYROLL_LOCK_TIMEOUT = env("PAYROLL_LOCK_TIMEOUT", default=1800, cast=int)
+# Month close (payroll.closing): exports and the frozen zip of each closed month
+PAYROLL_ARCHIVE_DIR = Path(env("PAYROLL_ARCHIVE_DIR", default=str(BASE_DIR / "archive" / "payroll")))
+# Bank payment files (payroll.bank): paying account and payments per file before a new part starts
+PAYROLL_BANK_DEBIT_ACCOUNT = env("PAYROLL_BANK_DEBIT_ACCOUNT", default="")
+PAYROLL_BANK_ROWS_PER_FILE = env("PAYROLL_BANK_ROWS_PER_FILE", default=5000, cast=int)
+# Payslips (payroll.payslips): rendering processes; 0 = one per CPU
+PAYROLL_PAYSLIP_WORKERS = env("PAYROLL_PAYSLIP_WORKERS", default=0, cast=int)
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "{asctime} {levelname} {name} {message}", "style": "{"},
+        "raw": {"format": "{message}", "style": "{"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+        "slow_queries": {
+            "class": "core.slow_queries.SlowQueryFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "encoding": "utf-8",
+            "delay": True,
+            "formatter": "raw",
+        },
+    },
+    "loggers": {
+        "hrms": {"handlers": ["console"], "level": env("HRMS_LOG_LEVEL", default="INFO"), "propagate": False},
+        "hrms.slow_queries": {"handlers": ["slow_queries"], "level": "INFO", "propagate": False},
+    },
+}
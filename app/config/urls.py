@@ -17,6 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from core.views import dashboard_view, metrics_view, report_view, reports_view, slow_queries_view
+
 urlpatterns = [
+    path('admin/metrics', metrics_view, name='metrics'),
+    path('admin/dashboard/', admin.site.admin_view(dashboard_view), name='dashboard'),
+    path('admin/reports/', admin.site.admin_view(reports_view), name='reports'),
+    path('admin/reports/<slug:key>/', admin.site.admin_view(report_view), name='report'),
+    path('admin/slow-queries/', admin.site.admin_view(slow_queries_view), name='slow_queries'),
     path('admin/', admin.site.urls),
 ]
@@ -1,19 +1,96 @@
+import time
+
 from django.contrib import admin
-from .models import MonthConfig
-from core.jalali import JALALI_MONTHS_DARI
-from django.contrib import admin
+from django.shortcuts import render
+from django.urls import path
+from .models import Holiday, MonthConfig
+from .forms import MonthImportForm
+from .rollups import mark_stale_dates
+from core.jalali import JALALI_MONTHS_DARI, format_gregorian_to_jalali_with_day
+from jalali_date.admin import ModelAdminJalaliMixin
 
 class JalaliDateAdminMixin(admin.ModelAdmin):
     class Media:
         js = (
             "admin\js\disable_autocomplete.js",
         )
-        
+
+
+
+class RollupStaleAdminMixin:
+    """
+    For admins of dated rollup inputs (attendance, overtime): deleting rows marks
+    their months stale in core.rollups (saves are caught by post_save).
+    """
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        mark_stale_dates([obj.date])
+
+    def delete_queryset(self, request, queryset):
+        dates = set(queryset.values_list("date", flat=True))
+        super().delete_queryset(request, queryset)
+        mark_stale_dates(dates)
+
+
+class MonthImportAdminMixin:
+    """
+    Adds an "import/" admin page that feeds an uploaded .xlsx/.csv month file
+    to `import_function(fh, filename, jy, jm)` (see core.importing).
+    """
+    import_function = None
+    import_help = ""
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        custom = [
+            path("import/", self.admin_site.admin_view(self.import_view), name="%s_%s_import" % info),
+        ]
+        return custom + super().get_urls()
+
+    def import_view(self, request):
+        result = None
+        elapsed = None
+        if request.method == "POST":
+            form = MonthImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data["file"]
+                start = time.perf_counter()
+                try:
+                    result = type(self).import_function(
+                        upload, upload.name, form.cleaned_data["jy"], form.cleaned_data["jm"]
+                    )
+                except ValueError as exc:  # unreadable file (bad zip, wrong encoding)
+                    form.add_error("file", str(exc))
+                elapsed = time.perf_counter() - start
+        else:
+            form = MonthImportForm()
+
+        return render(request, "admin/import_form.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Import {self.model._meta.verbose_name_plural}",
+            "help": self.import_help,
+            "form": form,
+            "result": result,
+            "elapsed": elapsed,
+        })
+
 
 @admin.register(MonthConfig)
 class MonthConfigAdmin(admin.ModelAdmin):
-    list_display = ("year", "jalali_month", "daily_work_hours", "overtime_rate", "monthly_paid_leave_cap")
+    list_display = ("year", "jalali_month", "daily_work_hours", "overtime_rate", "monthly_paid_leave_cap", "working_days")
     def jalali_month(self, obj):
         return JALALI_MONTHS_DARI[obj.month]
     jalali_month.short_description = 'Month'
-    list_filter = ("year", "month")
\ No newline at end of file
+    list_filter = ("year", "month")
+
+
+@admin.register(Holiday)
+class HolidayAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.ModelAdmin):
+    list_display = ("jalali_date", "name", "department")
+    def jalali_date(self, obj):
+        return format_gregorian_to_jalali_with_day(obj.date)
+    jalali_date.short_description = "Date"
+    list_filter = ("department",)
+    search_fields = ("name",)
@@ -3,3 +3,26 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .slow_queries import install_slow_query_logger
+
+        connection_created.connect(install_slow_query_logger, dispatch_uid="core.slow_query_logger")
+
+        from django.db.models.signals import post_delete, post_save
+        from .calendar import clear_calendar_cache
+        from .models import Holiday, MonthConfig
+
+        for model in (Holiday, MonthConfig):
+            post_save.connect(clear_calendar_cache, sender=model, dispatch_uid=f"core.calendar.save.{model.__name__}")
+            post_delete.connect(clear_calendar_cache, sender=model, dispatch_uid=f"core.calendar.delete.{model.__name__}")
+
+        # rollup inputs: single-row saves mark their month stale; bulk writes call mark_stale
+        # themselves (no post_delete receiver, so bulk deletes stay fast deletes)
+        from attendance.models import AttendanceDay
+        from overtime.models import OvertimeEntry
+        from .rollups import mark_stale_on_save
+
+        for model in (AttendanceDay, OvertimeEntry):
+            post_save.connect(mark_stale_on_save, sender=model, dispatch_uid=f"core.rollups.save.{model.__name__}")
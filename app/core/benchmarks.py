@@ -0,0 +1,189 @@
+"""
+Benchmarks for the month-end hot paths (payroll calculation, the three XLSX exports,
+the two bulk grid POST handlers and the HTML payslip batch) on synthetic
+organizations of a given size.
+
+Run through `manage.py bench`; every case records wall time, query count and peak memory.
+Each case is set up and measured inside a savepoint that is rolled back afterwards,
+so every case (and the memory pass of a case) starts from the same seeded month.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import io
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client, override_settings
+
+from attendance.exports import build_attendance_xlsx
+from attendance.models import AttendanceDay
+from core.jalali import jalali_month_range
+from core.profiling import count_queries
+from core.seeding import seed_org
+from employees.models import Employee
+from overtime.exports import build_overtime_xlsx
+from overtime.models import OvertimeEntry
+from payroll.exports import build_payroll_xlsx
+from payroll.models import PayrollRun
+from payroll.payslips import write_payslips
+from payroll.services import calculate_payroll
+
+CASES = (
+    "calculate_payroll",
+    "build_payroll_xlsx",
+    "build_attendance_xlsx",
+    "build_overtime_xlsx",
+    "attendance_grid_post",
+    "overtime_grid_post",
+    "write_payslips",
+)
+
+
+def build_dataset(n_employees: int, jy: int, jm: int, seed: int = 1404):
+    """
+    One Jalali month of core.seeding data for `n_employees` employees.
+    Returns the DRAFT PayrollRun for that month.
+    """
+    seed_org(n_employees, [(jy, jm)], seed=seed, prefix="Bench ")
+    run, _ = PayrollRun.objects.get_or_create(year=jy, month=jm)
+    return run
+
+
+def _grid_post_data(jy: int, jm: int, employees, kind: str) -> dict:
+    """
+    A full-grid resubmission (what the browser sends), built from the stored rows.
+    """
+    rng = jalali_month_range(jy, jm)
+    if kind == "attendance":
+        model, prefix, field = AttendanceDay, "st", "status"
+    else:
+        model, prefix, field = OvertimeEntry, "ot", "hours"
+    stored = {
+        (e["employee_id"], e["date"]): e[field]
+        for e in model.objects.filter(date__range=(rng.g_start, rng.g_end)).values("employee_id", "date", field)
+    }
+    data = {"jy": jy, "jm": jm, "department_id": ""}
+    for emp in employees:
+        for d in range(1, rng.days + 1):
+            g_date = rng.g_start + dt.timedelta(days=d - 1)
+            data[f"{prefix}_{emp.id}_{d}"] = str(stored.get((emp.id, g_date), ""))
+    return data
+
+
+def _measure(fn, track_memory: bool) -> dict:
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with count_queries() as counter:
+            fn()
+    finally:
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else None
+        if track_memory:
+            tracemalloc.stop()
+    return {"wall_s": round(wall, 4), "queries": counter.count, "peak_kb": peak // 1024 if peak is not None else None}
+
+
+def _case_callables(case: str, run, employees, client):
+    """
+    Set up `case` (not measured) and return the callable to measure.
+    """
+    jy, jm = run.year, run.month
+
+    def save(wb):
+        wb.save(io.BytesIO())
+
+    if case == "calculate_payroll":
+        return lambda: calculate_payroll(run)
+    if case == "build_payroll_xlsx":
+        calculate_payroll(run)
+        return lambda: save(build_payroll_xlsx(run))
+    if case == "build_attendance_xlsx":
+        return lambda: save(build_attendance_xlsx(jy, jm, employees))
+    if case == "build_overtime_xlsx":
+        return lambda: save(build_overtime_xlsx(jy, jm, employees))
+    if case == "attendance_grid_post":
+        data = _grid_post_data(jy, jm, employees, "attendance")
+        return lambda: client.post("/admin/attendance/attendanceday/bulk/", data)
+    if case == "overtime_grid_post":
+        data = _grid_post_data(jy, jm, employees, "overtime")
+        return lambda: client.post("/admin/overtime/overtimeentry/bulk/", data)
+    if case == "write_payslips":
+        # PAYROLL_PAYSLIP_WORKERS decides between in-process rendering and the pool
+        calculate_payroll(run)
+        return lambda: write_payslips(run, io.BytesIO())
+    raise ValueError(f"unknown case {case}")
+
+
+def _run_case(case: str, run, employees, client, track_memory: bool) -> dict:
+    with transaction.atomic():
+        run.refresh_from_db()
+        result = _measure(_case_callables(case, run, employees, client), track_memory)
+        transaction.set_rollback(True)
+    return result
+
+
+def run_size(n_employees: int, cases=CASES, jy: int = 1404, jm: int = 7, track_memory: bool = True, log=print) -> dict:
+    """
+    Build the dataset and run every case inside one transaction that is rolled back,
+    so sizes do not leak into each other.
+    """
+    results = {}
+    with override_settings(DATA_UPLOAD_MAX_NUMBER_FIELDS=None, REQUEST_METRICS_SAMPLE_RATE=0), transaction.atomic():
+        start = time.perf_counter()
+        run = build_dataset(n_employees, jy, jm)
+        log(f"  dataset {n_employees} employees built in {time.perf_counter() - start:.1f}s")
+
+        employees = list(
+            Employee.objects.filter(status=Employee.Status.WORKING)
+            .select_related("department", "position")
+            .order_by("first_name", "father_name", "id")
+        )
+        user = get_user_model().objects.create_superuser("bench", "bench@example.com", "bench")
+        client = Client()
+        client.force_login(user)
+
+        for case in cases:
+            result = _run_case(case, run, employees, client, track_memory=False)
+            if track_memory:
+                # separate pass: tracemalloc slows Python down and would skew wall time
+                result["peak_kb"] = _run_case(case, run, employees, client, track_memory=True)["peak_kb"]
+            results[case] = result
+            log(f"  {case:<24} {result['wall_s']:>9.3f}s {result['queries']:>8} queries {result['peak_kb'] or '-':>9} KB")
+
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Regressions of `current` vs `baseline` (both {size: {case: metrics}}), e.g. threshold=0.2 -> +20%.
+    """
+    regressions = []
+    for size, cases in current.items():
+        for case, metrics in cases.items():
+            base = baseline.get(size, {}).get(case)
+            if not base:
+                continue
+            for key in ("wall_s", "queries", "peak_kb"):
+                new, old = metrics.get(key), base.get(key)
+                if new is None or not old:
+                    continue
+                if new > old * (1 + threshold):
+                    regressions.append(f"{size} employees / {case}: {key} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def save_results(path: Path, results: dict, meta: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+
+
+def load_results(path: Path) -> dict:
+    return json.loads(path.read_text())["results"]
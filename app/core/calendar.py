@@ -0,0 +1,121 @@
+"""
+Working-day calendar per Jalali month: Fridays, org-wide and department holidays
+(core.models.Holiday) and the working-day count used for the daily rate.
+
+Calendars are cached in memory per process for CALENDAR_CACHE_SECONDS and dropped
+when a Holiday or MonthConfig is saved/deleted in this process. Other processes may
+see an edit only when their copy expires, so code that stores results computed from
+the calendar (payroll, rollups, month close) asks for `fresh=True`, which reads the
+database and refreshes this process's copy.
+
+    cal = month_calendar(1404, 1)
+    cal.is_working_day(date, department_id)
+    cal.working_days(department_id)
+"""
+from __future__ import annotations
+
+import datetime as dt
+import threading
+import time
+from dataclasses import dataclass
+
+import jdatetime
+from django.conf import settings
+
+from .jalali import jalali_month_range
+
+_cache: dict[tuple[int, int], tuple[float, "MonthCalendar"]] = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MonthCalendar:
+    jy: int
+    jm: int
+    g_start: dt.date
+    g_end: dt.date
+    days: int
+    holidays: dict  # date -> name (org-wide)
+    department_holidays: dict  # department_id -> {date: name}
+    working_days_override: int | None
+    working_day_counts: dict  # department_id (None = org) -> count
+
+    def dates(self) -> list[dt.date]:
+        return [self.g_start + dt.timedelta(days=i) for i in range(self.days)]
+
+    def holiday(self, d: dt.date, department_id: int | None = None) -> str | None:
+        name = self.holidays.get(d)
+        if name is None and department_id is not None:
+            name = self.department_holidays.get(department_id, {}).get(d)
+        return name
+
+    def is_working_day(self, d: dt.date, department_id: int | None = None) -> bool:
+        return d.weekday() != 4 and self.holiday(d, department_id) is None
+
+    def working_days(self, department_id: int | None = None) -> int:
+        """
+        Divisor of the daily rate: MonthConfig.working_days when set, otherwise
+        days that are neither Friday nor a holiday (for the department).
+        """
+        if self.working_days_override:
+            return self.working_days_override
+        return self.working_day_counts.get(department_id, self.working_day_counts[None])
+
+
+def _load(jy: int, jm: int) -> MonthCalendar:
+    from .models import Holiday, MonthConfig
+
+    rng = jalali_month_range(jy, jm)
+    holidays, department_holidays = {}, {}
+    for d, name, department_id in Holiday.objects.filter(
+        date__range=(rng.g_start, rng.g_end)
+    ).values_list("date", "name", "department_id"):
+        if department_id is None:
+            holidays[d] = name
+        else:
+            department_holidays.setdefault(department_id, {})[d] = name
+
+    dates = [rng.g_start + dt.timedelta(days=i) for i in range(rng.days)]
+    base = [d for d in dates if d.weekday() != 4 and d not in holidays]
+    counts = {None: len(base)}
+    for department_id, extra in department_holidays.items():
+        counts[department_id] = sum(1 for d in base if d not in extra)
+
+    override = MonthConfig.objects.filter(year=jy, month=jm).values_list("working_days", flat=True).first()
+
+    return MonthCalendar(
+        jy=jy,
+        jm=jm,
+        g_start=rng.g_start,
+        g_end=rng.g_end,
+        days=rng.days,
+        holidays=holidays,
+        department_holidays=department_holidays,
+        working_days_override=override,
+        working_day_counts=counts,
+    )
+
+
+def month_calendar(jy: int, jm: int, fresh: bool = False) -> MonthCalendar:
+    ttl = getattr(settings, "CALENDAR_CACHE_SECONDS", 300)
+    now = time.monotonic()
+    hit = _cache.get((jy, jm))
+    if hit and not fresh and now - hit[0] < ttl:
+        return hit[1]
+    cal = _load(jy, jm)
+    with _lock:
+        _cache[(jy, jm)] = (now, cal)
+    return cal
+
+
+def calendar_for_date(d: dt.date) -> MonthCalendar:
+    j = jdatetime.date.fromgregorian(date=d)
+    return month_calendar(j.year, j.month)
+
+
+def clear_calendar_cache(**kwargs):
+    """
+    post_save / post_delete receiver for Holiday and MonthConfig.
+    """
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,13 @@
+from django import forms
+
+
+class MonthImportForm(forms.Form):
+    jy = forms.IntegerField(label="Jalali Year", min_value=1300, max_value=1600, initial=1404)
+    jm = forms.IntegerField(label="Jalali Month", min_value=1, max_value=12, initial=1)
+    file = forms.FileField(label="File (.xlsx or .csv)")
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        if not f.name.lower().endswith((".xlsx", ".csv")):
+            raise forms.ValidationError("Upload an .xlsx or .csv file.")
+        return f
@@ -0,0 +1,127 @@
+"""
+Shared pieces of the spreadsheet import pipeline (attendance, overtime, bonuses, prepaids).
+
+Files are read as a row generator (openpyxl's read_only reader, or csv), validated
+and written in chunks, so memory stays bounded whatever the file size.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import zipfile
+from dataclasses import dataclass, field
+from itertools import islice
+from xml.etree.ElementTree import ParseError
+
+from django.db import transaction
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from employees.models import Employee
+
+MAX_ERRORS = 1000
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    upserted: int = 0
+    deleted: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    error_count: int = 0
+
+    def error(self, row_number: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((row_number, message))
+
+    def finish(self) -> "ImportResult":
+        """
+        Called at the end of an atomic import: any rejected row rolls back the whole file.
+        """
+        if self.error_count:
+            transaction.set_rollback(True)
+            self.upserted = self.deleted = 0
+        return self
+
+
+def _iter_xlsx_rows(fh):
+    """
+    Stream the first worksheet with openpyxl's read_only reader; values only (cached
+    formula results). The recorded sheet size is ignored, since some writers store
+    a wrong one and rows would be cut to it.
+    """
+    wb = load_workbook(fh, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        for number, row in enumerate(ws.iter_rows(values_only=True), start=1):
+            yield number, list(row)
+    finally:
+        wb.close()
+
+
+def iter_rows(fh, filename: str):
+    """
+    Yield (row_number, [cell values]) for .xlsx (first sheet) or .csv files.
+    Row numbers are 1-based like in the spreadsheet.
+    """
+    if filename.lower().endswith(".csv"):
+        text = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+        for number, row in enumerate(csv.reader(text), start=1):
+            yield number, row
+        text.detach()
+        return
+
+    try:
+        yield from _iter_xlsx_rows(fh)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, IndexError, ParseError) as exc:
+        raise ValueError(f"{filename} is not a readable .xlsx file") from exc
+
+
+def chunked(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_employee_id(value, employee_ids: set[int]) -> int:
+    """
+    Raise ValueError with a readable message when the id is missing or unknown.
+    """
+    text = cell_text(value)
+    if not text:
+        raise ValueError("missing Employee ID")
+    try:
+        emp_id = int(text)
+    except ValueError:
+        raise ValueError(f"Employee ID {text!r} is not a number") from None
+    if emp_id not in employee_ids:
+        raise ValueError(f"unknown Employee ID {emp_id}")
+    return emp_id
+
+
+def employee_id_set() -> set[int]:
+    """
+    All employee ids, loaded once per import (instead of one lookup per row).
+    """
+    return set(Employee.objects.values_list("id", flat=True))
+
+
+def header_index(header: list, *names: str) -> int | None:
+    wanted = {n.lower() for n in names}
+    for i, value in enumerate(header):
+        if cell_text(value).lower() in wanted:
+            return i
+    return None
@@ -0,0 +1,74 @@
+import platform
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.test.runner import DiscoverRunner
+from django.utils import timezone
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark payroll calculation, XLSX exports and bulk grid saves on synthetic data "
+        "(throwaway test database) and compare against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000", help="Employee counts, comma separated.")
+        parser.add_argument("--cases", default=",".join(benchmarks.CASES), help="Cases to run, comma separated.")
+        parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory pass.")
+        parser.add_argument("--output", default=str(settings.BASE_DIR / "bench_results" / "latest.json"))
+        parser.add_argument("--baseline", default=str(settings.BASE_DIR / "bench_results" / "baseline.json"))
+        parser.add_argument("--threshold", type=float, default=0.20, help="Allowed slowdown vs baseline (0.2 = +20%%).")
+        parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+
+    def handle(self, *args, **opts):
+        sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+        cases = [c.strip() for c in opts["cases"].split(",") if c.strip()]
+        unknown = set(cases) - set(benchmarks.CASES)
+        if unknown:
+            raise CommandError(f"Unknown cases: {', '.join(sorted(unknown))}")
+
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            results = {}
+            for size in sizes:
+                self.stdout.write(f"{size} employees")
+                results[str(size)] = benchmarks.run_size(
+                    size, cases=cases, track_memory=not opts["no_memory"], log=self.stdout.write
+                )
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        meta = {
+            "at": timezone.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "db": connection.vendor,
+        }
+        output = Path(opts["output"])
+        benchmarks.save_results(output, results, meta)
+        self.stdout.write(f"Results written to {output}")
+
+        baseline = Path(opts["baseline"])
+        if opts["save_baseline"]:
+            benchmarks.save_results(baseline, results, meta)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline}"))
+            return
+
+        if not baseline.exists():
+            self.stdout.write("No baseline to compare against (use --save-baseline).")
+            return
+
+        regressions = benchmarks.compare(results, benchmarks.load_results(baseline), opts["threshold"])
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f"{len(regressions)} regression(s) over {opts['threshold']:.0%}")
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
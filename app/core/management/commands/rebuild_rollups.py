@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollups import current_month, last_months, refresh_month
+
+
+class Command(BaseCommand):
+    help = "Recompute the department x month dashboard rollups of the last N Jalali months."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=24, help="Number of months back from the current one.")
+        parser.add_argument("--until", help="Last month as YYYY-MM (Jalali); default: the current month.")
+
+    def handle(self, *args, **opts):
+        if opts["months"] < 1:
+            raise CommandError("--months must be positive")
+        if opts["until"]:
+            try:
+                jy, jm = (int(p) for p in opts["until"].split("-"))
+            except ValueError:
+                raise CommandError("--until must look like 1404-06") from None
+            if not 1 <= jm <= 12:
+                raise CommandError("--until month must be 1-12")
+        else:
+            jy, jm = current_month()
+
+        for year, month in last_months(jy, jm, opts["months"]):
+            rows = refresh_month(year, month)
+            if opts["verbosity"] > 1:
+                self.stdout.write(f"{year}-{month:02d}: {rows} department(s)")
+        self.stdout.write(self.style.SUCCESS(f"{opts['months']} month(s) rebuilt up to {jy}-{jm:02d}."))
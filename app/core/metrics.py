@@ -0,0 +1,199 @@
+"""
+In-process metrics shared across worker processes through a small SQLite file
+(settings.METRICS_DB), rendered in the Prometheus text format by /admin/metrics.
+
+inc/observe only add to a per-process buffer; a background thread writes it to the
+file every METRICS_FLUSH_SECONDS (and at exit), so a locked metrics file never
+stalls a request. A failed flush keeps the samples for the next one.
+
+    from core import metrics
+    metrics.inc("hrms_export_bytes_total", len(data), kind="payroll")
+    with metrics.timed("hrms_export_seconds", kind="payroll"):
+        ...
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger("hrms.metrics")
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (10, 50, 100, 500, 1000, 2500, 5000, 10000, 25000)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "hrms_payroll_calculation_seconds": ("histogram", "Duration of calculate_payroll.", SECONDS_BUCKETS),
+    "hrms_payroll_lines_written": ("histogram", "Payroll lines written per calculation.", COUNT_BUCKETS),
+    "hrms_payroll_calculations_coalesced_total": ("counter", "Calculation requests answered by one already in flight.", None),
+    "hrms_export_seconds": ("histogram", "XLSX export generation time by kind.", SECONDS_BUCKETS),
+    "hrms_export_bytes_total": ("counter", "XLSX export bytes produced by kind.", None),
+    "hrms_grid_save_seconds": ("histogram", "Bulk grid save duration by grid.", SECONDS_BUCKETS),
+    "hrms_grid_save_cells_total": ("counter", "Bulk grid cells processed on save by grid.", None),
+    "hrms_leave_sync_days_total": ("counter", "Attendance days written by leave sync.", None),
+    "hrms_punches_ingested_total": ("counter", "Time-clock punches read from device files (before dedup).", None),
+    "hrms_punch_days_derived_total": ("counter", "Days folded from punches into attendance/overtime.", None),
+}
+
+_local = threading.local()
+_buffer: dict[tuple[str, str, str], float] = {}
+_buffer_lock = threading.Lock()
+_flusher_pid = None  # process that started the flush thread (a forked child starts its own)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    suffix TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, suffix)
+)
+"""
+_UPSERT = """
+INSERT INTO samples (name, labels, suffix, value) VALUES (?, ?, ?, ?)
+ON CONFLICT (name, labels, suffix) DO UPDATE SET value = value + excluded.value
+"""
+
+
+def _db() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        Path(settings.METRICS_DB).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(settings.METRICS_DB), timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _labels(labels: dict) -> str:
+    return ",".join(f'{k}="{labels[k]}"' for k in sorted(labels))
+
+
+def flush():
+    """
+    Write this process's buffered samples in one transaction.
+    """
+    with _buffer_lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+    if not pending:
+        return
+    try:
+        conn = _db()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(_UPSERT, [(*key, value) for key, value in pending.items()])
+    except sqlite3.Error as exc:  # metrics must never break a request
+        logger.warning("metrics write failed: %s", exc)
+        _add(pending.items())
+
+
+def _flush_forever():
+    while True:
+        time.sleep(getattr(settings, "METRICS_FLUSH_SECONDS", 5))
+        flush()
+
+
+def _start_flusher():
+    global _flusher_pid
+    with _buffer_lock:
+        if _flusher_pid == os.getpid():
+            return
+        if _flusher_pid is not None:
+            _buffer.clear()  # forked: the parent flushes what it had buffered
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_forever, name="metrics-flush", daemon=True).start()
+
+
+def _add(items):
+    with _buffer_lock:
+        for key, value in items:
+            _buffer[key] = _buffer.get(key, 0.0) + value
+
+
+def _write(rows):
+    if _flusher_pid != os.getpid():
+        _start_flusher()
+    _add(((name, labels, suffix), value) for name, labels, suffix, value in rows)
+
+
+atexit.register(flush)
+
+
+def inc(name: str, value: float = 1, **labels):
+    _write([(name, _labels(labels), "", float(value))])
+
+
+def observe(name: str, value: float, **labels):
+    _, _, buckets = METRICS[name]
+    key = _labels(labels)
+    rows = [(name, key, f"le:{b}", 1.0) for b in buckets if value <= b]
+    rows += [
+        (name, key, "le:+Inf", 1.0),
+        (name, key, "sum", float(value)),
+        (name, key, "count", 1.0),
+    ]
+    _write(rows)
+
+
+@contextmanager
+def timed(name: str, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _join_labels(labels: str, extra: str = "") -> str:
+    parts = [p for p in (labels, extra) if p]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    # full precision: "%g" would print 12345678 as 1.23457e+07
+    value = float(value)
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(value)
+
+
+def render_exposition() -> str:
+    """
+    Prometheus text exposition (version 0.0.4) of all stored samples.
+    """
+    flush()
+    try:
+        rows = _db().execute("SELECT name, labels, suffix, value FROM samples").fetchall()
+    except sqlite3.Error as exc:
+        logger.warning("metrics read failed: %s", exc)
+        rows = []
+
+    by_name = {}
+    for name, labels, suffix, value in rows:
+        by_name.setdefault(name, {}).setdefault(labels, {})[suffix] = value
+
+    out = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        for labels, values in sorted(by_name.get(name, {}).items()):
+            if kind == "counter":
+                out.append(f"{name}{_join_labels(labels)} {_number(values.get('', 0.0))}")
+                continue
+            for b in [*buckets, "+Inf"]:
+                le = 'le="%s"' % b
+                out.append(f"{name}_bucket{_join_labels(labels, le)} {_number(values.get(f'le:{b}', 0.0))}")
+            out.append(f"{name}_sum{_join_labels(labels)} {_number(values.get('sum', 0.0))}")
+            out.append(f"{name}_count{_join_labels(labels)} {_number(values.get('count', 0.0))}")
+    return "\n".join(out) + "\n"
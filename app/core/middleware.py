@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from core.profiling import QueryCounter, count_queries
+
+logger = logging.getLogger("hrms.requests")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised (when QUERY_BUDGET_STRICT is on, e.g. in tests) if a view runs more
+    queries than its entry in QUERY_BUDGETS allows.
+    """
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request SQL count, DB time, Python time and (process) peak memory.
+
+    - Emits `Server-Timing` + `X-DB-Queries` headers and one log line on "hrms.requests".
+      The headers go to staff users, and to everyone only when REQUEST_METRICS_HEADERS
+      is on (default: DEBUG).
+    - Streaming responses are measured until their body is exhausted; their headers are
+      sent before that, so they only get the log line.
+    - Only REQUEST_METRICS_SAMPLE_RATE of requests are measured (1.0 = all).
+    - Peak memory uses tracemalloc, so it is only tracked when REQUEST_METRICS_TRACK_MEMORY is on.
+      tracemalloc is process-wide: the figure is the process's peak Python allocation while
+      the request ran (process_peak_kb), which includes other requests served by threads of
+      the same process. It is the request's own peak only with one thread per process.
+    - QUERY_BUDGETS maps a view name ("admin:attendance_bulk") to its max query count.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # settings are read per request so tests can use override_settings
+        sample_rate = float(getattr(settings, "REQUEST_METRICS_SAMPLE_RATE", 1.0))
+        if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+            return self.get_response(request)
+
+        # tracemalloc is process-wide: only the request that started it may stop it
+        track_memory = getattr(settings, "REQUEST_METRICS_TRACK_MEMORY", False)
+        own_trace = track_memory and not tracemalloc.is_tracing()
+        if own_trace:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        counter = QueryCounter()
+        try:
+            with count_queries(counter):
+                response = self.get_response(request)
+        except BaseException:
+            if own_trace:
+                tracemalloc.stop()
+            raise
+
+        if response.streaming and not getattr(response, "is_async", False):
+            response.streaming_content = self._measured_body(
+                request, response, response.streaming_content, counter, start, own_trace,
+            )
+            return response
+        self._record(request, response, counter, start, own_trace, headers=not response.streaming)
+        return response
+
+    def _measured_body(self, request, response, content, counter, start, own_trace):
+        try:
+            with count_queries(counter):
+                yield from content
+        finally:
+            self._record(request, response, counter, start, own_trace, headers=False)
+
+    def _record(self, request, response, counter, start, own_trace: bool, headers: bool):
+        process_peak_kb = None
+        if own_trace:
+            process_peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+        total = time.perf_counter() - start
+        db_ms = counter.duration * 1000
+        total_ms = total * 1000
+        app_ms = max(0.0, total_ms - db_ms)
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else ""
+
+        if headers and _show_headers(request):
+            response["Server-Timing"] = (
+                f'db;dur={db_ms:.1f};desc="{counter.count} queries", '
+                f"app;dur={app_ms:.1f}, total;dur={total_ms:.1f}"
+            )
+            response["X-DB-Queries"] = str(counter.count)
+            if process_peak_kb is not None:
+                response["X-Process-Peak-Memory-KB"] = str(process_peak_kb)
+
+        logger.info(
+            "request method=%s path=%s view=%s status=%s queries=%d db_ms=%.1f app_ms=%.1f total_ms=%.1f process_peak_kb=%s",
+            request.method, request.path, view_name or "-", response.status_code,
+            counter.count, db_ms, app_ms, total_ms, process_peak_kb if process_peak_kb is not None else "-",
+            extra={
+                "view": view_name,
+                "queries": counter.count,
+                "db_ms": round(db_ms, 1),
+                "app_ms": round(app_ms, 1),
+                "total_ms": round(total_ms, 1),
+                "process_peak_kb": process_peak_kb,
+            },
+        )
+
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(view_name)
+        if budget is not None and counter.count > budget:
+            msg = f"{view_name} ran {counter.count} queries (budget {budget}) for {request.method} {request.path}"
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(msg)
+            logger.warning("query budget exceeded: %s", msg)
+
+
+def _show_headers(request) -> bool:
+    if getattr(settings, "REQUEST_METRICS_HEADERS", settings.DEBUG):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_active and user.is_staff)
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_remove_monthconfig_holidays_count'),
+        ('org', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthconfig',
+            name='working_days',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=120)),
+                ('department', models.ForeignKey(blank=True, help_text='Leave empty for a holiday of the whole organization.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='org.department')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('department__isnull', True)), fields=('date',), name='core_holiday_unique_org_date')],
+                'unique_together': {('date', 'department')},
+            },
+        ),
+    ]
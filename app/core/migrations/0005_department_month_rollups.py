@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_monthconfig_working_days_holiday'),
+        ('org', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('stale', models.BooleanField(default=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+                'unique_together': {('year', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DepartmentMonthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('payroll_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('overtime_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('overtime_hours', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('absent_days', models.PositiveIntegerField(default=0)),
+                ('leave_days', models.PositiveIntegerField(default=0)),
+                ('scheduled_days', models.PositiveIntegerField(default=0)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='month_rollups', to='org.department')),
+            ],
+            options={
+                'ordering': ['-year', '-month', 'department__name'],
+                'indexes': [models.Index(fields=['year', 'month'], name='core_depart_year_fd8876_idx')],
+                'unique_together': {('department', 'year', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.2 on 2026-10-19 18:10
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Max
+
+STILL_EMPLOYED = ("WORKING", "SUSPENDED")
+
+
+def holidays_from_attendance(apps, schema_editor):
+    """
+    Turn the per-employee AttendanceDay(HOLIDAY) rows of the old scheme into Holiday
+    rows, so earlier months keep their working-day count: a date marked for every
+    employee of a department employed on it becomes a department holiday, or an
+    org-wide one when every department is covered. Rows of individual employees are
+    left as they are.
+
+    Employees have no leaving date, so someone who has left (not WORKING or SUSPENDED)
+    counts as employed from their hiring date to their last AttendanceDay row.
+    """
+    AttendanceDay = apps.get_model("attendance", "AttendanceDay")
+    Employee = apps.get_model("employees", "Employee")
+    Holiday = apps.get_model("core", "Holiday")
+
+    marked = defaultdict(set)
+    names = {}
+    for employee_id, d, note in (
+        AttendanceDay.objects.filter(status="HOLIDAY").values_list("employee_id", "date", "note").iterator()
+    ):
+        marked[d].add(employee_id)
+        if note:
+            names.setdefault(d, note[:120])
+    if not marked:
+        return
+    last_seen = dict(
+        AttendanceDay.objects.values("employee_id").annotate(last=Max("date")).values_list("employee_id", "last")
+    )
+    employees = []
+    for employee_id, department_id, hired, status in Employee.objects.values_list(
+        "id", "department_id", "date_hired", "status"
+    ):
+        if status in STILL_EMPLOYED:
+            employees.append((employee_id, department_id, hired, None))
+        elif employee_id in last_seen:
+            employees.append((employee_id, department_id, hired, last_seen[employee_id]))
+
+    for d, employee_ids in sorted(marked.items()):
+        staff = defaultdict(set)
+        for employee_id, department_id, hired, left in employees:
+            if hired <= d and (left is None or d <= left):
+                staff[department_id].add(employee_id)
+        covered = {department_id for department_id, members in staff.items() if members <= employee_ids}
+        if not covered:
+            continue
+        name = names.get(d, "Holiday")
+        if covered == set(staff):
+            holidays = [Holiday(date=d, name=name)]
+        else:
+            holidays = [Holiday(date=d, name=name, department_id=department_id) for department_id in covered]
+        Holiday.objects.bulk_create(holidays, ignore_conflicts=True)
+        replaced = set().union(*(staff[department_id] for department_id in covered))
+        AttendanceDay.objects.filter(status="HOLIDAY", date=d, employee_id__in=replaced).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_punchday_punchfile_rawpunch'),
+        ('core', '0005_department_month_rollups'),
+        ('employees', '0003_employee_bank_account'),
+    ]
+
+    operations = [
+        migrations.RunPython(holidays_from_attendance, migrations.RunPython.noop),
+    ]
@@ -11,9 +11,87 @@ class MonthConfig(models.Model):
     # ✅ Monthly paid leave cap (your current rule: 5)
     monthly_paid_leave_cap = models.PositiveSmallIntegerField(default=5)
 
+    # daily rate divisor; empty = days in month - Fridays - org-wide holidays (see core.calendar)
+    working_days = models.PositiveSmallIntegerField(null=True, blank=True)
+
     class Meta:
         unique_together = ("year", "month")
         ordering = ["-year", "-month"]
 
     def __str__(self):
-        return f"{self.year}-{self.month:02d}"
\ No newline at end of file
+        return f"{self.year}-{self.month:02d}"
+
+
+class Holiday(models.Model):
+    """
+    A public (org-wide) or department holiday. Read through core.calendar;
+    nothing is stored per employee.
+    """
+    date = models.DateField()
+    name = models.CharField(max_length=120)
+    department = models.ForeignKey(
+        "org.Department", on_delete=models.CASCADE, null=True, blank=True, related_name="holidays",
+        help_text="Leave empty for a holiday of the whole organization.",
+    )
+
+    class Meta:
+        unique_together = ("date", "department")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date"], condition=models.Q(department__isnull=True), name="core_holiday_unique_org_date"
+            ),
+        ]
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.date} {self.name}" + (f" ({self.department})" if self.department_id else "")
+
+
+class RollupMonth(models.Model):
+    """
+    A Jalali month of DepartmentMonthRollup. `stale` is set by writes to its inputs
+    (core.rollups.mark_stale) and cleared when the month is refreshed.
+    """
+    year = models.PositiveIntegerField()  # Jalali year
+    month = models.PositiveSmallIntegerField()  # Jalali month
+    stale = models.BooleanField(default=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("year", "month")
+        ordering = ["-year", "-month"]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d}"
+
+
+class DepartmentMonthRollup(models.Model):
+    """
+    Per department and Jalali month: payroll (active lines of the month's run),
+    attendance and overtime figures for the dashboard; see core.rollups.
+    """
+    department = models.ForeignKey("org.Department", on_delete=models.CASCADE, related_name="month_rollups")
+    year = models.PositiveIntegerField()  # Jalali year
+    month = models.PositiveSmallIntegerField()  # Jalali month
+
+    headcount = models.PositiveIntegerField(default=0)  # payroll lines, else WORKING employees
+    payroll_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum of line.total
+    net = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    overtime_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    overtime_hours = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    absent_days = models.PositiveIntegerField(default=0)
+    leave_days = models.PositiveIntegerField(default=0)
+    scheduled_days = models.PositiveIntegerField(default=0)  # headcount x working days
+
+    class Meta:
+        unique_together = ("department", "year", "month")
+        indexes = [models.Index(fields=["year", "month"])]
+        ordering = ["-year", "-month", "department__name"]
+
+    def __str__(self):
+        return f"{self.department} {self.year}-{self.month:02d}"
+
+    @property
+    def absence_rate(self):
+        return self.absent_days * 100 / self.scheduled_days if self.scheduled_days else None
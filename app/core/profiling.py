@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryCounter:
+    """
+    DB execute wrapper that counts statements and total DB time.
+    Install with `count_queries()` (all connections) or `connection.execute_wrapper(counter)`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+@contextmanager
+def count_queries(counter: QueryCounter | None = None):
+    """
+    Count queries on every configured DB connection inside the block.
+    """
+    counter = counter or QueryCounter()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(counter))
+        yield counter
+
+
+class Span:
+    __slots__ = ("name", "wall_ms", "queries", "rows")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_ms = 0.0
+        self.queries = 0
+        self.rows = 0  # set by the caller inside the block
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "wall_ms": round(self.wall_ms, 1), "queries": self.queries, "rows": self.rows}
+
+
+class Profiler:
+    """
+    Collects phase spans (wall time, query count, rows processed).
+
+        profiler = Profiler()
+        with profiler.span("load_inputs") as span:
+            employees = list(...)
+            span.rows = len(employees)
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(self, name: str):
+        span = Span(name)
+        start = time.perf_counter()
+        try:
+            with count_queries() as counter:
+                yield span
+        finally:
+            span.wall_ms = (time.perf_counter() - start) * 1000
+            span.queries = counter.count
+            self.spans.append(span)
+
+    def as_list(self) -> list[dict]:
+        return [s.as_dict() for s in self.spans]
@@ -0,0 +1,102 @@
+"""
+Reports offered under /admin/reports/ (see core.reports for the builder). INT and
+MONEY columns are right-aligned and totalled; ids and periods are left as TEXT.
+"""
+from django.db.models import Count, F, Q, Sum
+
+from employees.models import Employee
+from payroll.models import PayrollLine
+
+from .models import DepartmentMonthRollup
+from .reports import INT, MONEY, Column, Filter, ReportDefinition
+
+YEAR = Filter("jy", "Jalali year", "year", required=True)
+MONTH = Filter("jm", "Jalali month", "month", choices=tuple((m, str(m)) for m in range(1, 13)))
+
+PAYROLL_BY_DEPARTMENT = ReportDefinition(
+    key="payroll_by_department",
+    title="Payroll by department",
+    description="Active payroll lines of the year (or month) summed per department the lines were calculated in.",
+    model=PayrollLine,
+    where=Q(generation=F("run__version")),
+    filters=(YEAR, MONTH),
+    columns=(
+        # grouped by id: departments may share a name
+        Column("department_id", "Department ID"),
+        Column("department_name", "Department", "department__name"),
+        Column("lines", "Lines", "id", aggregate=Count, kind=INT),
+        Column("base", "Base", "base_salary", aggregate=Sum, kind=MONEY),
+        Column("deduction", "Attendance Deduction", "attendance_deduction", aggregate=Sum, kind=MONEY),
+        Column("overtime_pay", "Overtime", "overtime", aggregate=Sum, kind=MONEY),
+        Column("bonuses", "Bonus", "bonus", aggregate=Sum, kind=MONEY),
+        Column("gross", "Total", "total", aggregate=Sum, kind=MONEY),
+        Column("taxes", "Tax", "tax", aggregate=Sum, kind=MONEY),
+        Column("net", "Amount to Pay", "amount_to_pay", aggregate=Sum, kind=MONEY),
+    ),
+    order_by=("department_name", "department_id"),
+)
+
+PAYROLL_LINES = ReportDefinition(
+    key="payroll_lines",
+    title="Payroll lines",
+    description="One row per employee and month with the line amounts.",
+    model=PayrollLine,
+    where=Q(generation=F("run__version")),
+    filters=(YEAR, MONTH, Filter("department", "Department ID", "department_id")),
+    columns=(
+        Column("year", "Year"),
+        Column("month", "Month"),
+        Column("employee_id", "Employee ID"),
+        Column("first_name", "First Name", "employee__first_name"),
+        Column("father_name", "Father Name", "employee__father_name"),
+        Column("department_name", "Department", "department__name"),
+        Column("gross", "Total", "total", kind=MONEY),
+        Column("tax", "Tax", kind=MONEY),
+        Column("net", "Amount to Pay", "amount_to_pay", kind=MONEY),
+    ),
+    order_by=("year", "month", "department_name", "first_name", "employee_id"),
+)
+
+EMPLOYEE_ROSTER = ReportDefinition(
+    key="employee_roster",
+    title="Employee roster",
+    description="Employees with department, position, type and base salary.",
+    model=Employee,
+    filters=(
+        Filter("status", "Status", "status", cast=str, choices=tuple(Employee.Status.choices)),
+        Filter("department", "Department ID", "department_id"),
+    ),
+    columns=(
+        Column("id", "Employee ID"),
+        Column("first_name", "First Name"),
+        Column("father_name", "Father Name"),
+        Column("department_name", "Department", "department__name"),
+        Column("position_name", "Position", "position__name"),
+        Column("employee_type", "Type"),
+        Column("status", "Status"),
+        Column("base_salary", "Base Salary", kind=MONEY),
+    ),
+    order_by=("department_name", "first_name", "id"),
+)
+
+DEPARTMENT_YEAR = ReportDefinition(
+    key="department_year",
+    title="Department year summary",
+    description="Dashboard rollups of the year per department: cost, overtime hours and absence.",
+    model=DepartmentMonthRollup,
+    filters=(YEAR,),
+    columns=(
+        Column("department_id", "Department ID"),
+        Column("department_name", "Department", "department__name"),
+        Column("months", "Months", "id", aggregate=Count, kind=INT),
+        Column("cost", "Payroll Cost", "payroll_cost", aggregate=Sum, kind=MONEY),
+        Column("taxes", "Tax", "tax", aggregate=Sum, kind=MONEY),
+        Column("ot_hours", "Overtime Hours", "overtime_hours", aggregate=Sum, kind=MONEY),
+        Column("absent", "Absent Days", "absent_days", aggregate=Sum, kind=INT),
+        Column("leave", "Leave Days", "leave_days", aggregate=Sum, kind=INT),
+        Column("scheduled", "Scheduled Days", "scheduled_days", aggregate=Sum, kind=INT),
+    ),
+    order_by=("department_name", "department_id"),
+)
+
+REPORTS = {r.key: r for r in (PAYROLL_BY_DEPARTMENT, PAYROLL_LINES, EMPLOYEE_ROSTER, DEPARTMENT_YEAR)}
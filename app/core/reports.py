@@ -0,0 +1,195 @@
+"""
+Declarative reports: a ReportDefinition names a base model, fixed conditions, the
+filters a user may set, and the columns. build_query compiles it into a single
+values()/annotate() query that selects only those columns; when some columns
+aggregate, the other columns are the GROUP BY. Rows are then streamed to an HTML
+table, CSV or a write-only XLSX workbook without loading model instances.
+
+    PAYROLL_BY_DEPARTMENT = ReportDefinition(
+        key="payroll_by_department",
+        title="Payroll by department",
+        model=PayrollLine,
+        where=Q(generation=F("run__version")),
+        filters=(Filter("jy", "Jalali year", "year", required=True),),
+        columns=(
+            Column("department", "Department", "employee__department__name"),
+            Column("net", "Net", "amount_to_pay", aggregate=Sum, kind=MONEY),
+        ),
+    )
+
+The definitions in use are in core.report_catalog.
+"""
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass, field
+
+from django.db import models
+from django.db.models import F, Q
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+
+from .importing import chunked
+
+TEXT, INT, MONEY = "text", "int", "money"
+HEADER_FILL = PatternFill("solid", fgColor="D9EAD3")  # header of every XLSX export
+CHUNK_SIZE = 2000
+
+
+class ReportError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Column:
+    key: str
+    label: str
+    source: str | None = None  # ORM path from the base model; defaults to `key`
+    aggregate: type | None = None  # Sum, Count, Avg, Max, ...
+    kind: str = TEXT
+
+    @property
+    def path(self) -> str:
+        return self.source or self.key
+
+    def expression(self):
+        return self.aggregate(self.path) if self.aggregate else F(self.path)
+
+
+@dataclass(frozen=True)
+class Filter:
+    param: str  # query-string name
+    label: str
+    lookup: str  # ORM lookup the value is matched with, e.g. "employee__department_id"
+    cast: type = int
+    required: bool = False
+    choices: tuple = ()  # ((value, label), ...) for a select; empty = free input
+
+    def parse(self, raw: str | None):
+        if raw in (None, ""):
+            if self.required:
+                raise ReportError(f"{self.label} is required.")
+            return None
+        try:
+            value = self.cast(raw)
+        except (TypeError, ValueError):
+            raise ReportError(f"Invalid {self.label}: {raw!r}") from None
+        if self.choices and value not in {v for v, _ in self.choices}:
+            raise ReportError(f"Invalid {self.label}: {raw!r}")
+        return value
+
+
+@dataclass(frozen=True)
+class ReportDefinition:
+    key: str
+    title: str
+    model: type[models.Model]
+    columns: tuple[Column, ...]
+    filters: tuple[Filter, ...] = ()
+    where: Q = field(default_factory=Q)
+    order_by: tuple[str, ...] = ()  # column keys, "-key" for descending
+    description: str = ""
+
+    @property
+    def grouped(self) -> bool:
+        return any(c.aggregate for c in self.columns)
+
+    @property
+    def group_by(self) -> tuple[Column, ...]:
+        return tuple(c for c in self.columns if not c.aggregate) if self.grouped else ()
+
+
+def parse_params(report: ReportDefinition, params) -> dict:
+    """
+    {param: value} of the filters set in `params` (a QueryDict or dict); raises ReportError.
+    """
+    values = {}
+    for f in report.filters:
+        value = f.parse(params.get(f.param))
+        if value is not None:
+            values[f.param] = value
+    return values
+
+
+def build_query(report: ReportDefinition, values: dict):
+    """
+    The report's values() queryset: one row dict per result row, keyed by column key.
+    """
+    qs = report.model._default_manager.filter(report.where)
+    conditions = {f.lookup: values[f.param] for f in report.filters if f.param in values}
+    if conditions:
+        qs = qs.filter(**conditions)
+
+    field_names = {f.name for f in report.model._meta.get_fields()} | {
+        f.attname for f in report.model._meta.concrete_fields
+    }
+
+    # a column reading the model field of the same name is selected by name (an
+    # alias may not shadow a field); the others are aliased expressions
+    clashes = [c.key for c in report.columns if (c.aggregate or c.path != c.key) and c.key in field_names]
+    if clashes:
+        raise ReportError(f"Column keys {clashes} clash with fields of {report.model.__name__}.")
+
+    def select(columns):
+        names = [c.key for c in columns if c.path == c.key]
+        return names, {c.key: c.expression() for c in columns if c.path != c.key}
+
+    if report.grouped:
+        names, expressions = select(report.group_by)
+        qs = qs.values(*names, **expressions).annotate(
+            **{c.key: c.expression() for c in report.columns if c.aggregate}
+        )
+    else:
+        names, expressions = select(report.columns)
+        qs = qs.values(*names, **expressions)
+    return qs.order_by(*report.order_by)
+
+
+def iter_rows(report: ReportDefinition, qs, chunk_size: int = CHUNK_SIZE):
+    """
+    Tuples in column order, read with a server-side cursor where the backend has one.
+    """
+    keys = [c.key for c in report.columns]
+    for row in qs.iterator(chunk_size=chunk_size):
+        yield tuple(row[k] for k in keys)
+
+
+def _cell(value, kind: str):
+    if value is None:
+        return None
+    if kind == MONEY:
+        return float(value)
+    return value
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(report: ReportDefinition, rows):
+    """
+    CSV text chunks (header first), for a StreamingHttpResponse.
+    """
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow([c.label for c in report.columns])  # BOM: Excel opens it as UTF-8
+    for chunk in chunked(rows, CHUNK_SIZE):
+        yield "".join(writer.writerow(row) for row in chunk)
+
+
+def build_xlsx(report: ReportDefinition, rows) -> Workbook:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(report.title[:31])
+    ws.freeze_panes = "A2"
+    header = []
+    for c in report.columns:
+        cell = WriteOnlyCell(ws, value=c.label)
+        cell.font, cell.fill = Font(bold=True), HEADER_FILL
+        header.append(cell)
+    ws.append(header)
+    kinds = [c.kind for c in report.columns]
+    for row in rows:
+        ws.append([_cell(v, k) for v, k in zip(row, kinds)])
+    return wb
+
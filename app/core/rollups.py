@@ -0,0 +1,258 @@
+"""
+Department x Jalali month rollups (DepartmentMonthRollup) for the admin dashboard.
+
+A month is recomputed from its own rows only (the month's payroll lines, attendance
+days and overtime entries), so a refresh costs the same whatever the history length,
+and the dashboard reads at most `months` x departments rollup rows.
+
+Writes to the inputs only mark the month stale (one upsert). Payroll calculations
+then hand the month to refresh_later, which recomputes it in a background thread
+once their transaction has committed, so the swap does not hold its lock through a
+refresh. Opening the dashboard never waits for a refresh either: it shows the stale
+months of its window flagged, with their last figures, and hands them to
+refresh_later as well. `manage.py rebuild_rollups` recomputes everything.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import threading
+from decimal import Decimal
+
+import jdatetime
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from attendance.models import AttendanceDay
+from employees.models import Employee
+from overtime.models import OvertimeEntry
+from payroll.models import PayrollLine
+
+from .calendar import month_calendar
+from .models import DepartmentMonthRollup, RollupMonth
+
+VALUE_FIELDS = (
+    "headcount", "payroll_cost", "net", "tax", "overtime_amount", "overtime_hours",
+    "absent_days", "leave_days", "scheduled_days",
+)
+
+_refreshing: set[tuple[int, int]] = set()  # months a background refresh of this process is on
+_refreshing_lock = threading.Lock()
+
+
+def mark_stale(jy: int, jm: int):
+    RollupMonth.objects.bulk_create(
+        [RollupMonth(year=jy, month=jm, stale=True)],
+        update_conflicts=True,
+        unique_fields=["year", "month"],
+        update_fields=["stale"],
+    )
+
+
+def mark_stale_dates(dates):
+    """
+    mark_stale for the Jalali months of Gregorian `dates`.
+    """
+    months = set()
+    for d in dates:
+        j = jdatetime.date.fromgregorian(date=d)
+        months.add((j.year, j.month))
+    for jy, jm in sorted(months):
+        mark_stale(jy, jm)
+
+
+def mark_stale_on_save(sender, instance, **kwargs):
+    """
+    post_save receiver for AttendanceDay / OvertimeEntry (bulk writes call mark_stale).
+    """
+    mark_stale_dates([instance.date])
+
+
+def refresh_month(jy: int, jm: int, department_ids=None) -> int:
+    """
+    Recompute the rollups of (jy, jm), for `department_ids` only when given.
+    Returns the number of rollup rows written.
+    """
+    calendar = month_calendar(jy, jm, fresh=True)
+    month_range = (calendar.g_start, calendar.g_end)
+    only = {"employee__department_id__in": department_ids} if department_ids is not None else {}
+    rows = {}
+
+    def row(department_id):
+        return rows.setdefault(department_id, dict.fromkeys(VALUE_FIELDS, 0))
+
+    with transaction.atomic():
+        if department_ids is None:
+            # cleared first: a write to the inputs while we read marks it stale again
+            RollupMonth.objects.update_or_create(
+                year=jy, month=jm, defaults={"stale": False, "refreshed_at": timezone.now()}
+            )
+
+        # payroll by the department each line was calculated in
+        line_only = {"department_id__in": department_ids} if department_ids is not None else {}
+        for r in (
+            PayrollLine.objects.filter(run__year=jy, run__month=jm, generation=F("run__version"), **line_only)
+            .values("department_id")
+            .annotate(n=Count("id"), cost=Sum("total"), net=Sum("amount_to_pay"), tax=Sum("tax"), ot=Sum("overtime"))
+            .order_by()
+        ):
+            values = row(r["department_id"])
+            values.update(headcount=r["n"], payroll_cost=r["cost"], net=r["net"], tax=r["tax"], overtime_amount=r["ot"])
+
+        # departments without payroll lines (no run yet) count the employees working now
+        working = Employee.objects.filter(status=Employee.Status.WORKING, date_hired__lte=calendar.g_end)
+        if department_ids is not None:
+            working = working.filter(department_id__in=department_ids)
+        for department_id, n in (
+            working.exclude(department_id__in=list(rows)).values_list("department_id").annotate(n=Count("id")).order_by()
+        ):
+            row(department_id)["headcount"] = n
+
+        for department_id, status, n in (
+            AttendanceDay.objects.filter(
+                date__range=month_range,
+                status__in=(AttendanceDay.Status.ABSENT, AttendanceDay.Status.LEAVE),
+                **only,
+            )
+            .values_list("employee__department_id", "status")
+            .annotate(n=Count("id"))
+            .order_by()
+        ):
+            key = "absent_days" if status == AttendanceDay.Status.ABSENT else "leave_days"
+            row(department_id)[key] = n
+
+        for department_id, hours in (
+            OvertimeEntry.objects.filter(date__range=month_range, **only)
+            .values_list("employee__department_id")
+            .annotate(h=Sum("hours"))
+            .order_by()
+        ):
+            row(department_id)["overtime_hours"] = hours
+
+        for department_id, values in rows.items():
+            values["scheduled_days"] = values["headcount"] * calendar.working_days(department_id)
+
+        stale = DepartmentMonthRollup.objects.filter(year=jy, month=jm).exclude(department_id__in=rows)
+        if department_ids is not None:
+            stale = stale.filter(department_id__in=department_ids)
+        stale.delete()
+        DepartmentMonthRollup.objects.bulk_create(
+            [DepartmentMonthRollup(department_id=d, year=jy, month=jm, **values) for d, values in rows.items()],
+            update_conflicts=True,
+            unique_fields=["department", "year", "month"],
+            update_fields=list(VALUE_FIELDS),
+        )
+    return len(rows)
+
+
+def refresh_stale(months) -> int:
+    """
+    refresh_month for those of `months` ((year, month) pairs) still marked stale.
+    Returns the number of months refreshed.
+    """
+    months = set(months)
+    if not months:
+        return 0
+    stale = [
+        month
+        for month in RollupMonth.objects.filter(stale=True, year__in={y for y, _ in months}).values_list("year", "month")
+        if month in months
+    ]
+    for jy, jm in sorted(stale):
+        refresh_month(jy, jm)
+    return len(stale)
+
+
+def _refresh_months(months: frozenset, background: bool):
+    with _refreshing_lock:
+        todo = months - _refreshing
+        _refreshing.update(todo)
+    try:
+        refresh_stale(todo)
+    finally:
+        with _refreshing_lock:
+            _refreshing.difference_update(todo)
+        if background:
+            connection.close()
+
+
+def refresh_later(months):
+    """
+    Refresh the stale ones of `months` once the current transaction commits: in a
+    background thread (ROLLUPS_REFRESH_IN_BACKGROUND, off = inline). Months a
+    background refresh of this process is already working on are skipped.
+    """
+    months = frozenset(months)
+    if not months:
+        return
+    background = getattr(settings, "ROLLUPS_REFRESH_IN_BACKGROUND", True)
+
+    def start():
+        if background:
+            threading.Thread(target=_refresh_months, args=(months, True), name="rollup-refresh").start()
+        else:
+            _refresh_months(months, False)
+
+    transaction.on_commit(start)
+
+
+def last_months(jy: int, jm: int, count: int) -> list[tuple[int, int]]:
+    """
+    `count` (year, month) pairs ending at (jy, jm), oldest first.
+    """
+    months = []
+    for _ in range(count):
+        months.append((jy, jm))
+        jy, jm = (jy, jm - 1) if jm > 1 else (jy - 1, 12)
+    return months[::-1]
+
+
+def current_month() -> tuple[int, int]:
+    today = jdatetime.date.fromgregorian(date=dt.date.today())
+    return today.year, today.month
+
+
+def window(jy: int, jm: int, count: int = 24) -> tuple[list[DepartmentMonthRollup], set[tuple[int, int]]]:
+    """
+    Rollups of the `count` months ending at (jy, jm) and the stale months among them.
+    The stale months keep their last figures; they are refreshed by refresh_later.
+    """
+    months = last_months(jy, jm, count)
+    (first_y, first_m), (last_y, last_m) = months[0], months[-1]
+    if first_y == last_y:
+        between = Q(year=first_y, month__range=(first_m, last_m))
+    else:
+        between = (
+            Q(year__gt=first_y, year__lt=last_y)
+            | Q(year=first_y, month__gte=first_m)
+            | Q(year=last_y, month__lte=last_m)
+        )
+
+    stale = set(RollupMonth.objects.filter(between, stale=True).values_list("year", "month"))
+    refresh_later(stale)
+    rollups = list(
+        DepartmentMonthRollup.objects.filter(between)
+        .select_related("department")
+        .order_by("year", "month", "department__name")
+    )
+    return rollups, stale
+
+
+def month_totals(rollups: list[DepartmentMonthRollup], months: list[tuple[int, int]]) -> list[dict]:
+    """
+    Organization-wide sums per month (months without rollups give zeros).
+    """
+    totals = {m: dict.fromkeys(VALUE_FIELDS, Decimal("0")) for m in months}
+    for r in rollups:
+        t = totals.get((r.year, r.month))
+        if t is not None:
+            for name in VALUE_FIELDS:
+                t[name] += getattr(r, name)
+    return [
+        {
+            "year": y, "month": m, **t,
+            "absence_rate": t["absent_days"] * 100 / t["scheduled_days"] if t["scheduled_days"] else None,
+        }
+        for (y, m), t in totals.items()
+    ]
@@ -0,0 +1,243 @@
+"""
+Synthetic organization data for benchmarks and month-end load reproduction.
+
+Everything is generated with one seeded RNG and written in fixed-size batches,
+so memory stays flat whatever the size of the dataset.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import random
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from attendance.models import AttendanceDay
+from core.jalali import jalali_month_range
+from core.models import Holiday, MonthConfig
+from employees.models import Employee
+from leaves.models import LeaveEntry, LeaveType
+from org.models import Department, Position
+from overtime.models import OvertimeEntry
+from payroll.models import BonusEntry, PrepaidEntry
+
+FIRST_NAMES = (
+    "احمد", "محمد", "علی", "حسین", "فرید", "نجیب", "عبدالله", "کریم", "رحیم", "جاوید",
+    "شبنم", "مریم", "زهرا", "فاطمه", "نسرین", "ملالی", "سمیع", "ولی", "نوید", "هارون",
+)
+FATHER_NAMES = (
+    "غلام", "نور", "عبدالرحمن", "محمود", "یوسف", "حبیب", "قادر", "سلطان", "شریف", "امین",
+)
+DEPARTMENT_NAMES = ("اداری", "مالی", "تولید", "لوژستیک", "فروش", "امنیت", "خدمات", "تخنیکی")
+POSITION_NAMES = ("مدیر", "معاون", "کارمند", "کارگر", "محافظ")
+
+# (days in a month, weight)
+ABSENCE_DISTRIBUTION = ((0, 60), (1, 20), (2, 10), (3, 6), (5, 4))
+OVERTIME_DISTRIBUTION = ((0, 55), (1, 15), (2, 12), (3, 8), (5, 6), (8, 4))
+SHIFT_WORKER_SHARE = 0.05
+LEAVE_PER_MONTH = 0.25
+BONUS_PER_MONTH = 0.10
+PREPAID_PER_MONTH = 0.10
+
+# Nowruz (Jalali 1/1 - 1/4), written as org-wide core.Holiday rows
+PUBLIC_HOLIDAYS = {(1, 1): "نوروز", (1, 2): "نوروز", (1, 3): "نوروز", (1, 4): "نوروز"}
+
+# high-volume tables are written as plain rows of these columns (see _Batches)
+FACT_COLUMNS = {
+    AttendanceDay: ("employee_id", "date", "status", "note"),
+    OvertimeEntry: ("employee_id", "date", "hours", "note"),
+    LeaveEntry: ("employee_id", "leave_type_id", "date_from", "days_count", "date_to", "note", "excess_days", "created_at"),
+    BonusEntry: ("employee_id", "year", "month", "amount", "note"),
+    PrepaidEntry: ("employee_id", "year", "month", "amount", "note"),
+}
+
+
+def month_span(end_jy: int, end_jm: int, months: int) -> list[tuple[int, int]]:
+    """
+    The `months` Jalali months ending with end_jy/end_jm, oldest first.
+    """
+    out = []
+    jy, jm = end_jy, end_jm
+    for _ in range(months):
+        out.append((jy, jm))
+        jm -= 1
+        if jm == 0:
+            jy, jm = jy - 1, 12
+    return out[::-1]
+
+
+class _Batches:
+    """
+    Per-model row buffers written with one executemany per batch_size rows.
+
+    bulk_create compiles every value through the ORM (~100µs per row), which alone
+    would take minutes for millions of exception rows, so the fact tables are
+    plain tuples of FACT_COLUMNS, already adapted for the backend by the generator.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.buffers = {model: [] for model in FACT_COLUMNS}
+        self.counts = {}
+        self.statements = {}
+
+    def _statement(self, model) -> str:
+        if model not in self.statements:
+            qn = connection.ops.quote_name
+            fields = {f.attname: f for f in model._meta.concrete_fields}
+            columns = FACT_COLUMNS[model]
+            self.statements[model] = "INSERT INTO {} ({}) VALUES ({})".format(
+                qn(model._meta.db_table),
+                ", ".join(qn(fields[c].column) for c in columns),
+                ", ".join(["%s"] * len(columns)),
+            )
+        return self.statements[model]
+
+    def flush(self, force: bool = False):
+        for model, buf in self.buffers.items():
+            while buf and (force or len(buf) >= self.batch_size):
+                chunk = buf[:self.batch_size]
+                with connection.cursor() as cursor:
+                    cursor.executemany(self._statement(model), chunk)
+                self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(chunk)
+                del buf[:self.batch_size]
+
+
+def _create_org(rnd: random.Random, n_employees: int, batch_size: int, hire_before: dt.date, prefix: str):
+    n_departments = max(1, n_employees // 100)
+    departments = Department.objects.bulk_create([
+        Department(name=f"{prefix}{DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)]} {i + 1}", has_head=i % 3 == 0)
+        for i in range(n_departments)
+    ])
+    positions = Position.objects.bulk_create([
+        Position(department=d, name=name) for d in departments for name in POSITION_NAMES
+    ])
+    by_department = {}
+    for p in positions:
+        by_department.setdefault(p.department_id, []).append(p)
+
+    employees = []
+    for i in range(n_employees):
+        dept = departments[rnd.randrange(n_departments)]
+        employees.append(Employee(
+            first_name=rnd.choice(FIRST_NAMES),
+            father_name=rnd.choice(FATHER_NAMES),
+            department=dept,
+            position=rnd.choice(by_department[dept.id]),
+            employee_type=rnd.choice(Employee.EmployeeType.values),
+            base_salary=Decimal(rnd.randrange(6000, 80000, 500)),
+            phone=f"07{rnd.randrange(10**8):08d}",
+            date_hired=hire_before - dt.timedelta(days=rnd.randrange(30, 3650)),
+            status=Employee.Status.WORKING if rnd.random() > 0.03 else Employee.Status.RESIGNED,
+        ))
+    return Employee.objects.bulk_create(employees, batch_size=batch_size)
+
+
+def _seed_month(rnd, batches, employee_ids, shift_workers, jy, jm, leave_type_ids, now):
+    """
+    Append one month of rows to the batch buffers (values adapted with connection.ops).
+    """
+    ops = connection.ops
+    rng = jalali_month_range(jy, jm)
+    dates = [rng.g_start + dt.timedelta(days=i) for i in range(rng.days + 3)]  # + leave overflow
+    db_date = {d: ops.adapt_datefield_value(d) for d in dates}
+    dates = dates[:rng.days]
+    holidays = {dates[jd - 1]: name for (hm, jd), name in PUBLIC_HOLIDAYS.items() if hm == jm and jd <= rng.days}
+    for d, name in holidays.items():
+        Holiday.objects.get_or_create(date=d, department=None, defaults={"name": name})
+    work_dates = [d for d in dates if d.weekday() != 4 and d not in holidays]
+    shift_dates = ([d for d in work_dates if d.toordinal() % 2 == 0], [d for d in work_dates if d.toordinal() % 2 == 1])
+    absence_counts, absence_weights = zip(*ABSENCE_DISTRIBUTION)
+    overtime_counts, overtime_weights = zip(*OVERTIME_DISTRIBUTION)
+    n = len(employee_ids)
+    n_absent = rnd.choices(absence_counts, absence_weights, k=n)
+    n_overtime = rnd.choices(overtime_counts, overtime_weights, k=n)
+
+    MonthConfig.objects.get_or_create(year=jy, month=jm)
+
+    ABSENT, LEAVE, SHIFT_OFF = AttendanceDay.Status.ABSENT, AttendanceDay.Status.LEAVE, AttendanceDay.Status.SHIFT_OFF
+    db_now = ops.adapt_datetimefield_value(now)
+    hours = [Decimal(h) for h in (1, 2, 3, 4)]
+    note = f"Seed {jy}-{jm:02d}"
+    attendance = batches.buffers[AttendanceDay]
+    overtime = batches.buffers[OvertimeEntry]
+
+    for i, emp_id in enumerate(employee_ids):
+        taken = set(holidays)
+
+        # leave first: its days become LEAVE exceptions, like LeaveEntry.sync_attendance does
+        if rnd.random() < LEAVE_PER_MONTH:
+            start = rnd.choice(work_dates)
+            days = rnd.choice((1, 1, 2, 3))
+            batches.buffers[LeaveEntry].append((
+                emp_id, rnd.choice(leave_type_ids), db_date[start], Decimal(days),
+                db_date[start + dt.timedelta(days=days - 1)], note, Decimal(0), db_now,
+            ))
+            for k in range(days):
+                d = start + dt.timedelta(days=k)
+                if d.weekday() != 4 and d <= rng.g_end and d not in taken:
+                    taken.add(d)
+                    attendance.append((emp_id, db_date[d], LEAVE, ""))
+
+        if emp_id in shift_workers:
+            for d in shift_dates[emp_id % 2]:
+                if d not in taken:
+                    taken.add(d)
+                    attendance.append((emp_id, db_date[d], SHIFT_OFF, ""))
+
+        if n_absent[i]:
+            for d in rnd.sample(work_dates, n_absent[i]):
+                if d not in taken:
+                    taken.add(d)
+                    attendance.append((emp_id, db_date[d], ABSENT, ""))
+
+        if n_overtime[i]:
+            for d in rnd.sample(work_dates, n_overtime[i]):
+                if d not in taken:
+                    overtime.append((emp_id, db_date[d], rnd.choice(hours), ""))
+
+        if rnd.random() < BONUS_PER_MONTH:
+            batches.buffers[BonusEntry].append((emp_id, jy, jm, Decimal(rnd.randrange(500, 10000, 100)), ""))
+        if rnd.random() < PREPAID_PER_MONTH:
+            batches.buffers[PrepaidEntry].append((emp_id, jy, jm, Decimal(rnd.randrange(500, 10000, 100)), "پیشکی"))
+
+    batches.flush()
+
+
+@transaction.atomic
+def seed_org(
+    n_employees: int,
+    months: list[tuple[int, int]],
+    seed: int = 1404,
+    batch_size: int = 5000,
+    prefix: str = "",
+    log=None,
+) -> dict[str, int]:
+    """
+    Create departments, positions and `n_employees` employees, then attendance
+    exceptions, leave entries, overtime, bonuses, prepaids, MonthConfig and Nowruz
+    Holiday rows for each (jy, jm) in `months`. Returns row counts per model.
+    """
+    rnd = random.Random(seed)
+    first = jalali_month_range(*months[0])
+
+    employees = _create_org(rnd, n_employees, batch_size, first.g_start, prefix)
+    employee_ids = [e.id for e in employees]
+    shift_workers = {emp_id for emp_id in employee_ids if rnd.random() < SHIFT_WORKER_SHARE}
+
+    annual, _ = LeaveType.objects.get_or_create(
+        name="Annual", defaults={"yearly_limit_days": 20, "is_paid": True, "auto_cover_absence": True}
+    )
+    sick, _ = LeaveType.objects.get_or_create(name="Sick", defaults={"yearly_limit_days": 10, "is_paid": True})
+    leave_type_ids = [annual.id, annual.id, annual.id, sick.id]
+
+    now = timezone.now()
+    batches = _Batches(batch_size)
+    for jy, jm in months:
+        _seed_month(rnd, batches, employee_ids, shift_workers, jy, jm, leave_type_ids, now)
+        if log:
+            log(f"  {jy}-{jm:02d} generated")
+    batches.flush(force=True)
+
+    return {"Employee": len(employees), **batches.counts}
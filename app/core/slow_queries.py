@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import logging.handlers
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger("hrms.slow_queries")
+
+_local = threading.local()
+_explained: set[str] = set()
+_explained_lock = threading.Lock()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_RE = re.compile(r"%s|\?")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Strip literals and collapse IN-lists so the same statement shape
+    always gives the same text:  ... IN (1, 2, 3) -> ... IN (...)
+    """
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _PARAM_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("(...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def params_fingerprint(params) -> str:
+    # raw values are not logged (salaries, names); only a hash to spot repeats
+    return fingerprint(repr(params)) if params else ""
+
+
+# instrumentation modules are never the interesting call site
+_SKIP_SITES = ("core/slow_queries.py", "core/profiling.py", "core/middleware.py")
+
+
+def _call_site() -> str:
+    """
+    First stack frame inside the project (not Django, not instrumentation):
+    "payroll/services.py:120 calculate_payroll"
+    """
+    base = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(base)
+            and "site-packages" not in filename
+            and not filename.replace("\\", "/").endswith(_SKIP_SITES)
+        ):
+            rel = Path(filename).relative_to(base).as_posix()
+            return f"{rel}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "-"
+
+
+def _explain_sql(vendor: str, sql: str) -> str | None:
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    if vendor == "sqlite":
+        return f"EXPLAIN QUERY PLAN {sql}"
+    if vendor == "postgresql":
+        return f"EXPLAIN {sql}"
+    return None
+
+
+def _capture_explain(alias: str, fp: str, sql: str, params):
+    """
+    Runs in a background thread (its own DB connection) and logs the plan once per fingerprint.
+    """
+    _local.in_explain = True
+    conn = connections[alias]
+    try:
+        explain = _explain_sql(conn.vendor, sql)
+        if not explain:
+            return
+        with conn.cursor() as cursor:
+            cursor.execute(explain, params)
+            plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+        logger.info(json.dumps({"kind": "explain", "fp": fp, "at": timezone.now().isoformat(), "plan": plan}))
+    except Exception as exc:  # a plan is best-effort; never break anything for it
+        logger.info(json.dumps({"kind": "explain", "fp": fp, "at": timezone.now().isoformat(), "plan": f"(EXPLAIN failed: {exc})"}))
+    finally:
+        conn.close()
+
+
+class SlowQueryLogger:
+    """
+    DB execute wrapper: statements slower than SLOW_QUERY_MS are written as JSON lines
+    to the "hrms.slow_queries" logger (rotating file, see settings.LOGGING).
+    """
+
+    def __init__(self, alias: str):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "in_explain", False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            threshold = getattr(settings, "SLOW_QUERY_MS", None)
+            if threshold is not None and elapsed_ms >= threshold:
+                self._record(sql, params, many, elapsed_ms)
+
+    def _record(self, sql, params, many, elapsed_ms):
+        normalized = normalize_sql(sql)
+        fp = fingerprint(normalized)
+        logger.info(json.dumps({
+            "kind": "query",
+            "fp": fp,
+            "at": timezone.now().isoformat(),
+            "ms": round(elapsed_ms, 1),
+            "sql": normalized,
+            "params_fp": "" if many else params_fingerprint(params),
+            "site": _call_site(),
+            "db": self.alias,
+        }, ensure_ascii=False))
+
+        if many:
+            return
+        with _explained_lock:
+            if fp in _explained:
+                return
+            _explained.add(fp)
+        threading.Thread(
+            target=_capture_explain, args=(self.alias, fp, sql, params), daemon=True
+        ).start()
+
+
+def install_slow_query_logger(sender, connection, **kwargs):
+    """
+    connection_created receiver. The wrapper is inserted first so that
+    `connection.execute_wrapper()` blocks (which pop the last wrapper) stay balanced.
+    """
+    if getattr(settings, "SLOW_QUERY_MS", None) is None:
+        return
+    if any(isinstance(w, SlowQueryLogger) for w in connection.execute_wrappers):
+        return
+    connection.execute_wrappers.insert(0, SlowQueryLogger(connection.alias))
+
+
+class SlowQueryFileHandler(logging.handlers.WatchedFileHandler):
+    """
+    The slow-query log file. Every web and worker process appends to it, so it is not
+    rotated in-process (processes rotating one file on their own lose entries):
+    logrotate (or similar, see settings.SLOW_QUERY_LOG) moves it and each process
+    reopens the file on its next write; without it the file grows without limit.
+    The folder is created when the handler is set up.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(filename, *args, **kwargs)
+
+
+def _log_files() -> list[Path]:
+    path = Path(settings.SLOW_QUERY_LOG)
+    # uncompressed backups as logrotate names them (slow_queries.log.1, ...), oldest first
+    backups = (p for p in path.parent.glob(path.name + ".*") if p.suffix != ".gz")
+    files = sorted(backups, key=lambda p: (len(p.name), p.name), reverse=True)
+    if path.exists():
+        files.append(path)
+    return files
+
+
+def _tail_lines(max_bytes: int):
+    """
+    The lines of the last `max_bytes` of the log (current + rotated files), oldest
+    first; a line cut by the limit is skipped.
+    """
+    parts = []  # (path, offset), newest file first
+    remaining = max_bytes
+    for path in reversed(_log_files()):
+        if remaining <= 0:
+            break
+        size = path.stat().st_size
+        take = min(size, remaining)
+        parts.append((path, size - take))
+        remaining -= take
+    for path, offset in reversed(parts):
+        with path.open("rb") as fh:
+            if offset:
+                fh.seek(offset - 1)
+                fh.readline()  # the rest of the line the limit cut (nothing when offset starts a line)
+            for raw in fh:
+                yield raw.decode("utf-8", "replace")
+
+
+def aggregate_slow_queries(max_bytes: int | None = None) -> list[dict]:
+    """
+    Read the last SLOW_QUERY_SUMMARY_BYTES (or `max_bytes`) of the current + rotated
+    log files and group entries by fingerprint, slowest total time first.
+    """
+    groups = {}
+    plans = {}
+    for raw in _tail_lines(max_bytes or settings.SLOW_QUERY_SUMMARY_BYTES):
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            continue
+        fp = entry.get("fp")
+        if entry.get("kind") == "explain":
+            plans.setdefault(fp, entry.get("plan", ""))
+            continue
+        g = groups.get(fp)
+        if g is None:
+            g = groups[fp] = {
+                "fp": fp,
+                "sql": entry["sql"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "first_at": entry["at"],
+                "last_at": entry["at"],
+                "sites": defaultdict(int),
+                "params": set(),
+            }
+        g["count"] += 1
+        g["total_ms"] += entry["ms"]
+        g["max_ms"] = max(g["max_ms"], entry["ms"])
+        g["last_at"] = entry["at"]
+        g["sites"][entry.get("site", "-")] += 1
+        if entry.get("params_fp"):
+            g["params"].add(entry["params_fp"])
+
+    result = []
+    for fp, g in groups.items():
+        result.append({
+            **g,
+            "total_ms": round(g["total_ms"], 1),
+            "avg_ms": round(g["total_ms"] / g["count"], 1),
+            "sites": sorted(g["sites"].items(), key=lambda kv: -kv[1]),
+            "distinct_params": len(g["params"]),
+            "plan": plans.get(fp, ""),
+        })
+    result.sort(key=lambda g: -g["total_ms"])
+    return result
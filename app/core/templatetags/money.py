@@ -9,6 +9,11 @@ def ceil2(value):
     Round UP to 2 decimals (ceiling).
     Example: 101.3001 -> 101.31
     """
+    if isinstance(value, Decimal):
+        # DecimalField values already have 2 places: skip the str() round trip
+        if value.is_finite() and value.as_tuple().exponent == -2:
+            return value
+        return value.quantize(Decimal("0.01"), rounding=ROUND_CEILING)
     try:
         d = Decimal(str(value))
     except (InvalidOperation, TypeError, ValueError):
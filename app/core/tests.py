@@ -1,3 +1,283 @@
-from django.test import TestCase
+import datetime as dt
+import io
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+import jdatetime
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from attendance.models import AttendanceDay
+from leaves.models import LeaveEntry
+from overtime.models import OvertimeEntry
+from employees.models import Employee
+from org.models import Department, Position
+
+from . import metrics, rollups
+from .calendar import month_calendar
+from .middleware import RequestMetricsMiddleware
+from .models import DepartmentMonthRollup, Holiday, MonthConfig, RollupMonth
+from .paging import encode_cursor, keyset_page
+from .profiling import Profiler
+from .seeding import month_span, seed_org
+from .slow_queries import aggregate_slow_queries
+
+
+def user_count_view(request):
+    return HttpResponse(str(User.objects.count()))
+
+
+def streaming_user_view(request):
+    def rows():
+        for _ in range(3):
+            yield f"{User.objects.count()}\n"
+    return StreamingHttpResponse(rows())
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0, REQUEST_METRICS_TRACK_MEMORY=False)
+class RequestMetricsMiddlewareTests(TestCase):
+    def request(self, user=None):
+        request = RequestFactory().get("/admin/")
+        request.user = user or AnonymousUser()
+        return request
+
+    @override_settings(REQUEST_METRICS_HEADERS=False)
+    def test_headers_only_for_staff_by_default(self):
+        middleware = RequestMetricsMiddleware(user_count_view)
+        self.assertNotIn("X-DB-Queries", middleware(self.request()))
+
+        staff = User.objects.create_user("staff", password="x", is_staff=True)
+        response = middleware(self.request(staff))
+        self.assertEqual(response["X-DB-Queries"], "1")
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(REQUEST_METRICS_HEADERS=True)
+    def test_headers_for_everyone_when_enabled(self):
+        response = RequestMetricsMiddleware(user_count_view)(self.request())
+        self.assertEqual(response["X-DB-Queries"], "1")
+
+    @override_settings(REQUEST_METRICS_HEADERS=True)
+    def test_streaming_body_is_measured_when_consumed(self):
+        response = RequestMetricsMiddleware(streaming_user_view)(self.request())
+        self.assertNotIn("X-DB-Queries", response)
+        with self.assertLogs("hrms.requests", "INFO") as logs:
+            body = b"".join(response.streaming_content)
+        self.assertEqual(body, b"0\n0\n0\n")
+        self.assertIn("queries=3", logs.output[0])
+
+    @override_settings(REQUEST_METRICS_HEADERS=True, REQUEST_METRICS_TRACK_MEMORY=True)
+    def test_memory_is_labelled_as_the_process_peak(self):
+        with self.assertLogs("hrms.requests", "INFO") as logs:
+            response = RequestMetricsMiddleware(user_count_view)(self.request())
+        self.assertGreaterEqual(int(response["X-Process-Peak-Memory-KB"]), 0)
+        self.assertIn("process_peak_kb=", logs.output[0])
+        self.assertEqual(logs.records[0].process_peak_kb, int(response["X-Process-Peak-Memory-KB"]))
+
+
+class ProfilerTests(TestCase):
+    def test_spans_record_queries_rows_and_failures(self):
+        profiler = Profiler()
+        with profiler.span("load") as span:
+            span.rows = len(list(User.objects.all())) + len(list(Department.objects.all())) + 3
+        with self.assertRaises(ZeroDivisionError):
+            with profiler.span("fail"):
+                User.objects.count()
+                1 / 0
+
+        load, fail = profiler.as_list()
+        self.assertEqual((load["name"], load["queries"], load["rows"]), ("load", 2, 3))
+        self.assertEqual((fail["name"], fail["queries"], fail["rows"]), ("fail", 1, 0))
+        self.assertGreaterEqual(load["wall_ms"], 0)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        override = override_settings(METRICS_DB=Path(folder) / "metrics.sqlite3", METRICS_FLUSH_SECONDS=3600)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(metrics._local.__dict__.clear)  # connection to the temporary file
+
+    def test_counters_keep_full_precision(self):
+        metrics.inc("hrms_export_bytes_total", 12345678, kind="payroll")
+        metrics.inc("hrms_export_bytes_total", 1, kind="payroll")
+        metrics.observe("hrms_export_seconds", 0.3, kind="payroll")
+        text = metrics.render_exposition()
+        self.assertIn('hrms_export_bytes_total{kind="payroll"} 12345679\n', text)
+        self.assertIn('hrms_export_seconds_sum{kind="payroll"} 0.3\n', text)
+        self.assertIn('hrms_export_seconds_bucket{kind="payroll",le="0.25"} 0\n', text)
+        self.assertIn('hrms_export_seconds_count{kind="payroll"} 1\n', text)
+
+    def test_samples_are_buffered_until_flushed(self):
+        def stored():
+            return metrics._db().execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+        metrics.inc("hrms_export_bytes_total", 5, kind="csv")
+        self.assertEqual(stored(), 0)
+        metrics.flush()
+        self.assertEqual(stored(), 1)
+
+
+class MonthCalendarTests(TestCase):
+    def test_fresh_calendar_sees_holidays_saved_elsewhere(self):
+        cached = month_calendar(1404, 2)
+        weekday = next(d for d in cached.dates() if d.weekday() != 4)
+        # bulk_create sends no signal, like a save in another process
+        Holiday.objects.bulk_create([Holiday(date=weekday, name="Eid")])
+        self.assertEqual(month_calendar(1404, 2).working_days(), cached.working_days())
+        self.assertEqual(month_calendar(1404, 2, fresh=True).working_days(), cached.working_days() - 1)
+
+
+class KeysetPageTests(TestCase):
+    order = ("-name", "id")
+
+    def setUp(self):
+        Department.objects.bulk_create([Department(name=f"D{i % 4}-{i:02d}") for i in range(11)])
+        self.all = list(Department.objects.order_by(*self.order))
+
+    def test_pages_cover_the_list_in_both_directions(self):
+        pages = [keyset_page(Department.objects.all(), self.order, size=4)]
+        while pages[-1].next_cursor:
+            pages.append(keyset_page(Department.objects.all(), self.order, after=pages[-1].next_cursor, size=4))
+        self.assertEqual([len(p.rows) for p in pages], [4, 4, 3])
+        self.assertEqual([row for p in pages for row in p.rows], self.all)
+        self.assertIsNone(pages[0].prev_cursor)
+
+        back = keyset_page(Department.objects.all(), self.order, before=pages[2].prev_cursor, size=4)
+        self.assertEqual(back.rows, pages[1].rows)
+        self.assertEqual((back.next_cursor is not None, back.prev_cursor is not None), (True, True))
+
+    def test_bad_cursor_shows_the_first_page(self):
+        for cursor in ("not-a-cursor", encode_cursor(["D1"])):
+            self.assertEqual(keyset_page(Department.objects.all(), self.order, after=cursor, size=4).rows, self.all[:4])
+
+
+@override_settings(ROLLUPS_REFRESH_IN_BACKGROUND=False)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name="Ops")
+        position = Position.objects.create(department=self.department, name="Clerk")
+        self.employee = Employee.objects.create(
+            first_name="A", father_name="F", department=self.department, position=position,
+            employee_type=Employee.EmployeeType.PERMANENT, base_salary=Decimal("30000"),
+            date_hired=dt.date(2020, 1, 1),
+        )
+        self.jy, self.jm = rollups.current_month()
+        self.day = jdatetime.date(self.jy, self.jm, 10).togregorian()
+        rollups.refresh_month(self.jy, self.jm)
+
+    def absent(self):
+        AttendanceDay.objects.create(employee=self.employee, date=self.day, status=AttendanceDay.Status.ABSENT)
+
+    def rollup(self):
+        return DepartmentMonthRollup.objects.get(department=self.department, year=self.jy, month=self.jm)
+
+    def test_writes_mark_the_month_stale(self):
+        self.assertFalse(RollupMonth.objects.get(year=self.jy, month=self.jm).stale)
+        self.absent()
+        self.assertTrue(RollupMonth.objects.get(year=self.jy, month=self.jm).stale)
+        self.assertEqual(self.rollup().absent_days, 0)
+
+    def test_window_flags_stale_months_and_refreshes_after_commit(self):
+        self.absent()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            rows, stale = rollups.window(self.jy, self.jm, 12)
+        self.assertEqual(stale, {(self.jy, self.jm)})
+        self.assertEqual([r.absent_days for r in rows if (r.year, r.month) == (self.jy, self.jm)], [0])
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        self.assertFalse(RollupMonth.objects.get(year=self.jy, month=self.jm).stale)
+        self.assertEqual(self.rollup().absent_days, 1)
+        self.assertEqual(rollups.window(self.jy, self.jm, 12)[1], set())
+
+    def test_refresh_stale_skips_fresh_months(self):
+        self.assertEqual(rollups.refresh_stale([(self.jy, self.jm)]), 0)
+        self.absent()
+        self.assertEqual(rollups.refresh_stale([(self.jy, self.jm), (self.jy - 1, self.jm)]), 1)
+
+    def test_dashboard_shows_stale_months_without_refreshing(self):
+        self.absent()
+        staff = User.objects.create_superuser("admin", password="x")
+        self.client.force_login(staff)
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.get("/admin/dashboard/")
+        self.assertContains(response, "being refreshed")
+        self.assertTrue(RollupMonth.objects.get(year=self.jy, month=self.jm).stale)
+
+
+class SlowQuerySummaryTests(TestCase):
+    def setUp(self):
+        folder = Path(tempfile.mkdtemp())
+        self.log = folder / "slow_queries.log"
+        self.write(folder / "slow_queries.log.1", [("a", 10, "2025-01-01"), ("b", 5, "2025-01-02")])
+        self.write(self.log, [("a", 30, "2025-01-03"), ("a", 20, "2025-01-04")])
+
+    def write(self, path, entries):
+        with path.open("w", encoding="utf-8") as fh:
+            for fp, ms, at in entries:
+                fh.write(json.dumps({"kind": "query", "fp": fp, "sql": f"SELECT {fp}", "ms": ms, "at": at}) + "\n")
+
+    def test_current_and_rotated_files_oldest_first(self):
+        with override_settings(SLOW_QUERY_LOG=self.log):
+            groups = {g["fp"]: g for g in aggregate_slow_queries()}
+        self.assertEqual(
+            (groups["a"]["count"], groups["a"]["total_ms"], groups["a"]["first_at"], groups["a"]["last_at"]),
+            (3, 60.0, "2025-01-01", "2025-01-04"),
+        )
+        self.assertEqual(groups["b"]["count"], 1)
+
+    def test_only_the_tail_is_read(self):
+        last_line = len(self.log.read_bytes().splitlines(keepends=True)[-1])
+        with override_settings(SLOW_QUERY_LOG=self.log):
+            self.assertEqual(
+                [(g["fp"], g["count"]) for g in aggregate_slow_queries(max_bytes=last_line)], [("a", 1)]
+            )
+            # a line cut by the limit is skipped
+            self.assertEqual(aggregate_slow_queries(max_bytes=last_line - 1), [])
+            groups = aggregate_slow_queries(max_bytes=self.log.stat().st_size + last_line)
+        self.assertEqual([(g["fp"], g["count"]) for g in groups], [("a", 2), ("b", 1)])
+
+
+class SeedOrgTests(TestCase):
+    MONTHS = month_span(1404, 2, 3)  # 1403-12 .. 1404-02, with Nowruz
+
+    def test_rows_match_the_counts_and_the_calendar(self):
+        counts = seed_org(120, self.MONTHS, seed=7, batch_size=50)
+        self.assertEqual(counts["Employee"], Employee.objects.count())
+        self.assertEqual(counts["AttendanceDay"], AttendanceDay.objects.count())
+        self.assertEqual(counts["OvertimeEntry"], OvertimeEntry.objects.count())
+        self.assertEqual(counts["LeaveEntry"], LeaveEntry.objects.count())
+        self.assertEqual(Holiday.objects.filter(department=None).count(), 4)
+        self.assertEqual(MonthConfig.objects.count(), 3)
+
+        days = AttendanceDay.objects.values_list("date", flat=True)
+        self.assertFalse([d for d in days if d.weekday() == 4])
+        self.assertFalse(AttendanceDay.objects.filter(date__in=Holiday.objects.values("date")).exists())
+        self.assertTrue(AttendanceDay.objects.filter(status=AttendanceDay.Status.SHIFT_OFF).exists())
+
+    def test_same_seed_same_data(self):
+        def fingerprint(prefix):
+            seed_org(40, self.MONTHS, seed=7, batch_size=50, prefix=prefix)
+            employees = list(
+                Employee.objects.filter(department__name__startswith=prefix).order_by("id").values_list("id", flat=True)
+            )
+            index = {emp_id: i for i, emp_id in enumerate(employees)}
+            return sorted(
+                (index[e], d, status)
+                for e, d, status in AttendanceDay.objects.filter(employee_id__in=employees)
+                .values_list("employee_id", "date", "status")
+            )
+
+        self.assertEqual(fingerprint("A "), fingerprint("B "))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("seed_org", employees=30, years=1, end_year=1404, end_month=2, stdout=out)
+        self.assertEqual(Employee.objects.count(), 30)
+        self.assertIn("Seeded 1403-03 .. 1404-02", out.getvalue())
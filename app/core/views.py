@@ -1,3 +1,158 @@
+import hmac
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.template.loader import get_template, render_to_string
+
+from org.models import Department
+
+from . import metrics
+from .jalali import JALALI_MONTHS_DARI
+from .importing import chunked
+from .report_catalog import REPORTS
+from .reports import INT, MONEY, ReportError, build_query, build_xlsx, iter_rows, parse_params, stream_csv
+from .rollups import current_month, last_months, month_totals, window
+from .slow_queries import aggregate_slow_queries
+
+
+def slow_queries_view(request):
+    groups = aggregate_slow_queries()
+    return render(request, "admin/core/slow_queries.html", {
+        **admin.site.each_context(request),
+        "title": "Slow queries",
+        "groups": groups,
+        "tail_mb": round(settings.SLOW_QUERY_SUMMARY_BYTES / 1024 / 1024, 1),
+    })
+
+
+DASHBOARD_MONTHS = (12, 24)
+
+
+def dashboard_view(request):
+    """
+    Department cost dashboard over the last 12/24 Jalali months, read from
+    DepartmentMonthRollup (?department=<id> narrows it to one department). Stale
+    months are flagged and refreshed in the background, never in the request.
+    """
+    jy, jm = current_month()
+    count = int(request.GET.get("months") or 24)
+    if count not in DASHBOARD_MONTHS:
+        count = 24
+    department_id = request.GET.get("department")
+    department_id = int(department_id) if department_id and department_id.isdigit() else None
+
+    months = last_months(jy, jm, count)
+    rollups, stale = window(jy, jm, count)
+    latest = [r for r in rollups if (r.year, r.month) == (jy, jm)]
+    if department_id:
+        rollups = [r for r in rollups if r.department_id == department_id]
+    trend = month_totals(rollups, months)
+
+    top_cost = max((t["payroll_cost"] for t in trend), default=0) or 1
+    top_rate = max((t["absence_rate"] or 0 for t in trend), default=0) or 1
+    for t in trend:
+        t["label"] = f"{JALALI_MONTHS_DARI[t['month']]} {t['year']}"
+        t["stale"] = (t["year"], t["month"]) in stale
+        t["cost_pct"] = round(t["payroll_cost"] * 100 / top_cost)
+        t["rate_pct"] = round((t["absence_rate"] or 0) * 100 / top_rate)
+
+    return render(request, "admin/core/dashboard.html", {
+        **admin.site.each_context(request),
+        "title": "Department dashboard",
+        "trend": trend,
+        "current": trend[-1],
+        "latest": latest,
+        "stale": len(stale),
+        "departments": Department.objects.all(),
+        "department_id": department_id,
+        "count": count,
+        "month_choices": DASHBOARD_MONTHS,
+    })
+
+
+REPORT_HTML_CHUNK = 500
+
+
+def reports_view(request):
+    return render(request, "admin/core/reports.html", {
+        **admin.site.each_context(request),
+        "title": "Reports",
+        "reports": REPORTS.values(),
+    })
+
+
+def report_view(request, key: str):
+    """
+    A core.report_catalog report as a streamed HTML table, or ?format=csv / xlsx.
+    Without its required filters only the filter form is shown.
+    """
+    report = REPORTS.get(key)
+    if report is None:
+        raise Http404("Unknown report")
+    fmt = request.GET.get("format", "html")
+    context = {
+        **admin.site.each_context(request),
+        "title": report.title,
+        "report": report,
+        "filters": [(f, request.GET.get(f.param, "")) for f in report.filters],
+        "query": request.GET.urlencode(),
+    }
+    try:
+        values = parse_params(report, request.GET)
+    except ReportError as exc:
+        if "format" in request.GET or any(request.GET.get(f.param) for f in report.filters):
+            context["error"] = str(exc)
+        return render(request, "admin/core/report.html", context)
+
+    rows = iter_rows(report, build_query(report, values))
+    if fmt == "csv":
+        response = StreamingHttpResponse(stream_csv(report, rows), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{report.key}.csv"'
+        return response
+    if fmt == "xlsx":
+        response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        response["Content-Disposition"] = f'attachment; filename="{report.key}.xlsx"'
+        with metrics.timed("hrms_export_seconds", kind="report"):
+            build_xlsx(report, rows).save(response)
+        metrics.inc("hrms_export_bytes_total", len(response.content), kind="report")
+        return response
+    context["ran"] = True
+    return StreamingHttpResponse(_stream_report_html(request, report, rows, context), content_type="text/html; charset=utf-8")
+
+
+def _stream_report_html(request, report, rows, context):
+    page = render_to_string("admin/core/report.html", context, request=request)
+    head, tail = page.split("<!-- rows -->", 1)
+    yield head
+    kinds = [c.kind for c in report.columns]
+    totals = [0 if k in (INT, MONEY) else None for k in kinds]
+    count = 0
+    rows_template = get_template("admin/core/report_rows.html")
+    for chunk in chunked(rows, REPORT_HTML_CHUNK):
+        for row in chunk:
+            for i, value in enumerate(row):
+                if totals[i] is not None and value is not None:
+                    totals[i] += value
+        count += len(chunk)
+        yield rows_template.render({"rows": [list(zip(row, kinds)) for row in chunk]})
+    yield rows_template.render({"rows": [list(zip(totals, kinds))], "total": True, "count": count})
+    yield tail
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape target. Accepts `Authorization: Bearer <METRICS_TOKEN>`
+    (when the setting is set) or a logged-in staff session.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    auth = request.headers.get("Authorization", "")
+    token_ok = bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+    if not token_ok and not (request.user.is_active and request.user.is_staff):
+        if token:
+            return HttpResponse("Forbidden\n", status=403, content_type="text/plain")
+        return redirect_to_login(request.get_full_path(), "admin:login")
 
-# Create your views here.
+    return HttpResponse(metrics.render_exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,15 +1,53 @@
 from django.contrib import admin
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import path, reverse
+from django.utils.html import format_html
 from .models import Employee
 from jalali_date.admin import ModelAdminJalaliMixin
 from core.admin import JalaliDateAdminMixin
-from core.jalali import format_gregorian_to_jalali
+from core.jalali import JALALI_MONTHS_DARI, format_gregorian_to_jalali
+from payroll.history import employee_history
 
 
 @admin.register(Employee)
 class EmployeeAdmin(ModelAdminJalaliMixin,JalaliDateAdminMixin, admin.ModelAdmin):
-    list_display = ("first_name", "father_name", "department", "position", "employee_type", "base_salary", "status", "date_hired_jalali")
+    list_display = ("first_name", "father_name", "department", "position", "employee_type", "base_salary", "status", "date_hired_jalali", "history_link")
     def date_hired_jalali(self, obj):
         return format_gregorian_to_jalali(obj.date_hired)
     date_hired_jalali.short_description = 'Date Hired'
     list_filter = ("department", "employee_type", "status")
-    search_fields = ("first_name", "father_name", "phone")
\ No newline at end of file
+    search_fields = ("first_name", "father_name", "phone", "clock_code")
+    change_form_template = "admin/employees/employee/change_form.html"  # jalali change form + history link
+
+    @admin.display(description="History")
+    def history_link(self, obj):
+        return format_html('<a href="{}">History</a>', reverse("admin:employees_employee_history", args=[obj.pk]))
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path("<int:employee_id>/history/", self.admin_site.admin_view(self.history_view), name="employees_employee_history"),
+            path("<int:employee_id>/history.json", self.admin_site.admin_view(self.history_json_view), name="employees_employee_history_json"),
+        ]
+        return custom + urls
+
+    def history_view(self, request, employee_id: int):
+        """
+        Every payroll month of the employee with attendance exceptions and leave balances.
+        """
+        employee = get_object_or_404(Employee.objects.select_related("department"), pk=employee_id)
+        history = employee_history(employee.pk)
+        for month in history:
+            month["label"] = f"{JALALI_MONTHS_DARI[month['month']]} {month['year']}"
+        return render(request, "admin/employees/employee/history.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": f"Payroll history: {employee}",
+            "employee": employee,
+            "history": history,
+        })
+
+    def history_json_view(self, request, employee_id: int):
+        employee = get_object_or_404(Employee, pk=employee_id)
+        return JsonResponse({"employee_id": employee.pk, "history": employee_history(employee.pk)})
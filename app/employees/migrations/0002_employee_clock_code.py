@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='clock_code',
+            field=models.CharField(blank=True, db_index=True, help_text='Code enrolled on the time-clock devices; the employee ID is used when blank.', max_length=30),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_employee_clock_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='bank_account',
+            field=models.CharField(blank=True, help_text='Account number or IBAN salaries are transferred to (payroll bank files).', max_length=34),
+        ),
+    ]
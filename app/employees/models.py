@@ -25,7 +25,15 @@ class Employee(models.Model):
     base_salary = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(0)])
 
     phone = models.CharField(max_length=30, blank=True)
+    clock_code = models.CharField(
+        max_length=30, blank=True, db_index=True,
+        help_text="Code enrolled on the time-clock devices; the employee ID is used when blank.",
+    )
     address = models.TextField(blank=True)
+    bank_account = models.CharField(
+        max_length=34, blank=True,
+        help_text="Account number or IBAN salaries are transferred to (payroll bank files).",
+    )
 
     date_hired = models.DateField()
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.WORKING)
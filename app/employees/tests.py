@@ -1,3 +1,65 @@
-from django.test import TestCase
+import datetime as dt
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from attendance.models import AttendanceDay
+from core.jalali import jalali_month_range
+from leaves.models import LeaveType, LeaveYearBalance
+from org.models import Department, Position
+from payroll.history import employee_history
+from payroll.models import PayrollRun
+from payroll.services import calculate_payroll
+
+from .models import Employee
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False, ROLLUPS_REFRESH_IN_BACKGROUND=False)
+class PayrollHistoryTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Ops")
+        position = Position.objects.create(department=department, name="Clerk")
+        self.employee, self.other = [
+            Employee.objects.create(
+                first_name=name, father_name="F", department=department, position=position,
+                employee_type=Employee.EmployeeType.PERMANENT, base_salary=Decimal("30000"),
+                date_hired=dt.date(2020, 1, 1),
+            )
+            for name in ("Ahmad", "Other")
+        ]
+        self.runs = [PayrollRun.objects.create(year=1404, month=m) for m in (1, 2)]
+        for run in self.runs:
+            calculate_payroll(run)
+        # a recalculation replaces the line; only the active generation is listed
+        Employee.objects.filter(pk=self.employee.pk).update(base_salary=Decimal("36000"))
+        calculate_payroll(self.runs[1])
+        AttendanceDay.objects.create(
+            employee=self.employee, date=jalali_month_range(1404, 3).g_start, status=AttendanceDay.Status.ABSENT,
+        )
+        LeaveYearBalance.objects.create(
+            employee=self.employee, year=1404, remaining_days=Decimal("12"),
+            leave_type=LeaveType.objects.create(name="Annual", yearly_limit_days=20),
+        )
+
+    def test_months_newest_first_in_three_queries(self):
+        with self.assertNumQueries(3):
+            history = employee_history(self.employee.pk)
+
+        self.assertEqual([(m["year"], m["month"]) for m in history], [(1404, 3), (1404, 2), (1404, 1)])
+        no_run, recalculated, first = history
+        self.assertEqual((no_run["run_id"], no_run["line"], no_run["attendance"]["absent"]), (None, None, 1))
+        self.assertEqual(recalculated["run_id"], self.runs[1].pk)
+        self.assertEqual(recalculated["line"]["base_salary"], Decimal("36000.00"))
+        self.assertEqual(first["line"]["base_salary"], Decimal("30000.00"))
+        self.assertEqual(first["leave_balances"], [{"leave_type": "Annual", "remaining_days": Decimal("12.00")}])
+
+    def test_json_api(self):
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+        data = self.client.get(f"/admin/employees/employee/{self.employee.pk}/history.json").json()
+        self.assertEqual(data["employee_id"], self.employee.pk)
+        self.assertEqual([m["month"] for m in data["history"]], [3, 2, 1])
+        self.assertEqual(data["history"][1]["line"]["base_salary"], "36000.00")
+
+        self.assertEqual(self.client.get("/admin/employees/employee/999999/history.json").status_code, 404)
+        self.assertContains(self.client.get(f"/admin/employees/employee/{self.employee.pk}/history/"), "Ahmad")
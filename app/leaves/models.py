@@ -37,6 +37,7 @@ import jdatetime
 
 from employees.models import Employee
 from attendance.models import AttendanceDay  # ✅
+from core import metrics
 
 class LeaveEntry(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="leave_entries")
@@ -109,6 +110,7 @@ class LeaveEntry(models.Model):
             ).delete()
 
         days_int = int(self.days_count)
+        synced = 0
         for i in range(days_int):
             g_date = self.date_from + dt.timedelta(days=i)
 
@@ -122,6 +124,9 @@ class LeaveEntry(models.Model):
                 date=g_date,
                 defaults={"status": AttendanceDay.Status.LEAVE, "note": f"Leave: {self.leave_type.name}"},
             )
+            synced += 1
+
+        metrics.inc("hrms_leave_sync_days_total", synced)
 
     def save(self, *args, **kwargs):
         # Always compute date_to before saving
@@ -4,6 +4,7 @@ from django.dispatch import receiver
 
 from .models import LeaveEntry
 from attendance.models import AttendanceDay
+from core.rollups import mark_stale_dates
 
 
 @receiver(pre_delete, sender=LeaveEntry)
@@ -31,4 +32,5 @@ def remove_leave_attendance(sender, instance: LeaveEntry, **kwargs):
         employee=instance.employee,
         date__range=(date_from, date_to),
         status=AttendanceDay.Status.LEAVE,
-    ).delete()
\ No newline at end of file
+    ).delete()
+    mark_stale_dates([date_from, date_to])
\ No newline at end of file
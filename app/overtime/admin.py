@@ -1,6 +1,8 @@
 from django.http import HttpResponse
 
-from core.admin import JalaliDateAdminMixin
+from core.admin import JalaliDateAdminMixin, MonthImportAdminMixin, RollupStaleAdminMixin
+from core.rollups import mark_stale
+from core import metrics
 from jalali_date.admin import ModelAdminJalaliMixin
 
 from django.contrib import admin, messages
@@ -8,7 +10,10 @@ from django.urls import path
 from django.shortcuts import render, redirect
 from django.db import transaction
 from decimal import Decimal, InvalidOperation
+from datetime import timedelta
+from core.calendar import month_calendar
 from .exports import build_overtime_xlsx
+from .imports import import_overtime
 
 from employees.models import Employee
 from org.models import Department
@@ -16,12 +21,14 @@ from core.jalali import jalali_month_range, jalali_day_to_gregorian
 from .models import OvertimeEntry  # adjust name
 
 @admin.register(OvertimeEntry)
-class OvertimeEntryAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.ModelAdmin):
+class OvertimeEntryAdmin(RollupStaleAdminMixin, MonthImportAdminMixin, ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.ModelAdmin):
     list_display = ("employee", "date", "hours", "note")
     list_filter = ("date",)
     search_fields = ("employee__first_name", "employee__father_name", "note")
 
     change_list_template = "admin/overtime/overtime_changelist.html"
+    import_function = import_overtime
+    import_help = "Same layout as the overtime export: ID, Name, Department, then hours per day."
 
     def get_urls(self):
         urls = super().get_urls()
@@ -43,14 +50,15 @@ class OvertimeEntryAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
         employee_ordering = ("id", "first_name", "father_name") if order_by == "id" else ("first_name", "father_name", "id")
         employees = list(emp_qs.order_by(*employee_ordering))
 
-        wb = build_overtime_xlsx(jy, jm, employees)
-
         filename = f"overtime_{jy}_{jm:02d}_{order_by}.xlsx"
         response = HttpResponse(
             content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        wb.save(response)
+        with metrics.timed("hrms_export_seconds", kind="overtime"):
+            wb = build_overtime_xlsx(jy, jm, employees)
+            wb.save(response)
+        metrics.inc("hrms_export_bytes_total", len(response.content), kind="overtime")
         return response
 
     def bulk_overtime_view(self, request):
@@ -67,24 +75,34 @@ class OvertimeEntryAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
             return redirect(request.path)
 
         days = list(range(1, rng.days + 1))
+        calendar = month_calendar(jy, jm)
+        day_dates = {d: rng.g_start + timedelta(days=d - 1) for d in days}
 
         emp_qs = Employee.objects.filter(status=Employee.Status.WORKING).select_related("department", "position")
         if department_id:
             emp_qs = emp_qs.filter(department_id=department_id)
         employees = list(emp_qs.order_by("first_name", "father_name"))
 
-        # SAVE
+        # SAVE (one load, then bulk create/update/delete of the differences)
         if request.method == "POST":
-            with transaction.atomic():
+            with metrics.timed("hrms_grid_save_seconds", grid="overtime"), transaction.atomic():
+                existing = {
+                    (obj.employee_id, obj.date): obj
+                    for obj in OvertimeEntry.objects.filter(
+                        date__range=(rng.g_start, rng.g_end), employee__in=employees
+                    ).only("id", "employee_id", "date", "hours")
+                }
+                to_create, to_update, to_delete = [], [], []
                 for emp in employees:
                     for d in days:
-                        key = f"ot_{emp.id}_{d}"
-                        raw = (request.POST.get(key) or "").strip()
-                        g_date = jalali_day_to_gregorian(jy, jm, d)
+                        raw = (request.POST.get(f"ot_{emp.id}_{d}") or "").strip()
+                        g_date = day_dates[d]
+                        obj = existing.get((emp.id, g_date))
 
                         # Blank => delete
                         if raw == "":
-                            OvertimeEntry.objects.filter(employee=emp, date=g_date).delete()
+                            if obj:
+                                to_delete.append(obj.id)
                             continue
 
                         # Parse Decimal hours
@@ -95,16 +113,23 @@ class OvertimeEntryAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
 
                         # If user typed 0 => treat as blank
                         if hours <= 0:
-                            OvertimeEntry.objects.filter(employee=emp, date=g_date).delete()
+                            if obj:
+                                to_delete.append(obj.id)
                             continue
 
                         # save/update
-                        OvertimeEntry.objects.update_or_create(
-                            employee=emp,
-                            date=g_date,
-                            defaults={"hours": hours},
-                        )
-
+                        if obj is None:
+                            to_create.append(OvertimeEntry(employee=emp, date=g_date, hours=hours))
+                        elif obj.hours != hours:
+                            obj.hours = hours
+                            to_update.append(obj)
+
+                OvertimeEntry.objects.filter(id__in=to_delete).delete()
+                OvertimeEntry.objects.bulk_update(to_update, ["hours"], batch_size=1000)
+                OvertimeEntry.objects.bulk_create(to_create, batch_size=1000)
+                mark_stale(jy, jm)
+
+            metrics.inc("hrms_grid_save_cells_total", len(employees) * len(days), grid="overtime")
             messages.success(request, "Overtime entries saved.")
             return redirect(f"{request.path}?jy={jy}&jm={jm}&department_id={department_id}")
 
@@ -120,8 +145,12 @@ class OvertimeEntryAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
         for emp in employees:
             cells = []
             for d in days:
-                g_date = jalali_day_to_gregorian(jy, jm, d)
-                cells.append({"day": d, "value": ot_map.get((emp.id, g_date), "")})
+                g_date = day_dates[d]
+                cells.append({
+                    "day": d,
+                    "value": ot_map.get((emp.id, g_date), ""),
+                    "off": not calendar.is_working_day(g_date, emp.department_id),
+                })
             rows.append({"employee": emp, "cells": cells})
 
         ctx = {
@@ -132,5 +161,7 @@ class OvertimeEntryAdmin(ModelAdminJalaliMixin, JalaliDateAdminMixin, admin.Mode
             "loaded": (request.GET.get("jy") and request.GET.get("jm")) or request.method == "POST",
             "days": days,
             "rows": rows,
+            "friday_days": {d for d, g in day_dates.items() if g.weekday() == 4},
+            "holiday_days": {d: calendar.holidays[g] for d, g in day_dates.items() if g in calendar.holidays},
         }
         return render(request, "admin/overtime/bulk_grid.html", ctx)
\ No newline at end of file
@@ -0,0 +1,82 @@
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from core.importing import ImportResult, cell_text, chunked, employee_id_set, iter_rows, parse_employee_id
+from core.jalali import jalali_month_range
+from core.rollups import mark_stale
+
+from .models import OvertimeEntry
+
+FIRST_DAY_COLUMN = 3  # Employee ID, First Name, Father Name, day 1 ...
+
+
+@transaction.atomic
+def import_overtime(fh, filename: str, jy: int, jm: int, chunk_size: int = 1000) -> ImportResult:
+    """
+    Import a month in the build_overtime_xlsx layout (trailing total columns are ignored).
+    Each file row replaces that employee's overtime for the month; blank or 0 means none.
+    """
+    rng = jalali_month_range(jy, jm)
+    dates = [rng.g_start + timedelta(days=i) for i in range(rng.days)]
+    result = ImportResult()
+    employee_ids = employee_id_set()
+
+    rows = iter_rows(fh, filename)
+    next(rows, None)  # header
+
+    for chunk in chunked(rows, chunk_size):
+        wanted = {}  # (employee_id, date) -> hours
+        chunk_employees = set()
+
+        for number, row in chunk:
+            if not any(cell_text(v) for v in row):
+                continue
+            result.rows += 1
+            try:
+                emp_id = parse_employee_id(row[0] if row else None, employee_ids)
+                cells = {}
+                for i, g_date in enumerate(dates):
+                    col = FIRST_DAY_COLUMN + i
+                    text = cell_text(row[col]) if col < len(row) else ""
+                    if not text:
+                        continue
+                    try:
+                        hours = Decimal(text).quantize(Decimal("0.01"))
+                        if not hours.is_finite():  # NaN quantizes to NaN
+                            raise InvalidOperation
+                    except InvalidOperation:
+                        raise ValueError(f"day {i + 1}: {text!r} is not a number of hours") from None
+                    if hours < 0:
+                        raise ValueError(f"day {i + 1}: negative hours")
+                    if hours > 0:
+                        cells[(emp_id, g_date)] = hours
+            except ValueError as exc:
+                result.error(number, str(exc))
+                continue
+            chunk_employees.add(emp_id)
+            wanted.update(cells)
+
+        if not chunk_employees:
+            continue
+
+        existing = OvertimeEntry.objects.filter(
+            employee_id__in=chunk_employees,
+            date__range=(rng.g_start, rng.g_end),
+        ).values_list("id", "employee_id", "date")
+        stale = [pk for pk, emp_id, d in existing if (emp_id, d) not in wanted]
+        if stale:
+            result.deleted += OvertimeEntry.objects.filter(id__in=stale).delete()[0]
+
+        OvertimeEntry.objects.bulk_create(
+            [OvertimeEntry(employee_id=e, date=d, hours=h) for (e, d), h in wanted.items()],
+            update_conflicts=True,
+            unique_fields=["employee", "date"],
+            update_fields=["hours"],
+            batch_size=chunk_size,
+        )
+        result.upserted += len(wanted)
+
+    mark_stale(jy, jm)
+    return result.finish()
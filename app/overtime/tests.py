@@ -1,3 +1,97 @@
+import datetime as dt
+import io
+from decimal import Decimal
+
 from django.test import TestCase
+from openpyxl import Workbook
+
+from core.jalali import jalali_month_range
+from employees.models import Employee
+from org.models import Department, Position
+
+from .imports import import_overtime
+from .models import OvertimeEntry
+
+JY, JM = 1404, 2
+
+
+def xlsx(rows) -> io.BytesIO:
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Employee ID", "First Name", "Father Name", "1", "2", "3"])
+    for row in rows:
+        ws.append(row)
+    fh = io.BytesIO()
+    wb.save(fh)
+    fh.seek(0)
+    return fh
+
+
+class OvertimeImportTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Ops")
+        position = Position.objects.create(department=department, name="Clerk")
+        self.ids = [
+            Employee.objects.create(
+                first_name=f"E{i}", father_name="F", department=department, position=position,
+                employee_type=Employee.EmployeeType.PERMANENT, base_salary=Decimal("30000"),
+                date_hired=dt.date(2020, 1, 1),
+            ).id
+            for i in range(3)
+        ]
+        self.day1 = jalali_month_range(JY, JM).g_start
+
+    def test_rows_replace_the_month_across_chunks(self):
+        OvertimeEntry.objects.create(employee_id=self.ids[0], date=self.day1 + dt.timedelta(days=2), hours=Decimal("4"))
+        fh = xlsx([
+            [self.ids[0], "E0", "F", 2, None, 0],
+            [],  # blank rows are skipped
+            [self.ids[1], "E1", "F", 1.5, "", None],
+            [self.ids[2], "E2", "F", None, 3, None],
+        ])
+        result = import_overtime(fh, "overtime.xlsx", JY, JM, chunk_size=2)
+
+        self.assertEqual((result.rows, result.upserted, result.deleted, result.errors), (3, 3, 1, []))
+        self.assertEqual(
+            sorted(OvertimeEntry.objects.values_list("employee_id", "date", "hours")),
+            [
+                (self.ids[0], self.day1, Decimal("2.00")),
+                (self.ids[1], self.day1, Decimal("1.50")),
+                (self.ids[2], self.day1 + dt.timedelta(days=1), Decimal("3.00")),
+            ],
+        )
+
+    def test_bad_cells_reject_the_file(self):
+        OvertimeEntry.objects.create(employee_id=self.ids[0], date=self.day1, hours=Decimal("4"))
+        fh = xlsx([
+            [self.ids[0], "E0", "F", "NaN"],
+            [self.ids[1], "E1", "F", "Infinity"],
+            [self.ids[2], "E2", "F", -1],
+            [999999, "X", "F", 1],
+            ["abc", "X", "F", 1],
+            [self.ids[2], "E2", "F", "two"],
+        ])
+        result = import_overtime(fh, "overtime.xlsx", JY, JM, chunk_size=2)
+
+        self.assertEqual(
+            result.errors,
+            [
+                (2, "day 1: 'NaN' is not a number of hours"),
+                (3, "day 1: 'Infinity' is not a number of hours"),
+                (4, "day 1: negative hours"),
+                (5, "unknown Employee ID 999999"),
+                (6, "Employee ID 'abc' is not a number"),
+                (7, "day 1: 'two' is not a number of hours"),
+            ],
+        )
+        self.assertEqual((result.upserted, result.deleted), (0, 0))
+        self.assertEqual(list(OvertimeEntry.objects.values_list("hours", flat=True)), [Decimal("4.00")])
+
+    def test_unreadable_file(self):
+        with self.assertRaisesMessage(ValueError, "not a readable .xlsx file"):
+            import_overtime(io.BytesIO(b"not a zip"), "overtime.xlsx", JY, JM)
 
-# Create your tests here.
+    def test_csv(self):
+        fh = io.BytesIO(f"Employee ID,First Name,Father Name,1\n{self.ids[0]},E0,F,nan\n".encode())
+        result = import_overtime(fh, "overtime.csv", JY, JM)
+        self.assertEqual(result.errors, [(2, "day 1: 'nan' is not a number of hours")])
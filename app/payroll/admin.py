@@ -1,18 +1,49 @@
 # payroll/admin.py
+import json
+import tempfile
+import zipfile
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
 from django.contrib import admin, messages
-from .models import PayrollRun, PayrollLine, BonusEntry, PrepaidEntry
-from .services import calculate_payroll
-from django.urls import path
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from .exports import build_payroll_xlsx
-from core.jalali import JALALI_MONTHS_DARI
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import get_template, render_to_string
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from core import metrics
+from core.admin import MonthImportAdminMixin
+from core.importing import chunked
+from core.jalali import JALALI_MONTHS_DARI, jalali_month_range
+from core.paging import keyset_page
+from core.profiling import Profiler
+from employees.models import Employee
+from org.models import Department
+
+from .annual import build_annual_xlsx
+from .bank import FORMATS as BANK_FORMATS, BankFileError, control as bank_control, write_bank_files
+from .closing import progress
+from .exports import build_payroll_xlsx, build_variance_xlsx
+from .forms import PayrollScopeForm
+from .imports import import_bonuses, import_prepaids
+from .models import PayrollRun, BonusEntry, PrepaidEntry, MonthClose, PayrollYtd
+from .payslips import LAYOUTS as PAYSLIP_LAYOUTS, PayslipError, write_payslips
+from .reporting import LINE_SORTS, TOTAL_FIELDS, grouped_rows, report_lines, report_order, run_totals
+from .services import (
+    PayrollCalendarError,
+    PayrollRunFinalError,
+    calculate_payroll,
+    load_entry_grid,
+    save_entry_grid,
+)
+from .variance import SORTS as VARIANCE_SORTS, previous_run, summarize, variance_rows
 
 
 @admin.register(BonusEntry)
-class BonusEntryAdmin(admin.ModelAdmin):
+class BonusEntryAdmin(MonthImportAdminMixin, admin.ModelAdmin):
     list_display = ("employee", "year", "jalali_month", "amount", "note")
     def jalali_month(self, obj):
         return JALALI_MONTHS_DARI[obj.month]
@@ -20,9 +51,96 @@ class BonusEntryAdmin(admin.ModelAdmin):
     list_filter = ("year", "month")
     search_fields = ("employee__first_name", "employee__father_name", "note")
 
+    change_list_template = "admin/payroll/entry_changelist.html"
+    import_function = import_bonuses
+    import_help = "Columns: Employee ID, Amount, Note (optional). A row with the same employee and note replaces that bonus."
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom = [
+            path("bulk/", self.admin_site.admin_view(self.bulk_entries_view), name="payroll_entries_bulk"),
+        ]
+        return custom + urls
+
+    def bulk_entries_view(self, request):
+        """
+        Department x employee grid of the month's bonus and prepaid (one entry of each per employee).
+        """
+        jy = int(request.GET.get("jy") or request.POST.get("jy") or 1404)
+        jm = int(request.GET.get("jm") or request.POST.get("jm") or 1)
+        department_id = request.GET.get("department_id") or request.POST.get("department_id") or ""
+
+        departments = Department.objects.all().order_by("name")
+
+        try:
+            jalali_month_range(jy, jm)
+        except Exception:
+            messages.error(request, "Invalid Jalali year/month.")
+            return redirect(request.path)
+
+        emp_qs = Employee.objects.filter(status=Employee.Status.WORKING).select_related("department", "position")
+        if department_id:
+            emp_qs = emp_qs.filter(department_id=department_id)
+        employees = list(emp_qs.order_by("first_name", "father_name"))
+
+        kinds = (("b", BonusEntry), ("p", PrepaidEntry))
+
+        # SAVE
+        if request.method == "POST":
+            posted = {prefix: {} for prefix, _ in kinds}
+            for emp in employees:
+                for prefix, _ in kinds:
+                    raw_id = request.POST.get(f"{prefix}id_{emp.id}") or ""
+                    raw = (request.POST.get(f"{prefix}amt_{emp.id}") or "").strip()
+                    note = (request.POST.get(f"{prefix}note_{emp.id}") or "").strip()[:255]
+                    try:
+                        amount = Decimal(raw) if raw else None
+                    except (InvalidOperation, ValueError):
+                        continue  # unreadable cell: leave the entry as it is
+                    # 0 => treat as blank
+                    if amount is not None and amount <= 0:
+                        amount = None
+                    posted[prefix][emp.id] = (int(raw_id) if raw_id.isdigit() else None, amount, note)
+
+            with metrics.timed("hrms_grid_save_seconds", grid="entries"), transaction.atomic():
+                counts = {prefix: save_entry_grid(model, jy, jm, employees, posted[prefix]) for prefix, model in kinds}
+
+            metrics.inc("hrms_grid_save_cells_total", len(employees) * len(kinds), grid="entries")
+            messages.success(
+                request,
+                "Bonuses: {created} added, {updated} changed, {deleted} removed. ".format(**counts["b"])
+                + "Prepaids: {created} added, {updated} changed, {deleted} removed.".format(**counts["p"]),
+            )
+            return redirect(f"{request.path}?jy={jy}&jm={jm}&department_id={department_id}")
+
+        # LOAD existing entries for the month
+        loaded = bool(request.GET.get("jy") and request.GET.get("jm"))
+        rows = []
+        if loaded:
+            grids = {prefix: load_entry_grid(model, jy, jm, employees) for prefix, model in kinds}
+            for emp in employees:
+                row = {"employee": emp}
+                for prefix, _ in kinds:
+                    entry, extra = grids[prefix].get(emp.id, (None, 0))
+                    row[prefix] = {"entry": entry, "extra": extra}
+                rows.append(row)
+
+        ctx = {
+            **self.admin_site.each_context(request),
+            "title": "Bulk Bonuses & Prepaids",
+            "jy": jy,
+            "jm": jm,
+            "month_name": JALALI_MONTHS_DARI.get(jm, jm),
+            "department_id": department_id,
+            "departments": departments,
+            "loaded": loaded,
+            "rows": rows,
+        }
+        return render(request, "admin/payroll/bulk_entries.html", ctx)
+
 
 @admin.register(PrepaidEntry)
-class PrepaidEntryAdmin(admin.ModelAdmin):
+class PrepaidEntryAdmin(MonthImportAdminMixin, admin.ModelAdmin):
     list_display = ("employee", "year", "jalali_month", "amount", "note")
     def jalali_month(self, obj):
         return JALALI_MONTHS_DARI[obj.month]
@@ -30,23 +148,14 @@ class PrepaidEntryAdmin(admin.ModelAdmin):
     list_filter = ("year", "month")
     search_fields = ("employee__first_name", "employee__father_name", "note")
 
+    change_list_template = "admin/payroll/entry_changelist.html"
+    import_function = import_prepaids
+    import_help = "Columns: Employee ID, Amount, Note (optional). A row with the same employee and note replaces that prepaid."
+
 
-class PayrollLineInline(admin.TabularInline):
-    model = PayrollLine
-    extra = 0
-    can_delete = False
-    readonly_fields = (
-        "employee",
-        "base_salary",
-        "attendance_deduction",
-        "salary",
-        "bonus",
-        "overtime",
-        "total",
-        "tax",
-        "prepaid",
-        "amount_to_pay",
-    )
+LINES_PER_PAGE = 100
+REPORT_PAGE_SIZE = 200
+PRINT_CHUNK_SIZE = 500
 
 
 @admin.register(PayrollRun)
@@ -56,20 +165,79 @@ class PayrollRunAdmin(admin.ModelAdmin):
         return JALALI_MONTHS_DARI[obj.month]
     jalali_month.short_description = 'Month'
     list_filter = ("year", "month", "status")
-    actions = ["action_calculate"]
-    inlines = [PayrollLineInline]
+    actions = ["action_calculate", "action_calculate_partial"]
+    readonly_fields = ("lines_summary", "profile_summary")
+
+    @admin.display(description="Lines")
+    def lines_summary(self, obj):
+        if obj is None or obj.pk is None:
+            return "—"
+        count = obj.active_lines().count()
+        url = reverse("admin:payroll_lines", args=[obj.pk])
+        return format_html('{} line(s) — <a href="{}">browse lines</a>', count, url)
+
+    @admin.display(description="Last timings")
+    def profile_summary(self, obj):
+        blocks = []
+        for key in ("calculate", "export", "payslips"):
+            data = (obj.profile or {}).get(key)
+            if not data:
+                continue
+            rows = format_html_join(
+                "",
+                "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>",
+                ((s["name"], s["wall_ms"], s["queries"], s["rows"]) for s in data["spans"]),
+            )
+            blocks.append(format_html(
+                "<p><strong>{}</strong> at {} — {} ms, {} queries</p>"
+                "<table><tr><th>Phase</th><th>ms</th><th>Queries</th><th>Rows</th></tr>{}</table>",
+                key.title(), data["at"], data["wall_ms"], data["queries"], rows,
+            ))
+        if not blocks:
+            return "—"
+        return format_html_join("", "{}", ((b,) for b in blocks))
 
     @admin.action(description="Calculate payroll for selected runs")
     def action_calculate(self, request, queryset):
-        for run in queryset:
-            calculate_payroll(run)
+        try:
+            for run in queryset:
+                calculate_payroll(run)
+        except (PayrollRunFinalError, PayrollCalendarError) as exc:
+            self.message_user(request, str(exc), level=messages.ERROR)
+            return
         self.message_user(request, "Payroll calculated successfully.", level=messages.SUCCESS)
+
+    @admin.action(description="Calculate payroll for departments / employees of selected runs")
+    def action_calculate_partial(self, request, queryset):
+        form = PayrollScopeForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            department_ids = [d.id for d in form.cleaned_data["departments"]]
+            employee_ids = form.cleaned_data["employee_ids"]
+            try:
+                for run in queryset:
+                    calculate_payroll(run, department_ids=department_ids, employee_ids=employee_ids)
+            except (PayrollRunFinalError, PayrollCalendarError) as exc:
+                self.message_user(request, str(exc), level=messages.ERROR)
+                return None
+            self.message_user(request, "Payroll recalculated for the chosen employees.", level=messages.SUCCESS)
+            return None
+        return render(request, "admin/payroll/calculate_scope.html", {
+            **self.admin_site.each_context(request),
+            "title": "Partial payroll calculation",
+            "form": form,
+            "runs": queryset,
+        })
         
     def get_urls(self):
         urls = super().get_urls()
         custom = [
+            path("annual/", self.admin_site.admin_view(self.annual_view), name="payroll_annual"),
+            path("<int:run_id>/lines/", self.admin_site.admin_view(self.lines_view), name="payroll_lines"),
             path("<int:run_id>/report/", self.admin_site.admin_view(self.report_view), name="payroll_report"),
+            path("<int:run_id>/variance/", self.admin_site.admin_view(self.variance_view), name="payroll_variance"),
             path("<int:run_id>/export/", self.admin_site.admin_view(self.export_view), name="payroll_export"),
+            path("<int:run_id>/bank/", self.admin_site.admin_view(self.bank_view), name="payroll_bank"),
+            path("<int:run_id>/payslips/", self.admin_site.admin_view(self.payslips_view), name="payroll_payslips"),
         ]
         return custom + urls
 
@@ -77,34 +245,304 @@ class PayrollRunAdmin(admin.ModelAdmin):
     def export_view(self, request, run_id: int):
         run = get_object_or_404(PayrollRun, id=run_id)
         order_by = (request.GET.get("order_by") or "name").strip().lower()
-        wb = build_payroll_xlsx(run, order_by=order_by)
+        profiler = Profiler()
+        wb = build_payroll_xlsx(run, order_by=order_by, profiler=profiler)
 
         filename = f"payroll_{run.year}_{run.month:02d}_{order_by}.xlsx"
         response = HttpResponse(
             content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        wb.save(response)
+        with profiler.span("save") as span:
+            wb.save(response)
+            span.rows = len(response.content)
+        run.record_profile("export", profiler)
+        metrics.observe("hrms_export_seconds", run.profile["export"]["wall_ms"] / 1000, kind="payroll")
+        metrics.inc("hrms_export_bytes_total", len(response.content), kind="payroll")
         return response
 
-    def report_view(self, request, run_id: int):
+    def bank_view(self, request, run_id: int):
+        """
+        Zip of the run's bank payment files (?format=fixed|csv) with a control.json
+        of per-file totals and checksums; the zip is spooled to disk, not memory.
+        """
         run = get_object_or_404(PayrollRun, id=run_id)
-        lines = run.lines.select_related("employee").all()
-
-        totals = lines.aggregate(
-            base_salary=Sum("base_salary"),
-            attendance_deduction=Sum("attendance_deduction"),
-            salary=Sum("salary"),
-            bonus=Sum("bonus"),
-            overtime=Sum("overtime"),
-            total=Sum("total"),
-            tax=Sum("tax"),
-            prepaid=Sum("prepaid"),
-            amount_to_pay=Sum("amount_to_pay"),
+        fmt = request.GET.get("format") if request.GET.get("format") in BANK_FORMATS else "fixed"
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                with metrics.timed("hrms_export_seconds", kind="bank"):
+                    batch = write_bank_files(run, Path(tmp), fmt=fmt)
+            except BankFileError as exc:
+                self.message_user(request, str(exc), level=messages.ERROR)
+                return redirect(reverse("admin:payroll_payrollrun_change", args=[run.pk]))
+
+            archive = tempfile.TemporaryFile()
+            with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr("control.json", json.dumps(bank_control(batch), ensure_ascii=False, indent=2))
+                for f in batch.files:
+                    zf.write(Path(tmp) / f.name, f.name)
+        metrics.inc("hrms_export_bytes_total", archive.tell(), kind="bank")
+        archive.seek(0)
+        return FileResponse(archive, as_attachment=True, filename=f"bank_{run.year}_{run.month:02d}_{fmt}.zip")
+
+    def payslips_view(self, request, run_id: int):
+        """
+        Zip of the run's payslips (?layout=employee|department), rendered in this
+        process and spooled to disk; the `payslips` command renders large runs across
+        the worker pool.
+        """
+        run = get_object_or_404(PayrollRun, id=run_id)
+        layout = request.GET.get("layout") if request.GET.get("layout") in PAYSLIP_LAYOUTS else "employee"
+        archive = tempfile.TemporaryFile()
+        profiler = Profiler()
+        try:
+            with metrics.timed("hrms_export_seconds", kind="payslips"):
+                write_payslips(run, archive, layout=layout, workers=1, profiler=profiler)
+        except PayslipError as exc:
+            archive.close()
+            self.message_user(request, str(exc), level=messages.ERROR)
+            return redirect(reverse("admin:payroll_payrollrun_change", args=[run.pk]))
+        run.record_profile("payslips", profiler)
+        metrics.inc("hrms_export_bytes_total", archive.tell(), kind="payslips")
+        archive.seek(0)
+        return FileResponse(archive, as_attachment=True, filename=f"payslips_{run.year}_{run.month:02d}_{layout}.zip")
+
+    def annual_view(self, request):
+        """
+        ?jy=1404 downloads the annual per-employee pivot of that Jalali year.
+        """
+        jy = request.GET.get("jy")
+        if jy and jy.isdigit():
+            jy = int(jy)
+            response = HttpResponse(
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            response["Content-Disposition"] = f'attachment; filename="payroll_annual_{jy}.xlsx"'
+            with metrics.timed("hrms_export_seconds", kind="annual"):
+                build_annual_xlsx(jy).save(response)
+            metrics.inc("hrms_export_bytes_total", len(response.content), kind="annual")
+            return response
+
+        return render(request, "admin/payroll/annual.html", {
+            **self.admin_site.each_context(request),
+            "title": "Annual payroll report",
+            "years": PayrollRun.objects.order_by("-year").values_list("year", flat=True).distinct(),
+        })
+
+    def lines_view(self, request, run_id: int):
+        """
+        Line browser: keyset pages over the sort key, filter on the department the line
+        was calculated in and name/ID search; totals and count are aggregated in the
+        database for the filtered lines.
+        """
+        run = get_object_or_404(PayrollRun, id=run_id)
+        sort = request.GET.get("sort") if request.GET.get("sort") in LINE_SORTS else "name"
+        department_ids = [int(d) for d in request.GET.getlist("department") if d.isdigit()]
+        q = (request.GET.get("q") or "").strip()
+
+        lines = run.active_lines()
+        if department_ids:
+            lines = lines.filter(department_id__in=department_ids)
+        if q:
+            match = Q(employee__first_name__icontains=q) | Q(employee__father_name__icontains=q)
+            if q.isdigit():
+                match |= Q(employee_id=int(q))
+            lines = lines.filter(match)
+
+        totals = lines.aggregate(lines=Count("id"), **{name: Sum(name) for name in TOTAL_FIELDS})
+        page = keyset_page(
+            lines.select_related("employee", "department"),
+            LINE_SORTS[sort],
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            size=LINES_PER_PAGE,
         )
 
-        return render(request, "admin/payroll/report.html", {
+        params = request.GET.copy()
+        for key in ("after", "before"):
+            params.pop(key, None)
+
+        def page_url(**cursor):
+            query = params.copy()
+            query.update(cursor)
+            return f"?{query.urlencode()}"
+
+        return render(request, "admin/payroll/run_lines.html", {
+            **self.admin_site.each_context(request),
+            "title": f"Payroll lines — {run}",
             "run": run,
-            "lines": lines,
+            "page": page,
             "totals": totals,
-        })
\ No newline at end of file
+            "sort": sort,
+            "sorts": [(key, key.title()) for key in LINE_SORTS],
+            "q": q,
+            "departments": Department.objects.order_by("name"),
+            "department_ids": department_ids,
+            "next_url": page_url(after=page.next_cursor) if page.next_cursor else None,
+            "prev_url": page_url(before=page.prev_cursor) if page.prev_cursor else None,
+            "first_url": page_url() if page.prev_cursor else None,
+        })
+
+    def report_view(self, request, run_id: int):
+        """
+        Report grouped by department: keyset pages of REPORT_PAGE_SIZE rows with
+        department subtotals and grand totals from run_totals (cached per lines_revision).
+        ?print=1 streams every row in chunks for the browser's print dialog.
+        """
+        run = get_object_or_404(PayrollRun, id=run_id)
+        sort = request.GET.get("sort") if request.GET.get("sort") in LINE_SORTS else "name"
+        totals = run_totals(run)
+
+        if request.GET.get("print"):
+            return StreamingHttpResponse(
+                self._stream_report(request, run, sort, totals), content_type="text/html; charset=utf-8"
+            )
+
+        page = keyset_page(
+            report_lines(run),
+            report_order(sort),
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            size=REPORT_PAGE_SIZE,
+        )
+        return render(request, "admin/payroll/report.html", {
+            **self.admin_site.each_context(request),
+            "run": run,
+            "rows": list(grouped_rows(page.rows, totals["departments"])),
+            "totals": totals["grand"],
+            "sort": sort,
+            "sorts": [(key, key.title()) for key in LINE_SORTS],
+            "next_url": f"?sort={sort}&after={page.next_cursor}" if page.next_cursor else None,
+            "prev_url": f"?sort={sort}&before={page.prev_cursor}" if page.prev_cursor else None,
+            "first_url": f"?sort={sort}" if page.prev_cursor else None,
+        })
+
+    def variance_view(self, request, run_id: int):
+        """
+        Compare with another run (default: the previous month's). ?export=xlsx downloads
+        the same rows.
+        """
+        run = get_object_or_404(PayrollRun, id=run_id)
+        against = request.GET.get("against")
+        previous = (
+            PayrollRun.objects.filter(id=against).first() if against and against.isdigit() else previous_run(run)
+        )
+        sort = request.GET.get("sort") if request.GET.get("sort") in VARIANCE_SORTS else "variance"
+        try:
+            threshold_pct = Decimal(request.GET.get("threshold") or "10")
+            threshold_amount = Decimal(request.GET.get("amount") or "0")
+        except InvalidOperation:
+            messages.error(request, "Thresholds must be numbers.")
+            threshold_pct, threshold_amount = Decimal("10"), Decimal("0")
+        changed_only = not request.GET.get("all")
+
+        rows, summary = [], None
+        if previous is not None and previous.pk != run.pk:
+            rows = variance_rows(run, previous, sort, threshold_pct, threshold_amount, changed_only)
+            summary = summarize(rows)
+
+            if request.GET.get("export") == "xlsx":
+                wb = build_variance_xlsx(run, previous, rows, summary)
+                response = HttpResponse(
+                    content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+                filename = f"variance_{run.year}_{run.month:02d}_vs_{previous.year}_{previous.month:02d}.xlsx"
+                response["Content-Disposition"] = f'attachment; filename="{filename}"'
+                with metrics.timed("hrms_export_seconds", kind="variance"):
+                    wb.save(response)
+                metrics.inc("hrms_export_bytes_total", len(response.content), kind="variance")
+                return response
+
+        params = request.GET.copy()
+        params.pop("export", None)
+        params["export"] = "xlsx"
+        return render(request, "admin/payroll/variance.html", {
+            **self.admin_site.each_context(request),
+            "title": f"Variance — {run}",
+            "run": run,
+            "previous": previous,
+            "runs": PayrollRun.objects.exclude(pk=run.pk),
+            "rows": rows,
+            "summary": summary,
+            "sort": sort,
+            "sorts": [(key, key.title()) for key in VARIANCE_SORTS],
+            "threshold": threshold_pct,
+            "amount": threshold_amount,
+            "show_all": not changed_only,
+            "export_url": f"?{params.urlencode()}",
+        })
+
+    def _stream_report(self, request, run, sort, totals):
+        page = render_to_string(
+            "admin/payroll/report_print.html",
+            {"run": run, "totals": totals["grand"]},
+            request=request,
+        )
+        head, tail = page.split("<!-- rows -->", 1)
+        yield head
+        rows_template = get_template("admin/payroll/report_rows.html")
+        lines = report_lines(run).order_by(*report_order(sort)).iterator(chunk_size=PRINT_CHUNK_SIZE)
+        department = None
+        for chunk in chunked(lines, PRINT_CHUNK_SIZE):
+            yield rows_template.render({"rows": grouped_rows(chunk, totals["departments"], department)})
+            department = chunk[-1].department_id
+        yield tail
+
+
+@admin.register(MonthClose)
+class MonthCloseAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the month-close pipeline; closes are run by `manage.py close_month`.
+    """
+    list_display = ("run", "stage", "status", "stage_progress", "updated_at")
+    list_filter = ("stage", "status")
+    list_select_related = ("run",)
+    fields = ("run", "stage", "status", "stage_progress", "chunk_size", "error", "issue_list",
+              "archive_path", "started_at", "updated_at", "finished_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Progress")
+    def stage_progress(self, obj):
+        if obj.stage == MonthClose.Stage.DONE:
+            return "✅"
+        done, total = progress(obj)
+        if not total:
+            return "—"
+        return format_html(
+            '<progress value="{}" max="{}" style="width:120px;"></progress> {} / {} chunks',
+            done, total, done, total,
+        )
+
+    @admin.display(description="Validation issues")
+    def issue_list(self, obj):
+        issues = [i for c in obj.chunks.filter(stage=MonthClose.Stage.VALIDATE) for i in c.issues]
+        if not issues:
+            return "—"
+        return format_html(
+            "<ul>{}</ul>",
+            format_html_join("", "<li>Employee {}: {}</li>", ((e, m) for e, m in issues)),
+        )
+
+
+@admin.register(PayrollYtd)
+class PayrollYtdAdmin(admin.ModelAdmin):
+    """
+    Read-only: the rows follow the payroll lines (payroll.ytd); `manage.py rebuild_ytd` recomputes them.
+    """
+    list_display = ("employee", "year", "months_paid", "gross", "overtime", "bonus", "tax", "prepaid", "net")
+    list_filter = ("year", "employee__department")
+    list_select_related = ("employee",)
+    search_fields = ("employee__first_name", "employee__father_name")
+    readonly_fields = ("employee", "year", "months_paid", "gross", "overtime", "bonus", "tax", "prepaid", "net", "updated_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,129 @@
+"""
+Annual per-employee payroll pivot: one row per employee, one column group per Jalali
+month of the year, from a single conditional-aggregation query over the active lines
+of every run of the year (SUM(...) FILTER (WHERE month = m), CASE WHEN on SQLite).
+
+Rows are grouped by the department each line was calculated in (PayrollLine.department),
+so subtotals agree with the rollups; an employee who moved during the year has a row
+in each department, holding the months paid there.
+
+The workbook is written with openpyxl's write_only mode while the query is iterated,
+with a subtotal row after each department and a grand total at the end.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import F, Q, Sum
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from core.jalali import JALALI_MONTHS_DARI
+
+from .exports import HEADER_FILL
+from .models import PayrollLine
+
+MONTHS = range(1, 13)
+# (field, header); "ytd_tax" is the row's running tax total up to and including the month
+MONTH_COLUMNS = (
+    ("base_salary", "Base"),
+    ("attendance_deduction", "Deduction"),
+    ("overtime", "Overtime"),
+    ("bonus", "Bonus"),
+    ("tax", "Tax"),
+    ("ytd_tax", "YTD Tax"),
+    ("amount_to_pay", "Net"),
+)
+YEAR_FIELDS = ("base_salary", "attendance_deduction", "overtime", "bonus", "tax", "amount_to_pay")
+EMPLOYEE_COLUMNS = ("Employee ID", "First Name", "Father Name", "Department")
+BOLD = Font(bold=True)
+
+
+def annual_rows(jy: int):
+    """
+    Values rows ordered by line department and employee, one per (employee, department):
+    employee keys, "<field>_<month>" for every month column and "year_<field>" totals.
+    """
+    aggregates = {}
+    for m in MONTHS:
+        for name, _ in MONTH_COLUMNS:
+            if name == "ytd_tax":
+                aggregates[f"ytd_tax_{m}"] = Sum("tax", filter=Q(run__month__lte=m))
+            else:
+                aggregates[f"{name}_{m}"] = Sum(name, filter=Q(run__month=m))
+    for name in YEAR_FIELDS:
+        aggregates[f"year_{name}"] = Sum(name)
+
+    return (
+        PayrollLine.objects
+        .filter(run__year=jy, generation=F("run__version"))
+        .values(
+            "employee_id", "employee__first_name", "employee__father_name",
+            "department_id", "department__name",
+        )
+        .annotate(**aggregates)
+        .order_by("department__name", "department_id", "employee__first_name", "employee_id")
+    )
+
+
+def value_columns() -> list[str]:
+    return [f"{name}_{m}" for m in MONTHS for name, _ in MONTH_COLUMNS] + [f"year_{name}" for name in YEAR_FIELDS]
+
+
+def header_row() -> list[str]:
+    return (
+        list(EMPLOYEE_COLUMNS)
+        + [f"{JALALI_MONTHS_DARI[m]} {label}" for m in MONTHS for _, label in MONTH_COLUMNS]
+        + [f"Year {label}" for name, label in MONTH_COLUMNS if name in YEAR_FIELDS]
+    )
+
+
+def build_annual_xlsx(jy: int, chunk_size: int = 2000) -> Workbook:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(f"Payroll {jy}")
+    ws.freeze_panes = "E2"
+
+    header = []
+    for title in header_row():
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font, cell.fill = BOLD, HEADER_FILL
+        header.append(cell)
+    ws.append(header)
+
+    columns = value_columns()
+    zero = dict.fromkeys(columns, Decimal("0"))
+
+    def total_row(label: str, sums: dict) -> list:
+        cells = [WriteOnlyCell(ws, value=label), None, None, None]
+        for c in columns:
+            cell = WriteOnlyCell(ws, value=float(sums[c]))
+            cell.font = BOLD
+            cells.append(cell)
+        cells[0].font = BOLD
+        return cells
+
+    department, department_name = object(), ""
+    subtotal, grand = dict(zero), dict(zero)
+    for row in annual_rows(jy).iterator(chunk_size=chunk_size):
+        if row["department_id"] != department:
+            if department_name:
+                ws.append(total_row(f"Subtotal {department_name}", subtotal))
+            department, department_name = row["department_id"], row["department__name"]
+            subtotal = dict(zero)
+
+        values = []
+        for c in columns:
+            value = row[c] or Decimal("0")
+            subtotal[c] += value
+            grand[c] += value
+            values.append(float(value) if row[c] is not None else None)
+        ws.append([
+            row["employee_id"], row["employee__first_name"], row["employee__father_name"], department_name,
+            *values,
+        ])
+
+    if department_name:
+        ws.append(total_row(f"Subtotal {department_name}", subtotal))
+    ws.append(total_row("TOTALS", grand))
+    return wb
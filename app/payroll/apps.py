@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PayrollConfig(AppConfig):
     name = 'payroll'
+
+    def ready(self):
+        from . import signals  # noqa
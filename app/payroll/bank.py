@@ -0,0 +1,249 @@
+"""
+Bank payment batch files of a FINAL payroll run, as fixed-width records or CSV.
+
+The active lines with something to pay are read once through a server-side cursor
+(only employee id, name, bank account and amount), and written straight to the
+current part file; after `rows_per_file` payments the part gets its trailer and the
+next one is started. Control totals (payments, amount, account hash total) and the
+SHA-256 of every part are computed in the same pass, so memory does not grow with
+the number of employees.
+
+Fixed-width layout (widths in UTF-8 bytes, CRLF line ends; names are cut at a
+character boundary and padded with spaces). An account or employee id that does
+not fit its field is never cut, since the hash total covers the full account: the
+payment is left out and listed as rejected on the batch, like a missing account.
+
+    H  debit account(20)  value date YYYYMMDD(8)  batch(12)  part(3)
+    D  sequence(6)  account(34)  amount in cents(15)  name(35)  employee id(10)
+    T  payments(6)  amount in cents(18)  account hash total(15)
+
+    write_bank_files(run, folder, fmt="fixed", rows_per_file=5000) -> BankBatch
+"""
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import hashlib
+import io
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import PayrollLine, PayrollRun
+
+FORMATS = ("fixed", "csv")
+MAX_MISSING = 200
+HASH_MODULUS = 10 ** 15
+NON_DIGITS = re.compile(r"\D")
+
+
+class BankFileError(ValueError):
+    pass
+
+
+@dataclass
+class BankFile:
+    name: str
+    payments: int = 0
+    amount: Decimal = Decimal("0.00")
+    hash_total: int = 0
+    sha256: str = ""
+
+
+@dataclass
+class BankBatch:
+    batch_id: str
+    files: list[BankFile] = field(default_factory=list)
+    missing_accounts: list[int] = field(default_factory=list)  # first MAX_MISSING employee ids
+    missing_count: int = 0
+    rejected: list[int] = field(default_factory=list)  # first MAX_MISSING employee ids
+    rejected_count: int = 0
+
+    @property
+    def payments(self) -> int:
+        return sum(f.payments for f in self.files)
+
+    @property
+    def amount(self) -> Decimal:
+        return sum((f.amount for f in self.files), Decimal("0.00"))
+
+
+def _cents(amount: Decimal) -> int:
+    return int((amount * 100).to_integral_value())
+
+
+def _fit(value, width: int, align: str = "<") -> str:
+    encoded = str(value).encode("utf-8")[:width]
+    text = encoded.decode("utf-8", "ignore")  # drops a character cut in half
+    padding = " " * (width - len(text.encode("utf-8")))
+    return text + padding if align == "<" else padding + text
+
+
+def _fits(value, width: int) -> bool:
+    return len(str(value).encode("utf-8")) <= width
+
+
+def _account_hash(account: str) -> int:
+    digits = NON_DIGITS.sub("", account)
+    return int(digits) % HASH_MODULUS if digits else 0
+
+
+class _Part:
+    """
+    One open part file: records are hashed and counted as they are written.
+    """
+
+    def __init__(self, path: Path, fmt: str, batch_id: str, number: int, value_date: dt.date):
+        self.info = BankFile(name=path.name)
+        self.fmt = fmt
+        self.digest = hashlib.sha256()
+        self.fh = open(path, "w", encoding="utf-8", newline="")
+        self.buffer = io.StringIO()
+        self.csv = csv.writer(self.buffer, lineterminator="\r\n")
+        if fmt == "fixed":
+            self._write(
+                "H" + _fit(settings.PAYROLL_BANK_DEBIT_ACCOUNT, 20) + value_date.strftime("%Y%m%d")
+                + _fit(batch_id, 12) + _fit(number, 3, ">") + "\r\n"
+            )
+        else:
+            self._row(["sequence", "account", "amount", "name", "employee_id"])
+
+    def _write(self, text: str):
+        self.fh.write(text)
+        self.digest.update(text.encode("utf-8"))
+
+    def _row(self, values):
+        self.csv.writerow(values)
+        self._write(self.buffer.getvalue())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def add(self, employee_id: int, name: str, account: str, amount: Decimal):
+        info = self.info
+        info.payments += 1
+        info.amount += amount
+        info.hash_total = (info.hash_total + _account_hash(account)) % HASH_MODULUS
+        if self.fmt == "fixed":
+            self._write(
+                "D" + _fit(info.payments, 6, ">") + _fit(account, 34) + f"{_cents(amount):015d}"
+                + _fit(name, 35) + _fit(employee_id, 10, ">") + "\r\n"
+            )
+        else:
+            self._row([info.payments, account, f"{amount:.2f}", name, employee_id])
+
+    def close(self) -> BankFile:
+        info = self.info
+        if self.fmt == "fixed":
+            self._write(
+                "T" + _fit(info.payments, 6, ">") + f"{_cents(info.amount):018d}"
+                + f"{info.hash_total:015d}" + "\r\n"
+            )
+        else:
+            self._row(["TOTAL", info.payments, f"{info.amount:.2f}", "", info.hash_total])
+        self.fh.close()
+        info.sha256 = self.digest.hexdigest()
+        return info
+
+
+def payment_rows(run: PayrollRun):
+    """
+    (employee_id, first_name, father_name, bank_account, amount_to_pay) of the active
+    lines with a positive amount, in employee order, from a server-side cursor.
+    """
+    return (
+        PayrollLine.objects.filter(run_id=run.pk, generation=run.version, amount_to_pay__gt=0)
+        .order_by("employee_id")
+        .values_list(
+            "employee_id", "employee__first_name", "employee__father_name",
+            "employee__bank_account", "amount_to_pay",
+        )
+        .iterator(chunk_size=2000)
+    )
+
+
+def write_bank_files(
+    run: PayrollRun,
+    folder: Path,
+    fmt: str = "fixed",
+    rows_per_file: int | None = None,
+    value_date: dt.date | None = None,
+) -> BankBatch:
+    """
+    Write pay-<year>-<month>-NNN.txt|csv into `folder`. Employees without a bank account,
+    and in the fixed format those whose account or id does not fit its field, are left
+    out and reported on the batch. Raises BankFileError unless the run is FINAL, or for
+    the fixed format without a PAYROLL_BANK_DEBIT_ACCOUNT that fits the header.
+    """
+    if fmt not in FORMATS:
+        raise BankFileError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    run.refresh_from_db(fields=["status", "version"])
+    if run.status != PayrollRun.Status.FINAL:
+        raise BankFileError(f"{run} is not FINAL; bank files are made from final runs only.")
+    rows_per_file = rows_per_file or settings.PAYROLL_BANK_ROWS_PER_FILE
+    if rows_per_file < 1:
+        raise BankFileError("rows_per_file must be positive.")
+    if fmt == "fixed" and not settings.PAYROLL_BANK_DEBIT_ACCOUNT.strip():
+        raise BankFileError("PAYROLL_BANK_DEBIT_ACCOUNT is not set; the fixed-width header needs the debit account.")
+    if fmt == "fixed" and not _fits(settings.PAYROLL_BANK_DEBIT_ACCOUNT, 20):
+        raise BankFileError("PAYROLL_BANK_DEBIT_ACCOUNT is longer than the 20 bytes of the fixed-width header.")
+
+    folder.mkdir(parents=True, exist_ok=True)
+    for stale in folder.glob(f"pay-{run.year}-{run.month:02d}-*"):  # parts of an earlier, larger batch
+        stale.unlink()
+    batch = BankBatch(batch_id=f"{run.year}{run.month:02d}V{run.version}")
+    value_date = value_date or dt.date.today()
+    extension = "txt" if fmt == "fixed" else "csv"
+    part = None
+
+    try:
+        for employee_id, first_name, father_name, account, amount in payment_rows(run):
+            account = (account or "").strip()
+            if not account:
+                batch.missing_count += 1
+                if len(batch.missing_accounts) < MAX_MISSING:
+                    batch.missing_accounts.append(employee_id)
+                continue
+            if fmt == "fixed" and not (_fits(account, 34) and _fits(employee_id, 10)):
+                batch.rejected_count += 1
+                if len(batch.rejected) < MAX_MISSING:
+                    batch.rejected.append(employee_id)
+                continue
+            if part is not None and part.info.payments >= rows_per_file:
+                batch.files.append(part.close())
+                part = None
+            if part is None:
+                number = len(batch.files) + 1
+                path = folder / f"pay-{run.year}-{run.month:02d}-{number:03d}.{extension}"
+                part = _Part(path, fmt, batch.batch_id, number, value_date)
+            part.add(employee_id, f"{first_name} {father_name}".strip(), account, amount)
+    except BaseException:
+        if part is not None:
+            part.fh.close()
+        raise
+
+    if part is not None:
+        batch.files.append(part.close())
+    return batch
+
+
+def control(batch: BankBatch) -> dict:
+    """
+    Control totals of `batch` for the bank's cover sheet / upload check.
+    """
+    return {
+        "batch": batch.batch_id,
+        "payments": batch.payments,
+        "amount": f"{batch.amount:.2f}",
+        "files": [
+            {
+                "name": f.name, "payments": f.payments, "amount": f"{f.amount:.2f}",
+                "hash_total": f.hash_total, "sha256": f.sha256,
+            }
+            for f in batch.files
+        ],
+        "missing_accounts": {"count": batch.missing_count, "employee_ids": batch.missing_accounts},
+        "rejected": {"count": batch.rejected_count, "employee_ids": batch.rejected},
+    }
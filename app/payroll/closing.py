@@ -0,0 +1,284 @@
+"""
+Month-close pipeline: validate inputs -> calculate -> build exports -> freeze and archive.
+
+Every stage except the last works through the WORKING employees in chunks of
+MonthClose.chunk_size. The chunk boundaries (employee id ranges) are stored when the
+stage starts, and each chunk is marked done once its work has committed, so after a
+crash or restart `close_month(run)` resumes at the first chunk that is not done.
+A chunk's work runs outside any transaction of the pipeline: calculate_payroll
+commits its own lock, lines and swap. Every stage can redo a chunk whose work
+committed but whose mark did not; recalculating moves leave balances only by the
+difference to the lines it replaces (PayrollLine.leave_days), so resuming or
+repeating the calculate stage never deducts leave twice.
+
+    close = close_month(run, chunk_size=500, log=print)
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import zipfile
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from attendance.models import AttendanceDay
+from core.calendar import month_calendar
+from core.rollups import mark_stale
+from employees.models import Employee
+from overtime.models import OvertimeEntry
+
+from .exports import build_payroll_xlsx
+from .models import MonthClose, MonthCloseChunk, PayrollRun
+from .services import apply_leave_delta, calculate_payroll, line_leave_days
+from . import ytd
+
+STAGES = (
+    MonthClose.Stage.VALIDATE,
+    MonthClose.Stage.CALCULATE,
+    MonthClose.Stage.EXPORT,
+    MonthClose.Stage.FREEZE,
+)
+MAX_ISSUES_PER_CHUNK = 200
+LINE_COLUMNS = (
+    "base_salary", "attendance_deduction", "salary", "bonus", "overtime",
+    "total", "tax", "prepaid", "amount_to_pay",
+)
+
+
+class MonthCloseError(Exception):
+    pass
+
+
+def archive_dir(run: PayrollRun) -> Path:
+    path = Path(settings.PAYROLL_ARCHIVE_DIR) / f"{run.year}-{run.month:02d}"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _plan_chunks(close: MonthClose, stage: str) -> list[MonthCloseChunk]:
+    """
+    Chunks of `stage`, created on first use from the WORKING employee ids.
+    """
+    chunks = list(close.chunks.filter(stage=stage))
+    if chunks:
+        return chunks
+    ids = list(Employee.objects.filter(status=Employee.Status.WORKING).order_by("id").values_list("id", flat=True))
+    chunks = [
+        MonthCloseChunk(
+            close=close, stage=stage, number=n,
+            first_employee_id=ids[i], last_employee_id=ids[min(i + close.chunk_size, len(ids)) - 1],
+        )
+        for n, i in enumerate(range(0, len(ids), close.chunk_size))
+    ]
+    return MonthCloseChunk.objects.bulk_create(chunks)
+
+
+def _chunk_employees(chunk: MonthCloseChunk):
+    return Employee.objects.filter(
+        status=Employee.Status.WORKING,
+        id__range=(chunk.first_employee_id, chunk.last_employee_id),
+    )
+
+
+def _validate_chunk(close: MonthClose, chunk: MonthCloseChunk) -> int:
+    """
+    Record input problems of the chunk's employees; returns the number of employees checked.
+    """
+    run = close.run
+    calendar = month_calendar(run.year, run.month, fresh=True)
+    employees = {e.id: e for e in _chunk_employees(chunk).only("id", "department_id", "base_salary", "date_hired")}
+    issues = []
+
+    for emp in employees.values():
+        if emp.base_salary <= 0:
+            issues.append([emp.id, "base salary is zero"])
+        if emp.date_hired > calendar.g_end:
+            issues.append([emp.id, f"hired after the month ({emp.date_hired})"])
+
+    for emp_id, d, status in AttendanceDay.objects.filter(
+        employee_id__in=employees,
+        date__range=(calendar.g_start, calendar.g_end),
+    ).exclude(status=AttendanceDay.Status.HOLIDAY).values_list("employee_id", "date", "status"):
+        if not calendar.is_working_day(d, employees[emp_id].department_id):
+            issues.append([emp_id, f"{status} on a day off ({d})"])
+
+    for emp_id, d, hours in OvertimeEntry.objects.filter(
+        employee_id__in=employees,
+        date__range=(calendar.g_start, calendar.g_end),
+        hours__gt=24,
+    ).values_list("employee_id", "date", "hours"):
+        issues.append([emp_id, f"{hours} overtime hours on {d}"])
+
+    chunk.issues = issues[:MAX_ISSUES_PER_CHUNK]
+    return len(employees)
+
+
+def _calculate_chunk(close: MonthClose, chunk: MonthCloseChunk) -> int:
+    ids = list(_chunk_employees(chunk).values_list("id", flat=True))
+    if ids:
+        calculate_payroll(close.run, employee_ids=ids)
+    return len(ids)
+
+
+def _finish_calculate(close: MonthClose):
+    # lines of employees who stopped WORKING since an earlier calculation
+    run = close.run
+    stale = run.active_lines().exclude(employee__status=Employee.Status.WORKING)
+    with transaction.atomic():
+        old_values = ytd.line_values(stale)
+        old_leave = line_leave_days(stale)
+        if stale.delete()[0]:
+            ytd.apply_delta(run.year, old_values, {})
+            apply_leave_delta(run.year, old_leave, {})
+            PayrollRun.objects.filter(pk=run.pk).update(lines_revision=F("lines_revision") + 1)
+            mark_stale(run.year, run.month)
+
+
+def _export_chunk(close: MonthClose, chunk: MonthCloseChunk) -> int:
+    """
+    Write the chunk's lines as part-NNNN.csv (overwritten when the chunk is redone).
+    """
+    run = close.run
+    lines = (
+        run.active_lines()
+        .filter(employee__id__range=(chunk.first_employee_id, chunk.last_employee_id))
+        .select_related("employee", "department")
+        .order_by("employee_id")
+    )
+    folder = archive_dir(run)
+    if chunk.number == 0:
+        for stale in folder.glob("part-*.csv"):  # from an earlier close with other chunks
+            stale.unlink()
+    path = folder / f"part-{chunk.number:04d}.csv"
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(("employee_id", "name", "father_name", "department", *LINE_COLUMNS))
+        for line in lines.iterator(chunk_size=2000):
+            emp = line.employee
+            writer.writerow((
+                emp.id, emp.first_name, emp.father_name, line.department.name,
+                *(getattr(line, c) for c in LINE_COLUMNS),
+            ))
+            rows += 1
+    return rows
+
+
+def _finish_export(close: MonthClose):
+    run = close.run
+    wb = build_payroll_xlsx(run)
+    wb.save(archive_dir(run) / f"payroll_{run.year}_{run.month:02d}.xlsx")
+
+
+def _freeze(close: MonthClose):
+    """
+    Set the run FINAL and zip the exports with a manifest of totals and checksums.
+    """
+    run = close.run
+    folder = archive_dir(run)
+    files = sorted(p for p in folder.iterdir() if p.suffix in (".csv", ".xlsx"))
+    totals = run.active_lines().aggregate(lines=Count("id"), **{c: Sum(c) for c in LINE_COLUMNS})
+    manifest = {
+        "run": {"year": run.year, "month": run.month, "version": run.version},
+        "closed_at": timezone.now().isoformat(),
+        "totals": {k: str(v if v is not None else Decimal("0")) for k, v in totals.items()},
+        "files": {p.name: hashlib.sha256(p.read_bytes()).hexdigest() for p in files},
+    }
+    archive = folder.with_suffix(".zip")
+    tmp = archive.with_suffix(".zip.tmp")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        for p in files:
+            zf.write(p, p.name)
+    tmp.replace(archive)
+
+    with transaction.atomic():
+        PayrollRun.objects.filter(pk=run.pk).update(status=PayrollRun.Status.FINAL)
+        run.status = PayrollRun.Status.FINAL
+        close.archive_path = str(archive)
+        close.save(update_fields=["archive_path", "updated_at"])
+
+
+CHUNK_WORK = {
+    MonthClose.Stage.VALIDATE: _validate_chunk,
+    MonthClose.Stage.CALCULATE: _calculate_chunk,
+    MonthClose.Stage.EXPORT: _export_chunk,
+}
+STAGE_FINISH = {
+    MonthClose.Stage.CALCULATE: _finish_calculate,
+    MonthClose.Stage.EXPORT: _finish_export,
+}
+
+
+def _run_stage(close: MonthClose, stage: str, ignore_issues: bool, log=None):
+    work = CHUNK_WORK.get(stage)
+    if work is not None:
+        chunks = _plan_chunks(close, stage)
+        for chunk in chunks:
+            if chunk.done_at:
+                continue
+            chunk.rows = work(close, chunk)
+            chunk.done_at = timezone.now()
+            chunk.save(update_fields=["rows", "issues", "done_at"])
+            if log:
+                log(f"  {stage} chunk {chunk.number + 1}/{len(chunks)}: {chunk.rows} rows")
+
+    if stage == MonthClose.Stage.VALIDATE and not ignore_issues:
+        count = sum(len(c.issues) for c in close.chunks.filter(stage=stage))
+        if count:
+            # the issues stay visible in the admin; the next attempt checks again
+            close.chunks.filter(stage=stage).update(done_at=None)
+            raise MonthCloseError(f"{count} input issue(s) found; fix them or close with ignore_issues.")
+
+    finish = STAGE_FINISH.get(stage)
+    if finish is not None:
+        finish(close)
+    elif stage == MonthClose.Stage.FREEZE:
+        _freeze(close)
+
+
+def close_month(run: PayrollRun, chunk_size: int = 500, ignore_issues: bool = False, log=None) -> MonthClose:
+    """
+    Run (or resume) the month close of `run` up to DONE. A failing stage stores the
+    error on MonthClose (status FAILED) and raises; calling again retries that stage
+    from its first unfinished chunk.
+    """
+    close, created = MonthClose.objects.get_or_create(run=run, defaults={"chunk_size": chunk_size})
+    if close.stage == MonthClose.Stage.DONE:
+        return close
+    if run.status == PayrollRun.Status.FINAL and close.stage != MonthClose.Stage.FREEZE:
+        raise MonthCloseError(f"{run} is already FINAL.")
+
+    close.status, close.error = MonthClose.Status.RUNNING, ""
+    close.save(update_fields=["status", "error", "updated_at"])
+
+    for stage in STAGES[STAGES.index(close.stage):]:
+        if log:
+            log(f"{MonthClose.Stage(stage).label}...")
+        try:
+            _run_stage(close, stage, ignore_issues, log)
+        except Exception as exc:
+            close.status, close.error = MonthClose.Status.FAILED, str(exc)
+            close.save(update_fields=["status", "error", "updated_at"])
+            raise
+        next_stage = STAGES[STAGES.index(stage) + 1] if stage != STAGES[-1] else MonthClose.Stage.DONE
+        close.stage = next_stage
+        close.save(update_fields=["stage", "updated_at"])
+
+    close.status, close.finished_at = MonthClose.Status.DONE, timezone.now()
+    close.save(update_fields=["status", "finished_at", "updated_at"])
+    return close
+
+
+def progress(close: MonthClose) -> tuple[int, int]:
+    """
+    (done, total) chunks of the current stage.
+    """
+    counts = close.chunks.filter(stage=close.stage).aggregate(total=Count("id"), done=Count("done_at"))
+    return counts["done"], counts["total"]
@@ -5,13 +5,18 @@ from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
 from attendance.models import AttendanceDay
+from core.calendar import month_calendar
 from core.jalali import (
     get_weekday_names_from_jalali,
     jalali_day_to_gregorian,
     jalali_month_range,
 )
+from core.profiling import Profiler
+from core.reports import HEADER_FILL
 from overtime.models import OvertimeEntry
 
+from .reporting import TOTAL_FIELDS
+
 
 STATUS_CODE = {
     "ABSENT": "غیر حاضر",
@@ -21,7 +26,6 @@ STATUS_CODE = {
 }
 
 THIN = Side(style="thin", color="000000")
-HEADER_FILL = PatternFill("solid", fgColor="D9EAD3")
 SUBHEADER_FILL = PatternFill("solid", fgColor="F3F3F3")
 CENTER = Alignment(horizontal="center", vertical="center")
 WRAP_CENTER = Alignment(horizontal="center", vertical="center", wrap_text=True)
@@ -34,7 +38,7 @@ def dceil2(x):
 
 
 def _ordered_lines(run, order_by: str = "name"):
-    lines = run.lines.select_related("employee", "employee__department", "employee__position")
+    lines = run.active_lines().select_related("employee", "employee__department", "employee__position")
     if order_by == "id":
         return list(lines.order_by("employee__id", "employee__first_name", "employee__father_name"))
     return list(lines.order_by("employee__first_name", "employee__father_name", "employee__id"))
@@ -50,6 +54,7 @@ def _build_attendance_sheet(wb, run, lines):
     jy, jm = run.year, run.month
     rng = jalali_month_range(jy, jm)
     days = list(range(1, rng.days + 1))
+    calendar = month_calendar(jy, jm)
 
     friday_days = set()
     for d in days:
@@ -91,15 +96,19 @@ def _build_attendance_sheet(wb, run, lines):
             g_date = jalali_day_to_gregorian(jy, jm, d)
             status = exc_map.get((emp.id, g_date))
 
+            holiday = calendar.holiday(g_date, emp.department_id)
+
             cell = "جمعه" if d in friday_days else "حاضر"
             if status:
                 cell = STATUS_CODE.get(status, status)
+            elif holiday and d not in friday_days:
+                cell = STATUS_CODE["HOLIDAY"]
 
             if status == AttendanceDay.Status.LEAVE:
                 leave_count += 1
             elif status == AttendanceDay.Status.ABSENT:
                 absent_count += 1
-            elif not status and d not in friday_days:
+            elif not status and d not in friday_days and not holiday:
                 present_count += 1
             elif status == AttendanceDay.Status.PRESENT:
                 present_count += 1
@@ -312,13 +321,70 @@ def _build_format_1_sheet(wb, lines):
 
 
 
-def build_payroll_xlsx(run, order_by: str = "name"):
+def build_payroll_xlsx(run, order_by: str = "name", profiler: Profiler | None = None):
+    profiler = profiler or Profiler()
     wb = Workbook()
-    lines = _ordered_lines(run, order_by=order_by)
 
-    _build_attendance_sheet(wb, run, lines)
-    _build_overtime_sheet(wb, run, lines)
-    _build_payroll_sheet(wb, lines)
-    _build_format_1_sheet(wb, lines)
+    with profiler.span("load_lines") as span:
+        lines = _ordered_lines(run, order_by=order_by)
+        span.rows = len(lines)
+
+    with profiler.span("attendance_sheet") as span:
+        _build_attendance_sheet(wb, run, lines)
+        span.rows = len(lines)
+    with profiler.span("overtime_sheet") as span:
+        _build_overtime_sheet(wb, run, lines)
+        span.rows = len(lines)
+    with profiler.span("payroll_sheet") as span:
+        _build_payroll_sheet(wb, lines)
+        span.rows = len(lines)
+    with profiler.span("format_1_sheet") as span:
+        _build_format_1_sheet(wb, lines)
+        span.rows = len(lines)
+
+    return wb
+
 
+FLAG_FILL = PatternFill("solid", fgColor="FCE5CD")
+
+
+def build_variance_xlsx(run, previous, rows, summary):
+    """
+    One row per employee: previous / current / delta / % for every line field,
+    flagged rows filled; the header and totals row follow the payroll sheet.
+    """
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Variance"
+    ws.append([f"{run} vs {previous}"])
+    ws.append(["Employee ID", "First Name", "Father Name", "Department", "Change"]
+              + [f"{f.replace('_', ' ').title()} {part}" for f in TOTAL_FIELDS for part in ("Previous", "Current", "Δ", "%")])
+    for cell in ws[2]:
+        cell.font = Font(bold=True)
+        cell.fill = HEADER_FILL
+        cell.alignment = WRAP_CENTER
+
+    def number(value):
+        return float(value) if value is not None else None
+
+    for row in rows:
+        values = [row.employee_id, row.first_name, row.father_name, row.department, row.kind]
+        for f in TOTAL_FIELDS:
+            values += [number(row.previous[f]), number(row.current[f]), number(row.delta[f]), number(row.pct[f])]
+        ws.append(values)
+        if row.flagged:
+            for cell in ws[ws.max_row]:
+                cell.fill = FLAG_FILL
+
+    totals = ["TOTALS", "", "", "", ""]
+    for f in TOTAL_FIELDS:
+        totals += ["", "", float(summary["delta"][f]), ""]
+    ws.append(totals)
+    for cell in ws[ws.max_row]:
+        cell.font = Font(bold=True)
+
+    ws.freeze_panes = "F3"
+    for col in range(1, ws.max_column + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 14
+    _set_base_employee_column_widths(ws)
     return wb
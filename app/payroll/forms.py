@@ -0,0 +1,32 @@
+from django import forms
+
+from employees.models import Employee
+from org.models import Department
+
+
+class PayrollScopeForm(forms.Form):
+    departments = forms.ModelMultipleChoiceField(
+        queryset=Department.objects.order_by("name"), required=False,
+        widget=forms.SelectMultiple(attrs={"size": 8}),
+    )
+    employee_ids = forms.CharField(
+        label="Employee IDs", required=False,
+        help_text="Comma or space separated. With departments too, only those employees of the departments.",
+    )
+
+    def clean_employee_ids(self):
+        text = self.cleaned_data["employee_ids"].replace(",", " ")
+        try:
+            ids = {int(part) for part in text.split()}
+        except ValueError:
+            raise forms.ValidationError("Employee IDs must be numbers.") from None
+        unknown = ids - set(Employee.objects.filter(id__in=ids).values_list("id", flat=True))
+        if unknown:
+            raise forms.ValidationError(f"Unknown employee IDs: {', '.join(map(str, sorted(unknown)))}")
+        return sorted(ids)
+
+    def clean(self):
+        data = super().clean()
+        if not data.get("departments") and not data.get("employee_ids"):
+            raise forms.ValidationError("Choose departments or enter employee IDs.")
+        return data
@@ -0,0 +1,88 @@
+"""
+One employee's payroll history: the active line of every run, with the attendance
+exceptions and leave balances of the same months and years.
+
+The lines are one query on the (employee, year, month) index of PayrollLine, joined
+to the run by primary key for its active generation; attendance and leave balances
+are one query each on their (employee, ...) unique indexes.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+
+import jdatetime
+from django.db.models import F
+
+from attendance.models import AttendanceDay
+from leaves.models import LeaveYearBalance
+
+from .models import PayrollLine
+from .reporting import TOTAL_FIELDS
+
+# AttendanceDay status -> key in the history rows
+ATTENDANCE_KEYS = {
+    AttendanceDay.Status.ABSENT: "absent",
+    AttendanceDay.Status.LEAVE: "leave",
+    AttendanceDay.Status.SHIFT_OFF: "shift_off",
+}
+
+
+def payroll_lines(employee_id: int) -> list[dict]:
+    return list(
+        PayrollLine.objects.filter(employee_id=employee_id, generation=F("run__version"))
+        .order_by("-year", "-month")
+        .values("year", "month", "run_id", "run__status", *TOTAL_FIELDS)
+    )
+
+
+def attendance_by_month(employee_id: int) -> dict[tuple[int, int], dict[str, int]]:
+    """
+    {(jy, jm): {"absent", "leave", "shift_off": days}} of the employee's attendance exceptions.
+    """
+    months = {}
+    for d, status in AttendanceDay.objects.filter(
+        employee_id=employee_id, status__in=ATTENDANCE_KEYS,
+    ).values_list("date", "status"):
+        j = jdatetime.date.fromgregorian(date=d)
+        counts = months.setdefault((j.year, j.month), dict.fromkeys(ATTENDANCE_KEYS.values(), 0))
+        counts[ATTENDANCE_KEYS[status]] += 1
+    return months
+
+
+def leave_balances(employee_id: int) -> dict[int, list[dict]]:
+    """
+    {jy: [{"leave_type", "remaining_days"}, ...]}
+    """
+    years = defaultdict(list)
+    for year, name, remaining in (
+        LeaveYearBalance.objects.filter(employee_id=employee_id)
+        .order_by("-year", "leave_type__name")
+        .values_list("year", "leave_type__name", "remaining_days")
+    ):
+        years[year].append({"leave_type": name, "remaining_days": remaining})
+    return years
+
+
+def employee_history(employee_id: int) -> list[dict]:
+    """
+    Newest month first: {"year", "month", "run_id", "status", "line" (TOTAL_FIELDS or None),
+    "attendance" (days by kind), "leave_balances" (of the month's year)} for every month
+    that has a payroll line or attendance exceptions.
+    """
+    lines = {(row["year"], row["month"]): row for row in payroll_lines(employee_id)}
+    attendance = attendance_by_month(employee_id)
+    balances = leave_balances(employee_id)
+
+    history = []
+    for year, month in sorted(lines.keys() | attendance.keys(), reverse=True):
+        row = lines.get((year, month))
+        history.append({
+            "year": year,
+            "month": month,
+            "run_id": row["run_id"] if row else None,
+            "status": row["run__status"] if row else None,
+            "line": {f: row[f] for f in TOTAL_FIELDS} if row else None,
+            "attendance": attendance.get((year, month), dict.fromkeys(ATTENDANCE_KEYS.values(), 0)),
+            "leave_balances": balances.get(year, []),
+        })
+    return history
@@ -0,0 +1,102 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from core.importing import (
+    ImportResult,
+    cell_text,
+    chunked,
+    employee_id_set,
+    header_index,
+    iter_rows,
+    parse_employee_id,
+)
+
+from .models import BonusEntry, PrepaidEntry
+
+
+def _read_amount_rows(fh, filename: str, result: ImportResult):
+    """
+    Yield (row_number, employee_id, amount, note) from a sheet with
+    "Employee ID", "Amount" and optional "Note" header columns.
+    """
+    rows = iter_rows(fh, filename)
+    _, header = next(rows, (0, []))
+    id_col = header_index(header, "Employee ID", "employee_id", "id")
+    amount_col = header_index(header, "Amount")
+    note_col = header_index(header, "Note")
+    if id_col is None or amount_col is None:
+        result.error(1, 'header must contain "Employee ID" and "Amount" columns')
+        return
+
+    employee_ids = employee_id_set()
+    for number, row in rows:
+        if not any(cell_text(v) for v in row):
+            continue
+        result.rows += 1
+        try:
+            emp_id = parse_employee_id(row[id_col] if id_col < len(row) else None, employee_ids)
+            text = cell_text(row[amount_col]) if amount_col < len(row) else ""
+            try:
+                amount = Decimal(text).quantize(Decimal("0.01"))
+                if not amount.is_finite():  # NaN quantizes to NaN
+                    raise InvalidOperation
+            except InvalidOperation:
+                raise ValueError(f"amount {text!r} is not a number") from None
+            if amount < 0:
+                raise ValueError("negative amount")
+        except ValueError as exc:
+            result.error(number, str(exc))
+            continue
+        note = cell_text(row[note_col])[:255] if note_col is not None and note_col < len(row) else ""
+        yield number, emp_id, amount, note
+
+
+@transaction.atomic
+def import_prepaids(fh, filename: str, jy: int, jm: int, chunk_size: int = 1000) -> ImportResult:
+    """
+    Upsert PrepaidEntry rows on their unique key (employee, year, month, note).
+    """
+    result = ImportResult()
+    for chunk in chunked(_read_amount_rows(fh, filename, result), chunk_size):
+        wanted = {(emp_id, note): amount for _, emp_id, amount, note in chunk}  # last row wins
+        PrepaidEntry.objects.bulk_create(
+            [PrepaidEntry(employee_id=e, year=jy, month=jm, note=n, amount=a) for (e, n), a in wanted.items()],
+            update_conflicts=True,
+            unique_fields=["employee", "year", "month", "note"],
+            update_fields=["amount"],
+            batch_size=chunk_size,
+        )
+        result.upserted += len(wanted)
+    return result.finish()
+
+
+@transaction.atomic
+def import_bonuses(fh, filename: str, jy: int, jm: int, chunk_size: int = 1000) -> ImportResult:
+    """
+    Upsert BonusEntry rows matched on (employee, year, month, note).
+    BonusEntry has no unique constraint, so matches are resolved with one lookup per chunk.
+    """
+    result = ImportResult()
+    for chunk in chunked(_read_amount_rows(fh, filename, result), chunk_size):
+        wanted = {(emp_id, note): amount for _, emp_id, amount, note in chunk}  # last row wins
+        existing = {
+            (b.employee_id, b.note): b
+            for b in BonusEntry.objects.filter(
+                year=jy, month=jm, employee_id__in={e for e, _ in wanted}
+            ).only("id", "employee_id", "note", "amount")
+        }
+
+        to_update, to_create = [], []
+        for (emp_id, note), amount in wanted.items():
+            bonus = existing.get((emp_id, note))
+            if bonus is None:
+                to_create.append(BonusEntry(employee_id=emp_id, year=jy, month=jm, note=note, amount=amount))
+            elif bonus.amount != amount:
+                bonus.amount = amount
+                to_update.append(bonus)
+
+        BonusEntry.objects.bulk_create(to_create, batch_size=chunk_size)
+        BonusEntry.objects.bulk_update(to_update, ["amount"], batch_size=chunk_size)
+        result.upserted += len(wanted)
+    return result.finish()
@@ -0,0 +1,120 @@
+"""
+One calculation per payroll run at a time, with request coalescing.
+
+A PayrollRunLock row (one per run, inserted with ignore_conflicts) is the lock, so
+it works the same on PostgreSQL and SQLite and across worker processes. A request
+for a run that is already being calculated with the same or a wider scope (the whole
+organization covers everything) does not calculate again: it waits for the running
+calculation and returns its result. A narrower running scope is waited for, then
+the request calculates with the lock itself.
+
+Within one process waiters share the running calculation's profiler; across
+processes they poll the lock row and get None. A lock still held after
+PAYROLL_LOCK_TIMEOUT is taken over as abandoned and the waiter calculates itself.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core import metrics
+
+from .models import PayrollRunLock
+
+POLL_SECONDS = 0.5
+
+_flights: dict[int, "_Flight"] = {}
+_flights_lock = threading.Lock()
+
+
+@dataclass
+class _Flight:
+    scope: dict
+    done: threading.Event = field(default_factory=threading.Event)
+    result: object = None
+    error: BaseException | None = None
+
+
+def covers(running: dict, requested: dict) -> bool:
+    return not running or running == requested
+
+
+def _timeout() -> int:
+    return getattr(settings, "PAYROLL_LOCK_TIMEOUT", 1800)
+
+
+def _try_acquire(run_id: int, owner: str, scope: dict) -> PayrollRunLock:
+    """
+    Insert our lock row unless one exists; returns the row that holds the lock.
+    """
+    now = timezone.now()
+    PayrollRunLock.objects.filter(run_id=run_id, started_at__lt=now - timedelta(seconds=_timeout())).delete()
+    PayrollRunLock.objects.bulk_create(
+        [PayrollRunLock(run_id=run_id, owner=owner, scope=scope, started_at=now)], ignore_conflicts=True
+    )
+    return PayrollRunLock.objects.filter(run_id=run_id).first()
+
+
+def _wait_released(run_id: int, owner: str) -> bool:
+    """
+    Poll until no other owner holds the run's lock; False after PAYROLL_LOCK_TIMEOUT,
+    when the held lock has become stale.
+    """
+    deadline = time.monotonic() + _timeout()
+    while time.monotonic() < deadline:
+        if not PayrollRunLock.objects.filter(run_id=run_id).exclude(owner=owner).exists():
+            return True
+        time.sleep(POLL_SECONDS)
+    return False
+
+
+def coalesced(run_id: int, scope: dict, calculate):
+    """
+    Call `calculate()` under the run's lock, or attach to a covering calculation in
+    flight and return its result instead. Returns (result, attached).
+    """
+    while True:
+        with _flights_lock:
+            flight = _flights.get(run_id)
+            if flight is None:
+                flight = _flights[run_id] = _Flight(scope)
+                break
+        flight.done.wait()
+        if covers(flight.scope, scope):
+            metrics.inc("hrms_payroll_calculations_coalesced_total")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+    owner = uuid.uuid4().hex
+    try:
+        while True:
+            held = _try_acquire(run_id, owner, scope)
+            if held is None:
+                continue  # released between our insert and the read
+            if held.owner == owner:
+                break
+            # another process is calculating this run
+            if not _wait_released(run_id, owner):
+                continue  # it outlived the timeout: _try_acquire takes the stale lock over
+            if covers(held.scope, scope):
+                metrics.inc("hrms_payroll_calculations_coalesced_total")
+                return None, True
+        try:
+            flight.result = calculate()
+        finally:
+            PayrollRunLock.objects.filter(run_id=run_id, owner=owner).delete()
+        return flight.result, False
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(run_id, None)
+        flight.done.set()
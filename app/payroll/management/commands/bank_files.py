@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.bank import FORMATS, BankFileError, control, write_bank_files
+from payroll.closing import archive_dir
+from payroll.models import PayrollRun
+
+
+class Command(BaseCommand):
+    help = "Write the bank payment files of a FINAL payroll run (fixed-width or CSV, split by row limit)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", type=int, help="Jalali year")
+        parser.add_argument("month", type=int, help="Jalali month (1-12)")
+        parser.add_argument("--format", choices=FORMATS, default="fixed")
+        parser.add_argument("--rows-per-file", type=int, help="Payments per file (default: PAYROLL_BANK_ROWS_PER_FILE).")
+        parser.add_argument("--out", help="Output folder (default: <archive>/<year>-<month>/bank).")
+
+    def handle(self, *args, **opts):
+        run = PayrollRun.objects.filter(year=opts["year"], month=opts["month"]).first()
+        if run is None:
+            raise CommandError(f"No payroll run for {opts['year']}-{opts['month']:02d}.")
+        folder = Path(opts["out"]) if opts["out"] else archive_dir(run) / "bank"
+        try:
+            batch = write_bank_files(run, folder, fmt=opts["format"], rows_per_file=opts["rows_per_file"])
+        except BankFileError as exc:
+            raise CommandError(str(exc)) from None
+
+        summary = control(batch)
+        (folder / "control.json").write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        for f in summary["files"]:
+            self.stdout.write(f"{f['name']}: {f['payments']} payments, {f['amount']} (sha256 {f['sha256'][:12]}…)")
+        if batch.missing_count:
+            self.stderr.write(f"{batch.missing_count} employee(s) without a bank account were left out; see control.json.")
+        if batch.rejected_count:
+            self.stderr.write(
+                f"{batch.rejected_count} payment(s) were rejected: the account or employee id does not fit"
+                " the fixed-width record; see control.json."
+            )
+        self.stdout.write(self.style.SUCCESS(f"{batch.payments} payments, {summary['amount']} in {len(batch.files)} file(s) -> {folder}"))
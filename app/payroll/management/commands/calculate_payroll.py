@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.jalali import JALALI_MONTHS_DARI
+from payroll.models import PayrollRun
+from payroll.services import PayrollCalendarError, PayrollRunFinalError, calculate_payroll
+
+
+def _id_list(value: str) -> list[int]:
+    try:
+        return [int(part) for part in value.replace(",", " ").split()]
+    except ValueError:
+        raise CommandError(f"expected comma separated ids, got {value!r}") from None
+
+
+class Command(BaseCommand):
+    help = "Calculate the payroll run of a Jalali month, optionally only for some departments or employees."
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", type=int, help="Jalali year")
+        parser.add_argument("month", type=int, help="Jalali month (1-12)")
+        parser.add_argument("--department", action="append", default=[], help="Department id(s); repeatable or comma separated.")
+        parser.add_argument("--employee", action="append", default=[], help="Employee id(s); repeatable or comma separated.")
+
+    def handle(self, *args, **opts):
+        if not 1 <= opts["month"] <= 12:
+            raise CommandError("month must be 1-12")
+        department_ids = [i for value in opts["department"] for i in _id_list(value)]
+        employee_ids = [i for value in opts["employee"] for i in _id_list(value)]
+
+        run, created = PayrollRun.objects.get_or_create(year=opts["year"], month=opts["month"])
+        if created and (department_ids or employee_ids):
+            self.stdout.write(self.style.WARNING("New run: only the chosen employees will have lines."))
+        try:
+            profiler = calculate_payroll(run, department_ids=department_ids, employee_ids=employee_ids)
+        except (PayrollRunFinalError, PayrollCalendarError) as exc:
+            raise CommandError(str(exc)) from None
+        if profiler is None:
+            self.stdout.write(self.style.WARNING("Another process was calculating this run; its result was kept."))
+
+        label = f"{run.year} {JALALI_MONTHS_DARI[run.month]}"
+        scope = "all employees" if not (department_ids or employee_ids) else "partial"
+        self.stdout.write(self.style.SUCCESS(
+            f"{label} ({scope}): {run.profile['calculate']['wall_ms']} ms, {run.profile['calculate']['queries']} queries"
+        ))
+        if profiler and opts["verbosity"] > 1:
+            for span in profiler.as_list():
+                self.stdout.write(f"  {span['name']:<16} {span['wall_ms']:>9} ms {span['queries']:>6} queries {span['rows']:>8} rows")
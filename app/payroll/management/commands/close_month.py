@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.closing import MonthCloseError, close_month
+from payroll.models import MonthClose, PayrollRun
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a Jalali month: validate inputs, calculate, build exports, freeze and archive. "
+        "Resumes from the last completed chunk when run again after a failure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", type=int, help="Jalali year")
+        parser.add_argument("month", type=int, help="Jalali month (1-12)")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Employees per checkpoint (new closes only).")
+        parser.add_argument("--ignore-issues", action="store_true", help="Continue although validation found issues.")
+        parser.add_argument("--restart", action="store_true", help="Drop the saved progress and start from validation.")
+
+    def handle(self, *args, **opts):
+        if not 1 <= opts["month"] <= 12:
+            raise CommandError("month must be 1-12")
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+        run, _ = PayrollRun.objects.get_or_create(year=opts["year"], month=opts["month"])
+        if opts["restart"]:
+            if run.status == PayrollRun.Status.FINAL:
+                raise CommandError(f"{run} is FINAL; it cannot be closed again.")
+            MonthClose.objects.filter(run=run).delete()
+
+        try:
+            close = close_month(
+                run,
+                chunk_size=opts["chunk_size"],
+                ignore_issues=opts["ignore_issues"],
+                log=self.stdout.write if opts["verbosity"] > 0 else None,
+            )
+        except MonthCloseError as exc:
+            raise CommandError(str(exc)) from None
+        self.stdout.write(self.style.SUCCESS(f"{run} closed; archive: {close.archive_path}"))
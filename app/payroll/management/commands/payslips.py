@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import Profiler
+from payroll.closing import archive_dir
+from payroll.models import PayrollRun
+from payroll.payslips import LAYOUTS, PayslipError, write_payslips
+
+
+class Command(BaseCommand):
+    help = "Render the payslips of a payroll run into a zip (one file per employee or one bundle per department)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("year", type=int, help="Jalali year")
+        parser.add_argument("month", type=int, help="Jalali month (1-12)")
+        parser.add_argument("--layout", choices=LAYOUTS, default="employee")
+        parser.add_argument("--workers", type=int, help="Rendering processes (default: PAYROLL_PAYSLIP_WORKERS; 0 = one per CPU).")
+        parser.add_argument("--pdf", action="store_true", help="Also write a PDF per employee (needs WeasyPrint).")
+        parser.add_argument("--out", help="Zip path (default: <archive>/<year>-<month>/payslips-<layout>.zip).")
+
+    def handle(self, *args, **opts):
+        run = PayrollRun.objects.filter(year=opts["year"], month=opts["month"]).first()
+        if run is None:
+            raise CommandError(f"No payroll run for {opts['year']}-{opts['month']:02d}.")
+        path = Path(opts["out"]) if opts["out"] else archive_dir(run) / f"payslips-{opts['layout']}.zip"
+        profiler = Profiler()
+        try:
+            batch = write_payslips(
+                run, path, layout=opts["layout"], workers=opts["workers"], pdf=opts["pdf"], profiler=profiler,
+            )
+        except PayslipError as exc:
+            raise CommandError(str(exc)) from None
+        run.record_profile("payslips", profiler)
+
+        seconds = sum(s.wall_ms for s in profiler.spans) / 1000
+        self.stdout.write(self.style.SUCCESS(
+            f"{batch.slips} payslips in {len(batch.departments)} department(s), {seconds:.1f}s -> {path}"
+        ))
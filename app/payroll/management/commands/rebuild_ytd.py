@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from payroll.models import PayrollRun
+from payroll.ytd import rebuild_ytd
+
+
+class Command(BaseCommand):
+    help = "Recompute the payroll year-to-date rows of Jalali years from their payroll lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("years", nargs="*", type=int, help="Jalali years (default: every year with a payroll run)")
+
+    def handle(self, *args, **opts):
+        years = opts["years"] or sorted(set(PayrollRun.objects.values_list("year", flat=True)))
+        for year in years:
+            rows = rebuild_ytd(year)
+            self.stdout.write(f"{year}: {rows} employee(s)")
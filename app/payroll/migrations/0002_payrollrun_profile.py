@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrun',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
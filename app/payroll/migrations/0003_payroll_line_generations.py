@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_employee_clock_code'),
+        ('payroll', '0002_payrollrun_profile'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='payrollline',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='payrollline',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrollrun',
+            name='generation_seq',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='payrollrun',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='payrollline',
+            unique_together={('run', 'generation', 'employee')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0003_payroll_line_generations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRunLock',
+            fields=[
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calculation_lock', serialize=False, to='payroll.payrollrun')),
+                ('owner', models.CharField(max_length=64)),
+                ('scope', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+    ]
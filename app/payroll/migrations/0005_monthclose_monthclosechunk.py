@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0004_payrollrunlock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthClose',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('VALIDATE', 'Validate inputs'), ('CALCULATE', 'Calculate'), ('EXPORT', 'Build exports'), ('FREEZE', 'Freeze and archive'), ('DONE', 'Done')], default='VALIDATE', max_length=10)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('FAILED', 'Failed'), ('DONE', 'Done')], default='RUNNING', max_length=10)),
+                ('chunk_size', models.PositiveIntegerField(default=500)),
+                ('error', models.TextField(blank=True)),
+                ('archive_path', models.CharField(blank=True, max_length=500)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='month_close', to='payroll.payrollrun')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthCloseChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('VALIDATE', 'Validate inputs'), ('CALCULATE', 'Calculate'), ('EXPORT', 'Build exports'), ('FREEZE', 'Freeze and archive'), ('DONE', 'Done')], max_length=10)),
+                ('number', models.PositiveIntegerField()),
+                ('first_employee_id', models.PositiveIntegerField()),
+                ('last_employee_id', models.PositiveIntegerField()),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('issues', models.JSONField(blank=True, default=list)),
+                ('done_at', models.DateTimeField(blank=True, null=True)),
+                ('close', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='payroll.monthclose')),
+            ],
+            options={
+                'ordering': ['close', 'stage', 'number'],
+                'unique_together': {('close', 'stage', 'number')},
+            },
+        ),
+    ]
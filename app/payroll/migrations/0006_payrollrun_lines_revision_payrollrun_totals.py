@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0005_monthclose_monthclosechunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollrun',
+            name='lines_revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='payrollrun',
+            name='totals',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_employee_clock_code'),
+        ('payroll', '0006_payrollrun_lines_revision_payrollrun_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollYtd',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('overtime', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bonus', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('prepaid', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('months_paid', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_ytd', to='employees.employee')),
+            ],
+            options={
+                'verbose_name': 'Payroll YTD',
+                'verbose_name_plural': 'Payroll YTD',
+                'ordering': ['-year', 'employee__first_name'],
+                'unique_together': {('employee', 'year')},
+            },
+        ),
+    ]
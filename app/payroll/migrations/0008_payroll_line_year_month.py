@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:36
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_run_period(apps, schema_editor):
+    PayrollLine = apps.get_model("payroll", "PayrollLine")
+    PayrollRun = apps.get_model("payroll", "PayrollRun")
+    run = PayrollRun.objects.filter(pk=OuterRef("run_id"))
+    PayrollLine.objects.update(
+        year=Subquery(run.values("year")[:1]),
+        month=Subquery(run.values("month")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_employee_clock_code'),
+        ('payroll', '0007_payrollytd'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollline',
+            name='month',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='payrollline',
+            name='year',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(copy_run_period, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='payrollline',
+            index=models.Index(fields=['employee', '-year', '-month'], include=('run', 'generation', 'base_salary', 'attendance_deduction', 'salary', 'bonus', 'overtime', 'total', 'tax', 'prepaid', 'amount_to_pay'), name='payroll_line_employee_history'),
+        ),
+    ]
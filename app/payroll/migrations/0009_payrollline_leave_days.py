@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0008_payroll_line_year_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollline',
+            name='leave_days',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=6),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_employee_department(apps, schema_editor):
+    PayrollLine = apps.get_model("payroll", "PayrollLine")
+    Employee = apps.get_model("employees", "Employee")
+    employee = Employee.objects.filter(pk=OuterRef("employee_id"))
+    PayrollLine.objects.update(department_id=Subquery(employee.values("department_id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_employee_bank_account'),
+        ('org', '0001_initial'),
+        ('payroll', '0009_payrollline_leave_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrollline',
+            name='department',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='org.department'),
+        ),
+        migrations.RunPython(copy_employee_department, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-19 23:05
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, F
+
+from core.jalali import jalali_month_range
+
+# lines written before the ledger were calculated on a fixed 26-day month
+LEGACY_WORKING_DAYS = Decimal(26)
+CENT = Decimal("0.01")
+
+
+def backfill_leave_days(apps, schema_editor):
+    """
+    Fill PayrollLine.leave_days of the active lines written before the ledger, so the
+    first recalculation after deploy only moves balances by the difference. Those
+    lines deducted every absence they did not charge for from the auto-cover leave
+    balance: leave days = absent days of the month - unpaid days, where the unpaid
+    days are read back from attendance_deduction at the legacy daily rate.
+    """
+    LeaveType = apps.get_model("leaves", "LeaveType")
+    if not LeaveType.objects.filter(auto_cover_absence=True, is_paid=True).exists():
+        return
+    AttendanceDay = apps.get_model("attendance", "AttendanceDay")
+    PayrollLine = apps.get_model("payroll", "PayrollLine")
+    PayrollRun = apps.get_model("payroll", "PayrollRun")
+
+    for run in PayrollRun.objects.order_by("year", "month").iterator():
+        month = jalali_month_range(run.year, run.month)
+        absent = dict(
+            AttendanceDay.objects.filter(date__range=(month.g_start, month.g_end), status="ABSENT")
+            .values_list("employee_id")
+            .annotate(days=Count("id"))
+            .order_by()
+        )
+        lines = list(
+            PayrollLine.objects.filter(
+                run_id=run.pk, generation=F("run__version"), employee_id__in=absent, base_salary__gt=0,
+            )
+        )
+        for line in lines:
+            unpaid = line.attendance_deduction * LEGACY_WORKING_DAYS / line.base_salary
+            days = Decimal(absent[line.employee_id])
+            line.leave_days = min(days, max(Decimal(0), days - unpaid)).quantize(CENT)
+        PayrollLine.objects.bulk_update([line for line in lines if line.leave_days], ["leave_days"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_punchday_punchfile_rawpunch'),
+        ('leaves', '0003_alter_leaveentry_date_to_alter_leaveentry_days_count'),
+        ('payroll', '0010_payrollline_department'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_leave_days, migrations.RunPython.noop),
+    ]
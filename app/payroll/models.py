@@ -1,5 +1,6 @@
 # payroll/models.py
 from django.db import models
+from django.utils import timezone
 from employees.models import Employee
 
 class PayrollRun(models.Model):
@@ -12,6 +13,17 @@ class PayrollRun(models.Model):
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.DRAFT)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # phase timings of the last calculation / export: {"calculate": {...}, "export": {...}}
+    profile = models.JSONField(default=dict, blank=True, editable=False)
+
+    # lines are written as generations; `version` is the one readers see (see active_lines)
+    version = models.PositiveIntegerField(default=0, editable=False)
+    generation_seq = models.PositiveIntegerField(default=0, editable=False)
+    # bumped by every write to the active lines (swap or partial upsert); keys `totals`
+    lines_revision = models.PositiveIntegerField(default=0, editable=False)
+    # per-department and grand totals of the active lines (payroll.reporting.run_totals)
+    totals = models.JSONField(default=dict, blank=True, editable=False)
+
     class Meta:
         unique_together = ("year", "month")
         ordering = ["-year", "-month"]
@@ -19,10 +31,104 @@ class PayrollRun(models.Model):
     def __str__(self):
         return f"Payroll {self.year}-{self.month:02d}"
 
+    def record_profile(self, key: str, profiler):
+        """
+        Store a core.profiling.Profiler result under profile[key].
+        """
+        spans = profiler.as_list()
+        self.profile = {
+            **(self.profile or {}),
+            key: {
+                "at": timezone.now().isoformat(timespec="seconds"),
+                "wall_ms": round(sum(s["wall_ms"] for s in spans), 1),
+                "queries": sum(s["queries"] for s in spans),
+                "spans": spans,
+            },
+        }
+        PayrollRun.objects.filter(pk=self.pk).update(profile=self.profile)
+
+    def active_lines(self):
+        """
+        Lines of the active generation. `run.lines` also holds a generation being
+        built or one waiting for garbage collection, so readers must use this.
+        """
+        return self.lines.filter(generation=self.version)
+
+
+class PayrollRunLock(models.Model):
+    """
+    Held while a calculation of `run` is in flight (see payroll.locking); the row
+    exists only for that time. `scope` is the employee filter of the calculation.
+    """
+    run = models.OneToOneField(PayrollRun, on_delete=models.CASCADE, primary_key=True, related_name="calculation_lock")
+    owner = models.CharField(max_length=64)
+    scope = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.run} locked by {self.owner}"
+
+
+class MonthClose(models.Model):
+    """
+    State of the month-close pipeline of one run (payroll.closing): the current stage
+    and its status; the per-chunk checkpoints are MonthCloseChunk rows.
+    """
+    class Stage(models.TextChoices):
+        VALIDATE = "VALIDATE", "Validate inputs"
+        CALCULATE = "CALCULATE", "Calculate"
+        EXPORT = "EXPORT", "Build exports"
+        FREEZE = "FREEZE", "Freeze and archive"
+        DONE = "DONE", "Done"
+
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING", "Running"
+        FAILED = "FAILED", "Failed"
+        DONE = "DONE", "Done"
+
+    run = models.OneToOneField(PayrollRun, on_delete=models.CASCADE, related_name="month_close")
+    stage = models.CharField(max_length=10, choices=Stage.choices, default=Stage.VALIDATE)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    chunk_size = models.PositiveIntegerField(default=500)
+    error = models.TextField(blank=True)
+    archive_path = models.CharField(max_length=500, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Close {self.run} - {self.get_stage_display()}"
+
+
+class MonthCloseChunk(models.Model):
+    """
+    One chunk of employees (id range, fixed when the stage starts) of one stage;
+    done_at is set in the same transaction as the chunk's work.
+    """
+    close = models.ForeignKey(MonthClose, on_delete=models.CASCADE, related_name="chunks")
+    stage = models.CharField(max_length=10, choices=MonthClose.Stage.choices)
+    number = models.PositiveIntegerField()
+    first_employee_id = models.PositiveIntegerField()
+    last_employee_id = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField(default=0)
+    issues = models.JSONField(default=list, blank=True)  # [[employee_id, message], ...]
+    done_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("close", "stage", "number")
+        ordering = ["close", "stage", "number"]
+
 
 class PayrollLine(models.Model):
     run = models.ForeignKey(PayrollRun, on_delete=models.CASCADE, related_name="lines")
+    generation = models.PositiveIntegerField(default=0)
     employee = models.ForeignKey(Employee, on_delete=models.PROTECT)
+    # the employee's department when the line was calculated (rollups group by it, so a
+    # later transfer does not move the month's cost)
+    department = models.ForeignKey("org.Department", on_delete=models.PROTECT, null=True, related_name="+")
+    # copies of run.year / run.month: key of the employee history index
+    year = models.PositiveIntegerField(default=0)  # Jalali year
+    month = models.PositiveSmallIntegerField(default=0)  # Jalali month
 
     # Report fields
     base_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -39,14 +145,57 @@ class PayrollLine(models.Model):
     prepaid = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # manual
     amount_to_pay = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # total - tax - prepaid
 
+    # absent days covered by the auto-cover leave type, i.e. what this line took off the
+    # employee's leave balance; a replacing line only moves the balance by the difference
+    leave_days = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+
     class Meta:
-        unique_together = ("run", "employee")
+        unique_together = ("run", "generation", "employee")
         ordering = ["employee__first_name"]
+        indexes = [
+            # one employee's lines newest first, answered from the index on PostgreSQL
+            # (INCLUDE columns are ignored by backends without covering indexes)
+            models.Index(
+                fields=["employee", "-year", "-month"],
+                include=[
+                    "run", "generation", "base_salary", "attendance_deduction", "salary", "bonus",
+                    "overtime", "total", "tax", "prepaid", "amount_to_pay",
+                ],
+                name="payroll_line_employee_history",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.run} - {self.employee}"
 
 
+class PayrollYtd(models.Model):
+    """
+    Year-to-date sums of an employee's active payroll lines in a Jalali year, kept
+    current by every line write (payroll.ytd.apply_delta) so statements read one row.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="payroll_ytd")
+    year = models.PositiveIntegerField()  # Jalali year
+
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum of line.total
+    overtime = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bonus = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    prepaid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # sum of line.amount_to_pay
+    months_paid = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("employee", "year")
+        ordering = ["-year", "employee__first_name"]
+        verbose_name = "Payroll YTD"
+        verbose_name_plural = "Payroll YTD"
+
+    def __str__(self):
+        return f"{self.employee} {self.year}"
+
+
 class BonusEntry(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="bonuses")
     year = models.PositiveIntegerField()         # Jalali year
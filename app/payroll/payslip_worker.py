@@ -0,0 +1,55 @@
+"""
+The rendering side of payroll.payslips, run in the payslip worker processes.
+
+Spawned workers unpickle their tasks by importing this module before Django is
+set up, so it imports nothing from the apps at module level; `init_worker` sets
+Django up, closes the connections that opened and compiles the slip template.
+"""
+from __future__ import annotations
+
+SLIP_TEMPLATE = "admin/payroll/payslip.html"
+
+_slip_template = None
+
+
+def _load_template():
+    global _slip_template
+    from django.template.loader import get_template
+
+    _slip_template = get_template(SLIP_TEMPLATE)
+
+
+def init_worker():
+    """
+    Set up Django in a spawned worker and compile the slip template once. Rendering
+    needs no database, so connections opened while setting up are closed.
+    """
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    from django.db import connections
+
+    connections.close_all()
+    _load_template()
+
+
+def render_chunk(run_context: dict, slips: list[dict], document: tuple[str, str] | None) -> list[tuple[dict, str, bytes | None]]:
+    """
+    (slip, html fragment, pdf bytes or None) for every slip; `document` is the
+    (head, tail) the fragment is wrapped in for the PDF, None for no PDF.
+    """
+    if _slip_template is None:
+        _load_template()
+    pdf = None
+    if document is not None:
+        from weasyprint import HTML
+
+        pdf = HTML
+    rendered = []
+    for slip in slips:
+        html = _slip_template.render({**run_context, "slip": slip})
+        data = pdf(string=document[0] + html + document[1]).write_pdf() if pdf else None
+        rendered.append((slip, html, data))
+    return rendered
@@ -0,0 +1,275 @@
+"""
+Payslips of a payroll run, rendered in bulk.
+
+The run's active lines are read through a server-side cursor in chunks of
+CHUNK_SIZE; for each chunk three queries load attendance exceptions of the month
+(grouped by employee and status), the year's leave balances and year-to-date
+totals into plain dicts. Slips are grouped by the department the line was
+calculated in (PayrollLine.department), not the employee's current one.
+
+Chunks are rendered in this process or across a process pool. Each worker is
+spawned fresh (no forked copy of the parent's database connections or threads),
+closes any connection it opens while setting up, compiles the payslip template
+once and never touches the database. PDF is slow enough to always use the pool;
+for HTML the first chunk is rendered here and timed, and the pool is started only
+when the rest would take longer inline than starting POOL_STARTUP_SECONDS worth of
+workers and sharing the work. Only a couple of chunks per worker are loaded and in
+flight at a time; they come back in order and are written straight into the zip,
+so the archive is deterministic and memory does not grow with the run.
+
+The pool is for the `payslips` management command; the admin download renders in
+the request's own process (workers=1) and never starts one.
+
+Layouts:
+
+    employee     <department>/<employee id>-<name>.html (and .pdf), one file per slip
+    department   <department>.html, all slips of a department in one printable file
+
+PDF is written only where WeasyPrint is installed (it is not a dependency of the
+app); HTML is always written.
+
+    write_payslips(run, archive, layout="employee", workers=None, pdf=False) -> PayslipBatch
+"""
+from __future__ import annotations
+
+import importlib.util
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.models import Count
+
+from attendance.models import AttendanceDay
+from core.importing import chunked
+from core.jalali import JALALI_MONTHS_DARI, jalali_month_range
+from core.profiling import Profiler
+from leaves.models import LeaveYearBalance
+
+from .history import ATTENDANCE_KEYS
+from .models import PayrollLine, PayrollRun, PayrollYtd
+from .payslip_worker import init_worker, render_chunk
+from .reporting import TOTAL_FIELDS
+from .ytd import YTD_FIELDS
+
+LAYOUTS = ("employee", "department")
+CHUNK_SIZE = 250  # slips per task: large enough to amortise pickling, small enough to keep workers busy
+POOL_STARTUP_SECONDS = 1.5  # a spawned worker imports the app and sets Django up (~1s, measured)
+IN_FLIGHT = 2  # chunks submitted per worker ahead of the one being written
+DOCUMENT_TEMPLATE = "admin/payroll/payslip_document.html"
+MARKER = "<!-- payslips -->"
+UNSAFE = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class PayslipError(ValueError):
+    pass
+
+
+@dataclass
+class PayslipBatch:
+    layout: str
+    slips: int = 0
+    pdf: bool = False
+    departments: dict[str, int] = field(default_factory=dict)  # folder / bundle name -> slips
+
+
+def pdf_available() -> bool:
+    return importlib.util.find_spec("weasyprint") is not None
+
+
+def _name(text: str) -> str:
+    return UNSAFE.sub("_", text).strip("_") or "_"
+
+
+def _slip_inputs(run: PayrollRun, rows: list[dict]) -> list[dict]:
+    """
+    Context dicts of one chunk of line rows: employee fields, "line" (TOTAL_FIELDS),
+    "attendance" (days by kind), "leave_balances" and "ytd" (PayrollYtd fields, or None).
+    """
+    employee_ids = [row["employee_id"] for row in rows]
+    month = jalali_month_range(run.year, run.month)
+
+    attendance = defaultdict(lambda: dict.fromkeys(ATTENDANCE_KEYS.values(), 0))
+    for employee_id, status, days in (
+        AttendanceDay.objects.filter(
+            employee_id__in=employee_ids, date__range=(month.g_start, month.g_end), status__in=ATTENDANCE_KEYS,
+        )
+        .values_list("employee_id", "status")
+        .annotate(days=Count("id"))
+        .order_by()
+    ):
+        attendance[employee_id][ATTENDANCE_KEYS[status]] = days
+
+    balances = defaultdict(list)
+    for employee_id, name, remaining in (
+        LeaveYearBalance.objects.filter(employee_id__in=employee_ids, year=run.year)
+        .order_by("leave_type__name")
+        .values_list("employee_id", "leave_type__name", "remaining_days")
+    ):
+        balances[employee_id].append({"leave_type": name, "remaining_days": remaining})
+
+    ytd = {
+        row["employee_id"]: row
+        for row in PayrollYtd.objects.filter(employee_id__in=employee_ids, year=run.year)
+        .values("employee_id", "months_paid", *YTD_FIELDS)
+    }
+
+    return [
+        {
+            "employee_id": row["employee_id"],
+            "first_name": row["employee__first_name"],
+            "father_name": row["employee__father_name"],
+            "position": row["employee__position__name"],
+            "department_id": row["department_id"],
+            "department": row["department__name"],
+            "line": {f: row[f] for f in TOTAL_FIELDS},
+            "attendance": attendance.get(row["employee_id"], dict.fromkeys(ATTENDANCE_KEYS.values(), 0)),
+            "leave_balances": balances.get(row["employee_id"], []),
+            "ytd": ytd.get(row["employee_id"]),
+        }
+        for row in rows
+    ]
+
+
+def payslip_chunks(run: PayrollRun, size: int = CHUNK_SIZE):
+    """
+    The slip contexts of the active lines of `run` in chunks of `size`, ordered by
+    the department the line was calculated in (PayrollLine.department) and name.
+    Each chunk costs three queries on top of the lines' server-side cursor.
+    """
+    lines = (
+        PayrollLine.objects.filter(run_id=run.pk, generation=run.version)
+        .order_by("department__name", "department_id", "employee__first_name", "employee_id")
+        .values(
+            "employee_id", "employee__first_name", "employee__father_name", "employee__position__name",
+            "department_id", "department__name", *TOTAL_FIELDS,
+        )
+        .iterator(chunk_size=size)
+    )
+    for rows in chunked(lines, size):
+        yield _slip_inputs(run, rows)
+
+
+# -- orchestration ------------------------------------------------------------
+
+def _document(run_context: dict) -> tuple[str, str]:
+    from django.template.loader import render_to_string
+
+    head, _, tail = render_to_string(DOCUMENT_TEMPLATE, run_context).partition(MARKER)
+    return head, tail
+
+
+def _use_pool(chunk_seconds: float, chunk_slips: int, remaining: int, workers: int) -> bool:
+    """
+    Whether the `remaining` slips finish sooner across `workers` spawned processes
+    than in this one, at the cost per slip measured on the first chunk.
+    """
+    inline = chunk_seconds / chunk_slips * remaining
+    return inline > POOL_STARTUP_SECONDS + inline / workers
+
+
+def _rendered(run_context: dict, chunks, total: int, workers: int, document):
+    """
+    (slip, html, pdf) in order. PDF goes to the pool whenever there is more than one
+    chunk; HTML renders its first chunk here and moves to the pool only when the
+    measured cost of the rest outweighs starting it.
+    """
+    chunks = iter(chunks)
+    workers = min(workers, -(-total // CHUNK_SIZE))
+    if workers > 1 and document is None:
+        first = next(chunks, [])
+        start = time.perf_counter()
+        rendered = render_chunk(run_context, first, document)
+        seconds = time.perf_counter() - start
+        yield from rendered
+        if not first or not _use_pool(seconds, len(first), total - len(first), workers):
+            workers = 1
+    if workers <= 1:
+        for chunk in chunks:
+            yield from render_chunk(run_context, chunk, document)
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=init_worker,
+    ) as pool:
+        pending = deque()
+        for chunk in chunks:  # inputs are loaded here while the workers render
+            pending.append(pool.submit(render_chunk, run_context, chunk, document))
+            if len(pending) >= workers * IN_FLIGHT:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def write_payslips(
+    run: PayrollRun,
+    archive,
+    layout: str = "employee",
+    workers: int | None = None,
+    pdf: bool = False,
+    profiler: Profiler | None = None,
+) -> PayslipBatch:
+    """
+    Write the payslips of `run` into `archive` (a path or a binary file object) as a
+    zip in `layout`. `workers` defaults to PAYROLL_PAYSLIP_WORKERS (0 = one per CPU).
+    Raises PayslipError for an unknown layout, or for `pdf` without WeasyPrint or in the
+    department layout.
+    """
+    if layout not in LAYOUTS:
+        raise PayslipError(f"Unknown layout {layout!r}; use one of {', '.join(LAYOUTS)}.")
+    if pdf and not pdf_available():
+        raise PayslipError("PDF payslips need WeasyPrint, which is not installed; HTML is available.")
+    if pdf and layout != "employee":
+        raise PayslipError("PDF payslips are written one per employee; use the employee layout.")
+    if workers is None:
+        workers = settings.PAYROLL_PAYSLIP_WORKERS
+    workers = workers or os.cpu_count() or 1
+    profiler = profiler or Profiler()
+
+    run.refresh_from_db(fields=["status", "version"])
+    total = PayrollLine.objects.filter(run_id=run.pk, generation=run.version).count()
+
+    run_context = {
+        "run": {"year": run.year, "month": run.month, "status": run.status},
+        "month_name": JALALI_MONTHS_DARI[run.month],
+        "final": run.status == PayrollRun.Status.FINAL,
+    }
+    head, tail = _document(run_context)
+    batch = PayslipBatch(layout=layout, pdf=pdf)
+    prefix = f"payslips-{run.year}-{run.month:02d}"
+
+    # inputs are loaded chunk by chunk as the slips are rendered, so "render" covers both
+    with profiler.span("render") as span, zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        bundle, bundle_name = None, None
+        try:
+            slips = _rendered(run_context, payslip_chunks(run, CHUNK_SIZE), total, workers, (head, tail) if pdf else None)
+            for slip, html, data in slips:
+                folder = f"{slip['department_id']:03d}-{_name(slip['department'])}"
+                batch.slips += 1
+                batch.departments[folder] = batch.departments.get(folder, 0) + 1
+                if layout == "employee":
+                    stem = f"{prefix}/{folder}/{slip['employee_id']}-{_name(slip['first_name'])}"
+                    zf.writestr(f"{stem}.html", head + html + tail)
+                    if data is not None:
+                        zf.writestr(f"{stem}.pdf", data)
+                    continue
+                # slips arrive ordered by department: one open bundle at a time
+                if folder != bundle_name:
+                    if bundle is not None:
+                        bundle.write(tail.encode("utf-8"))
+                        bundle.close()
+                    bundle_name = folder
+                    bundle = zf.open(f"{prefix}/{folder}.html", "w")
+                    bundle.write(head.encode("utf-8"))
+                bundle.write(html.encode("utf-8"))
+            if bundle is not None:
+                bundle.write(tail.encode("utf-8"))
+        finally:
+            if bundle is not None:
+                bundle.close()
+        span.rows = batch.slips
+    return batch
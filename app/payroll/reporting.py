@@ -0,0 +1,100 @@
+"""
+Payroll report rows and totals, grouped by the department each line was calculated
+in (PayrollLine.department), so a historical run keeps its groups after a transfer
+and agrees with the rollups and the report catalog.
+
+Totals (per department and grand) are one GROUP BY over the active lines, stored on
+PayrollRun.totals together with the lines_revision they were computed for, so they are
+reused until a calculation writes lines again. Rows are read in keyset pages for the
+screen or streamed in chunks for printing.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from .models import PayrollLine, PayrollRun
+
+TOTAL_FIELDS = (
+    "base_salary", "attendance_deduction", "salary", "bonus", "overtime",
+    "total", "tax", "prepaid", "amount_to_pay",
+)
+# within a department; the department keys are prepended by report_order
+LINE_SORTS = {
+    "name": ("employee__first_name", "employee_id"),
+    "id": ("employee_id",),
+    "amount": ("-amount_to_pay", "employee_id"),
+}
+GROUPING = "line_department"  # totals cached under an earlier grouping are recomputed
+
+
+def report_order(sort: str) -> tuple[str, ...]:
+    return ("department__name", "department_id") + LINE_SORTS[sort]
+
+
+def report_lines(run: PayrollRun):
+    return run.active_lines().select_related("employee", "department")
+
+
+def _decimal_totals(row: dict) -> dict:
+    return {name: row[name] if row[name] is not None else Decimal("0.00") for name in TOTAL_FIELDS}
+
+
+def run_totals(run: PayrollRun) -> dict:
+    """
+    {"revision", "grand": {...}, "departments": {department_id: {"name", "lines", ...}}}
+    with amounts as Decimal. Recomputed only when lines_revision moved on; the write is
+    conditional on the revision, so totals of a superseded revision are never stored.
+    """
+    revision, version, cached = (
+        PayrollRun.objects.filter(pk=run.pk).values_list("lines_revision", "version", "totals").get()
+    )
+    if cached.get("revision") != revision or cached.get("grouping") != GROUPING:
+        rows = (
+            PayrollLine.objects.filter(run_id=run.pk, generation=version)
+            .values("department_id", "department__name")
+            .annotate(lines=Count("id"), **{name: Sum(name) for name in TOTAL_FIELDS})
+            .order_by("department__name")
+        )
+        departments = {}
+        grand = {"lines": 0, **{name: Decimal("0.00") for name in TOTAL_FIELDS}}
+        for row in rows:
+            sums = _decimal_totals(row)
+            departments[str(row["department_id"])] = {
+                "name": row["department__name"],
+                "lines": row["lines"],
+                **{name: str(value) for name, value in sums.items()},
+            }
+            grand["lines"] += row["lines"]
+            for name, value in sums.items():
+                grand[name] += value
+        cached = {
+            "revision": revision,
+            "grouping": GROUPING,
+            "departments": departments,
+            "grand": {name: str(value) for name, value in grand.items()},
+        }
+        PayrollRun.objects.filter(pk=run.pk, lines_revision=revision).update(totals=cached)
+
+    def parse(block: dict) -> dict:
+        return {key: (Decimal(value) if key in TOTAL_FIELDS else value) for key, value in block.items()}
+
+    return {
+        "revision": cached["revision"],
+        "grand": parse(cached["grand"]),
+        "departments": {int(k): parse(v) for k, v in cached["departments"].items()},
+    }
+
+
+def grouped_rows(lines, departments: dict, current_department: int | None = None):
+    """
+    Yield ("department", totals) before the first line of each department, then
+    ("line", line). `current_department` continues a group from the previous page/chunk.
+    """
+    for line in lines:
+        department_id = line.department_id
+        if department_id != current_department:
+            current_department = department_id
+            yield "department", departments.get(department_id, {"name": line.department.name})
+        yield "line", line
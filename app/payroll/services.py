@@ -2,17 +2,26 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from django.db import transaction, models
+from django.conf import settings
+from django.db import connection, transaction, models
+from django.db.models import F
 import datetime as dt
 import jdatetime
+import threading
 
 from core.models import MonthConfig
 from core.jalali import jalali_month_range
+from core.calendar import month_calendar
+from core.rollups import mark_stale, refresh_later
 from employees.models import Employee
 from attendance.models import AttendanceDay
 from leaves.models import LeaveEntry, LeaveType, LeaveYearBalance
 from overtime.models import OvertimeEntry
 from payroll.models import PayrollRun, PayrollLine, BonusEntry, PrepaidEntry
+from payroll.locking import coalesced
+from payroll import ytd
+from core import metrics
+from core.profiling import Profiler
 
 
 def calculate_progressive_tax(amount: Decimal) -> Decimal:
@@ -46,127 +55,430 @@ def calculate_progressive_tax(amount: Decimal) -> Decimal:
     return tax.quantize(Decimal("0.01"))
 
 
-@transaction.atomic
-def calculate_payroll(run: PayrollRun):
+def _sum_by_employee(qs, field: str) -> dict:
+    rows = qs.values("employee_id").annotate(total=models.Sum(field)).values_list("employee_id", "total")
+    return {emp_id: total or Decimal("0") for emp_id, total in rows}
+
+
+def line_leave_days(lines) -> dict:
+    """
+    {employee_id: leave_days} of the PayrollLine queryset's lines that deducted leave.
+    """
+    return dict(lines.exclude(leave_days=0).values_list("employee_id", "leave_days"))
+
+
+def apply_leave_delta(jy: int, old: dict, new: dict, leave_type: LeaveType | None = None) -> int:
+    """
+    Move the auto-cover leave balances of Jalali year `jy` by what the `new` lines deduct
+    beyond the `old` lines they replace ({employee_id: leave_days} each); recalculating
+    the same inputs therefore changes nothing, and removed lines give their days back.
+    Must run in the transaction that writes the lines. Returns the number of balances changed.
+    """
+    deltas = {}
+    for emp_id in old.keys() | new.keys():
+        delta = new.get(emp_id, Decimal("0")) - old.get(emp_id, Decimal("0"))
+        if delta:
+            deltas[emp_id] = delta
+    if not deltas:
+        return 0
+    leave_type = leave_type or LeaveType.objects.filter(auto_cover_absence=True, is_paid=True).first()
+    if leave_type is None:
+        return 0
+
+    with transaction.atomic():
+        # missing balances start at the yearly limit; created first so the lock covers them
+        LeaveYearBalance.objects.bulk_create(
+            [
+                LeaveYearBalance(
+                    employee_id=emp_id, year=jy, leave_type=leave_type,
+                    remaining_days=Decimal(leave_type.yearly_limit_days),
+                )
+                for emp_id in deltas
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        balances = list(
+            LeaveYearBalance.objects.select_for_update().filter(year=jy, leave_type=leave_type, employee_id__in=deltas)
+        )
+        for bal in balances:
+            bal.remaining_days -= deltas[bal.employee_id]
+        LeaveYearBalance.objects.bulk_update(balances, ["remaining_days"], batch_size=1000)
+    return len(balances)
+
+
+GC_BATCH_SIZE = 5000
+
+
+def _next_generation(run: PayrollRun) -> int:
+    with transaction.atomic():
+        PayrollRun.objects.filter(pk=run.pk).update(generation_seq=F("generation_seq") + 1)
+        return PayrollRun.objects.filter(pk=run.pk).values_list("generation_seq", flat=True).get()
+
+
+def collect_old_generations(run_id: int) -> int:
+    """
+    Delete lines of `run_id` outside the active generation: the one replaced by the
+    last swap and any staging generation left behind by a failed calculation.
+    Deleted in short batches so readers and the next calculation are never blocked long.
+    """
+    deleted = 0
+    while True:
+        version = PayrollRun.objects.filter(pk=run_id).values_list("version", flat=True).first()
+        if version is None:
+            return deleted
+        ids = list(
+            PayrollLine.objects.filter(run_id=run_id, generation__lt=version)
+            .values_list("id", flat=True)[:GC_BATCH_SIZE]
+        )
+        if not ids:
+            return deleted
+        deleted += PayrollLine.objects.filter(id__in=ids).delete()[0]
+
+
+def _collect_in_background(run_id: int):
+    def work():
+        try:
+            collect_old_generations(run_id)
+        finally:
+            connection.close()
+
+    if getattr(settings, "PAYROLL_GC_IN_BACKGROUND", True):
+        threading.Thread(target=work, name=f"payroll-gc-{run_id}").start()
+    else:
+        collect_old_generations(run_id)
+
+
+def employee_scope(department_ids=None, employee_ids=None) -> dict:
+    """
+    Employee filter kwargs of a partial calculation ({} = the whole organization).
+    """
+    scope = {}
+    if department_ids:
+        scope["department_id__in"] = sorted({int(d) for d in department_ids})
+    if employee_ids:
+        scope["id__in"] = sorted({int(e) for e in employee_ids})
+    return scope
+
+
+class PayrollRunFinalError(ValueError):
+    pass
+
+
+class PayrollCalendarError(ValueError):
+    pass
+
+
+def calculate_payroll(
+    run: PayrollRun,
+    profiler: Profiler | None = None,
+    department_ids=None,
+    employee_ids=None,
+):
+    """
+    Rebuild all lines of `run` for WORKING employees.
+
+    With `department_ids` and/or `employee_ids` only the matching employees are
+    recalculated: their lines in the active generation are replaced in one transaction
+    and the rest of the run is left as it is, so the cost follows the size of the subset.
+
+    FINAL runs raise PayrollRunFinalError before anything is loaded; a department without
+    a working day in the month (no daily rate) raises PayrollCalendarError. Calls for a run that
+    is already being calculated (same or wider scope) wait for that calculation and return
+    its profiler, or None when it ran in another process (see payroll.locking).
+    """
+    if PayrollRun.objects.filter(pk=run.pk, status=PayrollRun.Status.FINAL).exists():
+        raise PayrollRunFinalError(f"{run} is FINAL and cannot be recalculated.")
+    scope = employee_scope(department_ids, employee_ids)
+    own = profiler or Profiler()
+    result, _ = coalesced(run.pk, scope, lambda: _calculate_payroll(run, own, scope))
+    run.refresh_from_db(fields=["version", "profile"])
+    return result
+
+
+def _calculate_payroll(run: PayrollRun, profiler: Profiler, scope: dict) -> Profiler:
+    """
+    The calculation itself, run under the lock taken by calculate_payroll.
+
+    A full rebuild writes the new lines as a staging generation next to the live ones, so
+    readers keep seeing the previous result until one short transaction switches
+    `run.version` and, only when that switch wins, applies the leave balance changes; the
+    replaced generation is deleted afterwards in a background thread (see
+    collect_old_generations).
+
+    Inputs are loaded with one grouped query per source (not per employee), and the
+    phases are timed as profiler spans; the result is stored in `run.profile["calculate"]`.
+    """
+    related_scope = {f"employee__{key}": value for key, value in scope.items()}
     jy, jm = run.year, run.month
     rng = jalali_month_range(jy, jm)  # gregorian start/end
+    month_range = (rng.g_start, rng.g_end)
+
+    with profiler.span("load_inputs") as span:
+        cfg, _ = MonthConfig.objects.get_or_create(
+            year=jy,
+            month=jm,
+            defaults={
+                "daily_work_hours": 8,
+                "overtime_rate": 1,
+                "monthly_paid_leave_cap": 5,
+            },
+        )
 
-    cfg, _ = MonthConfig.objects.get_or_create(
-        year=jy,
-        month=jm,
-        defaults={
-            "daily_work_hours": 8,
-            "overtime_rate": 1,
-            "monthly_paid_leave_cap": 5,
-        },
-    )
-
-    # Fridays count inside this Jalali month range
-    fridays = 0
-    cur = rng.g_start
-    while cur <= rng.g_end:
-        if cur.weekday() == 4:
-            fridays += 1
-        cur += dt.timedelta(days=1)
-
-    working_days = 26
-
-    daily_work_hours = Decimal(cfg.daily_work_hours) if cfg.daily_work_hours else Decimal("8")
-    overtime_rate = Decimal(cfg.overtime_rate)
-
-    auto_leave_type = LeaveType.objects.filter(auto_cover_absence=True, is_paid=True).first()
+        # daily rate divisor: days minus Fridays and holidays (or MonthConfig.working_days),
+        # read from the database: another process may have changed a holiday
+        calendar = month_calendar(jy, jm, fresh=True)
 
-    run.lines.all().delete()
+        daily_work_hours = Decimal(cfg.daily_work_hours) if cfg.daily_work_hours else Decimal("8")
+        overtime_rate = Decimal(cfg.overtime_rate)
 
-    employees = Employee.objects.filter(status=Employee.Status.WORKING)
+        auto_leave_type = LeaveType.objects.filter(auto_cover_absence=True, is_paid=True).first()
 
-    for emp in employees:
-        base_salary = Decimal(emp.base_salary)
-        daily_rate = base_salary / Decimal(working_days)
+        employees = list(Employee.objects.filter(status=Employee.Status.WORKING, **scope))
+        no_working_days = sorted({
+            emp.department_id for emp in employees if calendar.working_days(emp.department_id) <= 0
+        })
+        if no_working_days:
+            raise PayrollCalendarError(
+                f"No working days in {jy}-{jm:02d} for department(s) {no_working_days}: every day is a "
+                "Friday or a holiday. Fix the holidays or set MonthConfig.working_days."
+            )
+        working = {"employee__status": Employee.Status.WORKING, **related_scope}
 
         # ABSENT days (exceptions-only)
-        absent_days = Decimal(
+        absent_map = dict(
             AttendanceDay.objects.filter(
-                employee=emp,
-                date__range=(rng.g_start, rng.g_end),
+                date__range=month_range,
                 status=AttendanceDay.Status.ABSENT,
-            ).count()
+                **working,
+            ).values("employee_id").annotate(n=models.Count("id")).values_list("employee_id", "n")
+        )
+        overtime_map = _sum_by_employee(
+            OvertimeEntry.objects.filter(date__range=month_range, **working), "hours"
         )
+        bonus_map = _sum_by_employee(BonusEntry.objects.filter(year=jy, month=jm, **working), "amount")
+        prepaid_map = _sum_by_employee(PrepaidEntry.objects.filter(year=jy, month=jm, **working), "amount")
+
+        taken_map = {}
+        balance_map = {}
+        deducted_map = {}
+        if auto_leave_type:
+            taken_map = _sum_by_employee(
+                LeaveEntry.objects.filter(
+                    leave_type=auto_leave_type,
+                    date_from__lte=rng.g_end,
+                    date_to__gte=rng.g_start,
+                    **working,
+                ),
+                "days_count",
+            )
+            balance_map = dict(
+                LeaveYearBalance.objects.filter(year=jy, leave_type=auto_leave_type, **working)
+                .values_list("employee_id", "remaining_days")
+            )
+            # days the active lines already took off those balances
+            deducted_map = line_leave_days(
+                PayrollLine.objects.filter(run_id=run.pk, generation=F("run__version"), **related_scope)
+            )
 
-        # Auto-cover ABSENT with paid leave (yearly remaining + monthly cap)
-        auto_paid_leave_days = Decimal("0")
-        unpaid_absent_days = absent_days
+        span.rows = len(employees)
 
-        if auto_leave_type and absent_days > 0:
-            already_taken = LeaveEntry.objects.filter(
-                employee=emp,
-                leave_type=auto_leave_type,
-                date_from__lte=rng.g_end,
-                date_to__gte=rng.g_start,
-            ).aggregate(total=models.Sum("days_count"))["total"] or Decimal("0")
+    # Auto-cover ABSENT with paid leave (yearly remaining + monthly cap)
+    with profiler.span("balance_updates") as span:
+        unpaid_map = {}
+        leave_map = {}
+        monthly_cap = Decimal(cfg.monthly_paid_leave_cap)
+
+        for emp in employees:
+            absent_days = Decimal(absent_map.get(emp.id, 0))
+            unpaid_map[emp.id] = absent_days
+
+            if not auto_leave_type or absent_days <= 0:
+                continue
 
-            monthly_cap = Decimal(cfg.monthly_paid_leave_cap)
+            already_taken = taken_map.get(emp.id, Decimal("0"))
             monthly_available = max(Decimal("0"), monthly_cap - Decimal(already_taken))
 
-            bal, _ = LeaveYearBalance.objects.get_or_create(
-                employee=emp,
-                year=jy,  # Jalali year
-                leave_type=auto_leave_type,
-                defaults={"remaining_days": Decimal(auto_leave_type.yearly_limit_days)},
-            )
-            yearly_available = Decimal(bal.remaining_days)
+            # the balance as it was before the line being replaced deducted from it
+            remaining = balance_map.get(emp.id, Decimal(auto_leave_type.yearly_limit_days))
+            yearly_available = Decimal(remaining) + deducted_map.get(emp.id, Decimal("0"))
 
             auto_paid_leave_days = min(absent_days, monthly_available, yearly_available)
 
             if auto_paid_leave_days > 0:
-                bal.remaining_days = yearly_available - auto_paid_leave_days
-                bal.save(update_fields=["remaining_days"])
-                unpaid_absent_days = absent_days - auto_paid_leave_days
-
-        # Attendance deduction is only unpaid absences
-        attendance_deduction = (daily_rate * unpaid_absent_days).quantize(Decimal("0.01"))
-
-        salary = (base_salary - attendance_deduction).quantize(Decimal("0.01"))
-
-        # Overtime amount
-        overtime_hours = OvertimeEntry.objects.filter(
-            employee=emp,
-            date__range=(rng.g_start, rng.g_end),
-        ).aggregate(total=models.Sum("hours"))["total"] or Decimal("0")
-
-        monthly_work_hours = Decimal(working_days) * daily_work_hours
-        hourly_salary = (base_salary / monthly_work_hours) if monthly_work_hours else Decimal("0")
-        overtime_amount = (Decimal(overtime_hours) * overtime_rate * hourly_salary).quantize(Decimal("0.01"))
-
-        # Bonus
-        bonus_amount = BonusEntry.objects.filter(
-            employee=emp, year=jy, month=jm
-        ).aggregate(total=models.Sum("amount"))["total"] or Decimal("0")
-        bonus_amount = Decimal(bonus_amount).quantize(Decimal("0.01"))
-
-        total = (salary + bonus_amount + overtime_amount).quantize(Decimal("0.01"))
-
-        # Tax is calculated from TOTAL (prepaid does not reduce tax base)
-        tax_amount = calculate_progressive_tax(total)
-
-        # Prepaid sum (manual)
-        prepaid_amount = PrepaidEntry.objects.filter(
-            employee=emp, year=jy, month=jm
-        ).aggregate(total=models.Sum("amount"))["total"] or Decimal("0")
-        prepaid_amount = Decimal(prepaid_amount).quantize(Decimal("0.01"))
-
-        amount_to_pay = (total - tax_amount - prepaid_amount).quantize(Decimal("0.01"))
-
-        PayrollLine.objects.create(
-            run=run,
-            employee=emp,
-            base_salary=base_salary,
-            attendance_deduction=attendance_deduction,
-            salary=salary,
-            bonus=bonus_amount,
-            overtime=overtime_amount,
-            total=total,
-            tax=tax_amount,
-            prepaid=prepaid_amount,
-            amount_to_pay=amount_to_pay,
-        )
\ No newline at end of file
+                leave_map[emp.id] = auto_paid_leave_days
+                unpaid_map[emp.id] = absent_days - auto_paid_leave_days
+
+        # applied as a difference to the replaced lines (apply_leave_delta) with the
+        # line writes, so a failed calculation leaves balances alone
+        span.rows = len(leave_map)
+
+    with profiler.span("compute_tax") as span:
+        lines = []
+
+        for emp in employees:
+            working_days = Decimal(calendar.working_days(emp.department_id))
+            monthly_work_hours = working_days * daily_work_hours
+            base_salary = Decimal(emp.base_salary)
+            daily_rate = base_salary / working_days
+
+            # Attendance deduction is only unpaid absences
+            attendance_deduction = (daily_rate * unpaid_map[emp.id]).quantize(Decimal("0.01"))
+
+            salary = (base_salary - attendance_deduction).quantize(Decimal("0.01"))
+
+            # Overtime amount
+            overtime_hours = overtime_map.get(emp.id, Decimal("0"))
+            hourly_salary = (base_salary / monthly_work_hours) if monthly_work_hours else Decimal("0")
+            overtime_amount = (Decimal(overtime_hours) * overtime_rate * hourly_salary).quantize(Decimal("0.01"))
+
+            # Bonus
+            bonus_amount = Decimal(bonus_map.get(emp.id, Decimal("0"))).quantize(Decimal("0.01"))
+
+            total = (salary + bonus_amount + overtime_amount).quantize(Decimal("0.01"))
+
+            # Tax is calculated from TOTAL (prepaid does not reduce tax base)
+            tax_amount = calculate_progressive_tax(total)
+
+            # Prepaid sum (manual)
+            prepaid_amount = Decimal(prepaid_map.get(emp.id, Decimal("0"))).quantize(Decimal("0.01"))
+
+            amount_to_pay = (total - tax_amount - prepaid_amount).quantize(Decimal("0.01"))
+
+            lines.append(PayrollLine(
+                run=run,
+                year=jy,
+                month=jm,
+                employee=emp,
+                department_id=emp.department_id,
+                base_salary=base_salary,
+                attendance_deduction=attendance_deduction,
+                salary=salary,
+                bonus=bonus_amount,
+                overtime=overtime_amount,
+                total=total,
+                tax=tax_amount,
+                prepaid=prepaid_amount,
+                amount_to_pay=amount_to_pay,
+                leave_days=leave_map.get(emp.id, Decimal("0")),
+            ))
+        span.rows = len(lines)
+
+    if scope:
+        # partial: upsert the subset into the live generation; locking the run row
+        # keeps a concurrent swap from moving the version underneath us
+        with profiler.span("write_lines") as span, transaction.atomic():
+            run.version = PayrollRun.objects.select_for_update().filter(pk=run.pk).values_list("version", flat=True).get()
+            # also drops lines of employees in scope who are no longer WORKING
+            replaced = run.active_lines().filter(**related_scope)
+            old_values = ytd.line_values(replaced)
+            old_leave = line_leave_days(replaced)
+            replaced.delete()
+            for line in lines:
+                line.generation = run.version
+            PayrollLine.objects.bulk_create(lines, batch_size=1000)
+            ytd.apply_delta(run.year, old_values, ytd.unsaved_values(lines))
+            apply_leave_delta(jy, old_leave, leave_map, auto_leave_type)
+            PayrollRun.objects.filter(pk=run.pk).update(lines_revision=F("lines_revision") + 1)
+            # recomputed after commit, outside this transaction
+            mark_stale(jy, jm)
+            refresh_later([(jy, jm)])
+            span.rows = len(lines)
+    else:
+        generation = _next_generation(run)
+        with profiler.span("write_lines") as span, transaction.atomic():
+            for line in lines:
+                line.generation = generation
+            PayrollLine.objects.bulk_create(lines, batch_size=1000)
+            span.rows = len(lines)
+
+        with profiler.span("swap") as span, transaction.atomic():
+            # a newer generation that was swapped in meanwhile wins; ours is then garbage
+            live = PayrollRun.objects.select_for_update().filter(pk=run.pk).values_list("version", flat=True).get()
+            span.rows = PayrollRun.objects.filter(pk=run.pk, version__lt=generation).update(
+                version=generation, lines_revision=F("lines_revision") + 1
+            )
+            if span.rows:
+                replaced = PayrollLine.objects.filter(run_id=run.pk, generation=live)
+                apply_leave_delta(jy, line_leave_days(replaced), leave_map, auto_leave_type)
+                ytd.apply_delta(run.year, ytd.line_values(replaced), ytd.unsaved_values(lines))
+                # recomputed after commit, outside the swap and its lock
+                mark_stale(jy, jm)
+                refresh_later([(jy, jm)])
+                run.version = generation
+            transaction.on_commit(lambda: _collect_in_background(run.pk))
+
+    run.record_profile("calculate", profiler)
+    metrics.observe("hrms_payroll_calculation_seconds", run.profile["calculate"]["wall_ms"] / 1000)
+    metrics.observe("hrms_payroll_lines_written", len(lines))
+    return profiler
+
+
+def load_entry_grid(model, jy: int, jm: int, employees) -> dict:
+    """
+    Bonus/prepaid grid cells for a month in one query: {employee_id: (entry, extra_count)}.
+    The grid edits one entry per employee (the oldest); further entries are only counted.
+    """
+    cells = {}
+    for entry in model.objects.filter(year=jy, month=jm, employee__in=employees).order_by("id"):
+        if entry.employee_id in cells:
+            first, extra = cells[entry.employee_id]
+            cells[entry.employee_id] = (first, extra + 1)
+        else:
+            cells[entry.employee_id] = (entry, 0)
+    return cells
+
+
+@transaction.atomic
+def save_entry_grid(model, jy: int, jm: int, employees, posted: dict) -> dict[str, int]:
+    """
+    Apply grid input {employee_id: (entry_id or None, amount or None, note)} with one
+    delete, one bulk update and one bulk insert. Cells without an id match an existing entry
+    on (employee, note), so a resubmitted form does not duplicate bonuses; PrepaidEntry rows
+    are upserted on their unique key (employee, year, month, note).
+    """
+    existing = {
+        entry.id: entry
+        for entry in model.objects.filter(year=jy, month=jm, employee__in=employees)
+        .only("id", "employee_id", "amount", "note")
+    }
+    by_note = {(entry.employee_id, entry.note): entry for entry in existing.values()}
+    unique_note = model is PrepaidEntry
+
+    to_delete, to_update, to_create = [], [], []
+    for emp_id, (entry_id, amount, note) in posted.items():
+        entry = existing.get(entry_id)
+        if entry is not None and entry.employee_id != emp_id:
+            entry = None  # a stale or forged id never touches another employee's entry
+        if entry is None:
+            entry = by_note.get((emp_id, note))  # same rule as the importer: (employee, note) is the entry
+
+        if amount is None:
+            if entry is not None:
+                to_delete.append(entry.id)
+            continue
+
+        if entry is None:
+            to_create.append(model(employee_id=emp_id, year=jy, month=jm, amount=amount, note=note))
+        elif unique_note and entry.note != note:
+            # the key changes: drop the old row, upsert the new key
+            to_delete.append(entry.id)
+            to_create.append(model(employee_id=emp_id, year=jy, month=jm, amount=amount, note=note))
+        elif entry.amount != amount or entry.note != note:
+            entry.amount, entry.note = amount, note
+            to_update.append(entry)
+
+    model.objects.filter(id__in=to_delete).delete()
+    model.objects.bulk_update(to_update, ["amount", "note"], batch_size=1000)
+    if unique_note:
+        model.objects.bulk_create(
+            to_create,
+            update_conflicts=True,
+            unique_fields=["employee", "year", "month", "note"],
+            update_fields=["amount"],
+            batch_size=1000,
+        )
+    else:
+        model.objects.bulk_create(to_create, batch_size=1000)
+
+    return {"created": len(to_create), "updated": len(to_update), "deleted": len(to_delete)}
@@ -0,0 +1,19 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from core.rollups import mark_stale
+
+from .models import PayrollRun
+from . import ytd
+from .services import apply_leave_delta, line_leave_days
+
+
+@receiver(pre_delete, sender=PayrollRun)
+def remove_run_from_ytd(sender, instance: PayrollRun, **kwargs):
+    """
+    Deleting a run cascades to its lines; take its active lines out of the
+    year-to-date rows and give back the leave they deducted first.
+    """
+    ytd.apply_delta(instance.year, ytd.line_values(instance.active_lines()), {})
+    apply_leave_delta(instance.year, line_leave_days(instance.active_lines()), {})
+    mark_stale(instance.year, instance.month)
@@ -1,3 +1,549 @@
-from django.test import TestCase
+import datetime as dt
+import hashlib
+import io
+import tempfile
+import zipfile
+from pathlib import Path
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from openpyxl import load_workbook
+
+from attendance.models import AttendanceDay
+from core.report_catalog import REPORTS
+from core.reports import build_query, iter_rows
+from core.models import DepartmentMonthRollup, Holiday, RollupMonth
+from core.jalali import JALALI_MONTHS_DARI, jalali_month_range
+from employees.models import Employee
+from leaves.models import LeaveType, LeaveYearBalance
+from org.models import Department, Position
+
+from . import closing, payslips
+from .annual import build_annual_xlsx, header_row
+from .bank import BankFileError, control, write_bank_files
+from .closing import close_month
+from .imports import import_bonuses
+from .reporting import grouped_rows, report_lines, report_order, run_totals
+from .models import BonusEntry, MonthClose, PayrollLine, PayrollRun, PayrollYtd, PrepaidEntry
+from .services import PayrollCalendarError, calculate_payroll, load_entry_grid, save_entry_grid
+from .variance import CHANGED, DEPARTED, NEW, SAME, summarize, variance_rows
+from .ytd import YTD_FIELDS, rebuild_ytd
+
+
+def make_employees(count: int, department: Department) -> list[Employee]:
+    position = Position.objects.create(department=department, name="Clerk")
+    return [
+        Employee.objects.create(
+            first_name=f"E{i:03d}", father_name="F", department=department, position=position,
+            employee_type=Employee.EmployeeType.PERMANENT, base_salary=Decimal("30000"),
+            date_hired=dt.date(2020, 1, 1),
+        )
+        for i in range(count)
+    ]
+
+
+def absent(employee: Employee, jy: int, jm: int, days: int):
+    g_start = jalali_month_range(jy, jm).g_start
+    dates = [g_start + dt.timedelta(days=i) for i in range(10) if (g_start + dt.timedelta(days=i)).weekday() != 4]
+    AttendanceDay.objects.bulk_create(
+        [AttendanceDay(employee=employee, date=d, status=AttendanceDay.Status.ABSENT) for d in dates[:days]]
+    )
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class LeaveDeductionTests(TestCase):
+    def setUp(self):
+        self.leave_type = LeaveType.objects.create(
+            name="Annual", yearly_limit_days=20, is_paid=True, auto_cover_absence=True,
+        )
+        self.department = Department.objects.create(name="Ops")
+        self.employees = make_employees(3, self.department)
+        self.employee = self.employees[0]
+        absent(self.employee, 1404, 2, 2)
+        self.run = PayrollRun.objects.create(year=1404, month=2)
+
+    def remaining(self) -> Decimal:
+        return LeaveYearBalance.objects.get(employee=self.employee, year=1404).remaining_days
+
+    def test_recalculation_does_not_deduct_again(self):
+        for _ in range(3):
+            calculate_payroll(self.run)
+            self.assertEqual(self.remaining(), Decimal("18"))
+        calculate_payroll(self.run, employee_ids=[self.employee.id])
+        calculate_payroll(self.run, department_ids=[self.department.id])
+        self.assertEqual(self.remaining(), Decimal("18"))
+
+    def test_changed_absences_move_the_balance_by_the_difference(self):
+        calculate_payroll(self.run)
+        AttendanceDay.objects.filter(employee=self.employee).first().delete()
+        calculate_payroll(self.run, employee_ids=[self.employee.id])
+        self.assertEqual(self.remaining(), Decimal("19"))
+
+    def test_removed_lines_give_the_days_back(self):
+        calculate_payroll(self.run)
+        self.employee.status = Employee.Status.RESIGNED
+        self.employee.save()
+        calculate_payroll(self.run, employee_ids=[self.employee.id])
+        self.assertEqual(self.remaining(), Decimal("20"))
+
+        self.employee.status = Employee.Status.WORKING
+        self.employee.save()
+        calculate_payroll(self.run)
+        self.run.delete()
+        self.assertEqual(self.remaining(), Decimal("20"))
+
+    def test_month_close_after_calculation_does_not_deduct_again(self):
+        calculate_payroll(self.run)
+        with override_settings(PAYROLL_ARCHIVE_DIR=tempfile.mkdtemp()):
+            close = close_month(self.run, chunk_size=2)
+        self.assertEqual(close.stage, MonthClose.Stage.DONE)
+        self.assertEqual(self.remaining(), Decimal("18"))
+
+    def test_resumed_month_close_does_not_deduct_again(self):
+        calculate_chunk = closing._calculate_chunk
+
+        def crash_on_second_chunk(close, chunk):
+            if chunk.number == 1:
+                raise RuntimeError("crash")
+            return calculate_chunk(close, chunk)
+
+        with override_settings(PAYROLL_ARCHIVE_DIR=tempfile.mkdtemp()):
+            with mock.patch.dict(closing.CHUNK_WORK, {MonthClose.Stage.CALCULATE: crash_on_second_chunk}):
+                with self.assertRaises(RuntimeError):
+                    close_month(self.run, chunk_size=2)
+            self.assertEqual(self.remaining(), Decimal("18"))
+            close_month(self.run)
+        self.assertEqual(self.remaining(), Decimal("18"))
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class MonthCloseTests(TestCase):
+    def setUp(self):
+        self.ops = Department.objects.create(name="Ops")
+        self.employees = make_employees(3, self.ops)
+        self.run = PayrollRun.objects.create(year=1404, month=2)
+
+    def test_chunks_are_calculated_outside_the_pipeline_transaction(self):
+        depths = []
+        calculate = closing.calculate_payroll
+
+        def calculate_and_record(run, **scope):
+            depths.append(len(connection.atomic_blocks))
+            return calculate(run, **scope)
+
+        outside = len(connection.atomic_blocks)
+        with override_settings(PAYROLL_ARCHIVE_DIR=tempfile.mkdtemp()):
+            with mock.patch.object(closing, "calculate_payroll", calculate_and_record):
+                close_month(self.run, chunk_size=2)
+        self.assertEqual(depths, [outside, outside])
+        self.assertEqual(self.run.active_lines().count(), 3)
+
+    def test_resumed_export_uses_the_line_department(self):
+        def crash(close, chunk):
+            raise RuntimeError("crash")
+
+        with override_settings(PAYROLL_ARCHIVE_DIR=tempfile.mkdtemp()):
+            with mock.patch.dict(closing.CHUNK_WORK, {MonthClose.Stage.EXPORT: crash}):
+                with self.assertRaises(RuntimeError):
+                    close_month(self.run, chunk_size=10)
+            moved = self.employees[0]
+            moved.department = Department.objects.create(name="Sales")
+            moved.save()
+            close_month(self.run)
+            with zipfile.ZipFile(closing.archive_dir(self.run).with_suffix(".zip")) as zf:
+                rows = zf.read("part-0000.csv").decode().splitlines()[1:]
+        self.assertEqual({row.split(",")[3] for row in rows}, {"Ops"})
+
+
+class AmountImportTests(TestCase):
+    def test_non_finite_amounts_are_rejected(self):
+        employee = make_employees(1, Department.objects.create(name="Ops"))[0]
+        fh = io.BytesIO(
+            f"Employee ID,Amount,Note\n{employee.id},1500,Eid\n{employee.id},NaN,\n{employee.id},-Infinity,\n".encode()
+        )
+        result = import_bonuses(fh, "bonuses.csv", 1404, 2)
+        self.assertEqual(
+            result.errors,
+            [(3, "amount 'NaN' is not a number"), (4, "amount '-Infinity' is not a number")],
+        )
+        self.assertFalse(BonusEntry.objects.exists())
+
+
+class EntryGridTests(TestCase):
+    def setUp(self):
+        self.employees = make_employees(3, Department.objects.create(name="Ops"))
+        self.a, self.b, self.c = (e.id for e in self.employees)
+
+    def entries(self, model):
+        return sorted(model.objects.filter(year=1404, month=2).values_list("employee_id", "amount", "note"))
+
+    def test_bonus_grid_diff(self):
+        kept = BonusEntry.objects.create(employee_id=self.a, year=1404, month=2, amount=100, note="Eid")
+        dropped = BonusEntry.objects.create(employee_id=self.b, year=1404, month=2, amount=200)
+        BonusEntry.objects.create(employee_id=self.b, year=1404, month=2, amount=50, note="second")
+
+        cells = load_entry_grid(BonusEntry, 1404, 2, self.employees)
+        self.assertEqual((cells[self.a][0], cells[self.b]), (kept, (dropped, 1)))
+
+        posted = {
+            self.a: (kept.id, Decimal("150"), "Eid"),
+            self.b: (dropped.id, None, ""),
+            self.c: (None, Decimal("75"), ""),
+        }
+        self.assertEqual(
+            save_entry_grid(BonusEntry, 1404, 2, self.employees, posted), {"created": 1, "updated": 1, "deleted": 1}
+        )
+        expected = [(self.a, Decimal("150.00"), "Eid"), (self.b, Decimal("50.00"), "second"), (self.c, Decimal("75.00"), "")]
+        self.assertEqual(self.entries(BonusEntry), expected)
+
+        # a resubmitted form (no ids) and a forged id of another employee change nothing
+        posted = {self.a: (None, Decimal("150"), "Eid"), self.c: (kept.id, Decimal("75"), "")}
+        self.assertEqual(
+            save_entry_grid(BonusEntry, 1404, 2, self.employees, posted), {"created": 0, "updated": 0, "deleted": 0}
+        )
+        self.assertEqual(self.entries(BonusEntry), expected)
+
+    def test_prepaid_note_change_moves_the_unique_key(self):
+        entry = PrepaidEntry.objects.create(employee_id=self.a, year=1404, month=2, amount=100, note="old")
+        PrepaidEntry.objects.create(employee_id=self.a, year=1404, month=2, amount=10, note="new")
+        save_entry_grid(PrepaidEntry, 1404, 2, self.employees, {self.a: (entry.id, Decimal("300"), "new")})
+        self.assertEqual(self.entries(PrepaidEntry), [(self.a, Decimal("300.00"), "new")])
+
+    def test_queries_do_not_grow_with_the_grid(self):
+        def save(employees, amount):
+            posted = {e.id: (None, Decimal(amount), "") for e in employees}
+            with CaptureQueriesContext(connection) as queries:
+                save_entry_grid(PrepaidEntry, 1404, 2, employees, posted)
+            return len(queries)
+
+        small = save(self.employees, 10)
+        many = make_employees(40, Department.objects.create(name="Sales"))
+        self.assertEqual(save(many, 10), small)
+        self.assertEqual(save(many, 20), save(self.employees, 20))
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class ProfileTests(TestCase):
+    def setUp(self):
+        make_employees(3, Department.objects.create(name="Ops"))
+        self.run = PayrollRun.objects.create(year=1404, month=2)
+
+    def spans(self, key):
+        self.run.refresh_from_db(fields=["profile"])
+        profile = self.run.profile[key]
+        self.assertEqual(profile["queries"], sum(s["queries"] for s in profile["spans"]))
+        return {s["name"]: s for s in profile["spans"]}
+
+    def test_calculation_phases_are_stored_on_the_run(self):
+        calculate_payroll(self.run)
+        spans = self.spans("calculate")
+        self.assertEqual(list(spans), ["load_inputs", "balance_updates", "compute_tax", "write_lines", "swap"])
+        self.assertEqual(spans["write_lines"]["rows"], 3)
+        self.assertGreater(spans["load_inputs"]["queries"], 0)
+
+    def test_export_sheets_are_stored_and_shown(self):
+        calculate_payroll(self.run)
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+        self.client.get(f"/admin/payroll/payrollrun/{self.run.pk}/export/")
+        spans = self.spans("export")
+        for name in ("load_lines", "attendance_sheet", "overtime_sheet", "payroll_sheet", "format_1_sheet"):
+            self.assertEqual(spans[name]["rows"], 3)
+
+        response = self.client.get(f"/admin/payroll/payrollrun/{self.run.pk}/change/")
+        self.assertContains(response, "Last timings")
+        self.assertContains(response, "format_1_sheet")
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class WorkingDayTests(TestCase):
+    def test_department_without_working_days_is_reported(self):
+        department = Department.objects.create(name="Closed")
+        make_employees(1, department)
+        run = PayrollRun.objects.create(year=1404, month=3)
+        month = jalali_month_range(1404, 3)
+        Holiday.objects.bulk_create([
+            Holiday(date=month.g_start + dt.timedelta(days=i), name="Closed", department=department)
+            for i in range(month.days)
+        ])
+        with self.assertRaisesMessage(PayrollCalendarError, "No working days in 1404-03"):
+            calculate_payroll(run)
+        self.assertFalse(run.lines.exists())
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class DepartmentReportTests(TestCase):
+    def test_lines_stay_with_the_department_they_were_calculated_in(self):
+        ops, sales = Department.objects.create(name="Ops"), Department.objects.create(name="Sales")
+        employees = make_employees(3, ops)
+        calculate_payroll(PayrollRun.objects.create(year=1404, month=1))
+        Employee.objects.filter(pk=employees[0].pk).update(department=sales)
+        calculate_payroll(PayrollRun.objects.create(year=1404, month=2))
+
+        report = REPORTS["payroll_by_department"]
+        rows = list(iter_rows(report, build_query(report, {"jy": 1404})))
+        self.assertEqual([(row[0], row[1]) for row in rows], [(ops.pk, "Ops"), (sales.pk, "Sales")])
+        self.assertEqual([row[2] for row in rows], [5, 1])  # lines per department
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False, PAYROLL_BANK_DEBIT_ACCOUNT="AF00 1234 5678")
+class BankFileTests(TestCase):
+    def setUp(self):
+        department = Department.objects.create(name="Ops")
+        employees = make_employees(2, department)
+        Employee.objects.filter(pk=employees[0].pk).update(first_name="عبدالرزاق" * 3, bank_account="1001")
+        Employee.objects.filter(pk=employees[1].pk).update(first_name="Ahmad", bank_account="1002")
+        self.run = PayrollRun.objects.create(year=1404, month=2)
+        calculate_payroll(self.run)
+        PayrollRun.objects.filter(pk=self.run.pk).update(status=PayrollRun.Status.FINAL)
+
+    def test_fixed_width_records_are_counted_in_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            batch = write_bank_files(self.run, Path(tmp), value_date=dt.date(2025, 5, 1))
+            data = (Path(tmp) / batch.files[0].name).read_bytes()
+        records = data.split(b"\r\n")[:-1]
+        self.assertEqual([len(r) for r in records], [44, 1 + 6 + 34 + 15 + 35 + 10, 1 + 6 + 34 + 15 + 35 + 10, 40])
+        name = records[1][56:91].decode("utf-8")  # cut at a character boundary, then padded
+        self.assertTrue(name.startswith("عبدالرزاق"))
+        self.assertEqual(batch.payments, 2)
+
+    @override_settings(PAYROLL_BANK_DEBIT_ACCOUNT="")
+    def test_fixed_format_needs_the_debit_account(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaisesMessage(BankFileError, "PAYROLL_BANK_DEBIT_ACCOUNT"):
+                write_bank_files(self.run, Path(tmp))
+            self.assertEqual(write_bank_files(self.run, Path(tmp), fmt="csv").payments, 2)
+
+    def test_parts_and_control_totals(self):
+        amounts = list(self.run.active_lines().order_by("employee_id").values_list("amount_to_pay", flat=True))
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = control(write_bank_files(self.run, Path(tmp), fmt="csv", rows_per_file=1))
+            contents = {f["name"]: (Path(tmp) / f["name"]).read_bytes() for f in summary["files"]}
+        self.assertEqual(
+            [(f["name"], f["payments"], f["amount"], f["hash_total"]) for f in summary["files"]],
+            [
+                ("pay-1404-02-001.csv", 1, f"{amounts[0]:.2f}", 1001),
+                ("pay-1404-02-002.csv", 1, f"{amounts[1]:.2f}", 1002),
+            ],
+        )
+        self.assertEqual((summary["payments"], summary["amount"]), (2, f"{sum(amounts):.2f}"))
+        for f in summary["files"]:
+            self.assertEqual(f["sha256"], hashlib.sha256(contents[f["name"]]).hexdigest())
+            self.assertTrue(contents[f["name"]].endswith(f"TOTAL,1,{f['amount']},,{f['hash_total']}\r\n".encode()))
+
+    def test_account_too_long_for_the_record_is_rejected(self):
+        too_long = self.run.active_lines().order_by("employee_id").last().employee_id
+        Employee.objects.filter(pk=too_long).update(bank_account="۱" * 20)  # 40 bytes
+        with tempfile.TemporaryDirectory() as tmp:
+            batch = write_bank_files(self.run, Path(tmp))
+            self.assertEqual((batch.payments, batch.rejected), (1, [too_long]))
+            self.assertEqual(control(batch)["rejected"], {"count": 1, "employee_ids": [too_long]})
+            self.assertEqual(write_bank_files(self.run, Path(tmp), fmt="csv").payments, 2)
+
+    @override_settings(PAYROLL_BANK_DEBIT_ACCOUNT="AF00 1234 5678 9012 3456 78")
+    def test_debit_account_too_long_for_the_header(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaisesMessage(BankFileError, "20 bytes"):
+                write_bank_files(self.run, Path(tmp))
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class YtdTests(TestCase):
+    def ytd(self) -> dict:
+        return {
+            row["employee_id"]: row
+            for row in PayrollYtd.objects.filter(year=1404).values("employee_id", "months_paid", *YTD_FIELDS)
+        }
+
+    def test_deltas_match_a_rebuild_from_the_lines(self):
+        department = Department.objects.create(name="Ops")
+        employees = make_employees(3, department)
+        runs = [PayrollRun.objects.create(year=1404, month=m) for m in (1, 2)]
+        for run in runs:
+            calculate_payroll(run)
+        absent(employees[0], 1404, 2, 3)
+        calculate_payroll(runs[1], employee_ids=[employees[0].id])  # partial rework
+        Employee.objects.filter(pk=employees[1].pk).update(status=Employee.Status.RESIGNED)
+        calculate_payroll(runs[1])  # full rebuild without one employee
+
+        applied = self.ytd()
+        self.assertEqual([applied[e.id]["months_paid"] for e in employees], [2, 1, 2])
+        self.assertLess(applied[employees[0].id]["net"], applied[employees[2].id]["net"])
+        rebuild_ytd(1404)
+        self.assertEqual(applied, self.ytd())
+
+        runs[1].delete()
+        self.assertEqual({row["months_paid"] for row in self.ytd().values()}, {1})
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class PayslipTests(TestCase):
+    def setUp(self):
+        self.ops, self.sales = Department.objects.create(name="Ops"), Department.objects.create(name="Sales")
+        self.employees = make_employees(5, self.ops)
+        self.run = PayrollRun.objects.create(year=1404, month=2)
+        calculate_payroll(self.run)
+
+    def archive(self, **kwargs) -> dict[str, bytes]:
+        buffer = io.BytesIO()
+        payslips.write_payslips(self.run, buffer, **kwargs)
+        with zipfile.ZipFile(buffer) as zf:
+            return {name: zf.read(name) for name in zf.namelist()}
+
+    def test_slips_stay_in_the_department_they_were_calculated_in(self):
+        Employee.objects.filter(pk=self.employees[0].pk).update(department=self.sales)
+        names = self.archive(workers=1)
+        self.assertEqual(len(names), 5)
+        self.assertTrue(all(f"{self.ops.pk:03d}-Ops/" in name for name in names))
+
+    def test_pool_writes_the_same_archive_as_inline(self):
+        inline = self.archive(workers=1)
+        with mock.patch.object(payslips, "CHUNK_SIZE", 2), mock.patch.object(payslips, "POOL_STARTUP_SECONDS", 0):
+            with mock.patch.object(payslips, "ProcessPoolExecutor", wraps=payslips.ProcessPoolExecutor) as pool:
+                pooled = self.archive(workers=2)
+        pool.assert_called_once()
+        self.assertEqual(pooled, inline)
+        self.assertEqual(self.archive(workers=1, layout="department"), self.archive(workers=2, layout="department"))
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class RunTotalsTests(TestCase):
+    def test_a_transfer_does_not_regroup_a_calculated_run(self):
+        ops, sales = Department.objects.create(name="Ops"), Department.objects.create(name="Sales")
+        employees = make_employees(3, ops)
+        run = PayrollRun.objects.create(year=1404, month=2)
+        calculate_payroll(run)
+        run.refresh_from_db()
+        PayrollRun.objects.filter(pk=run.pk).update(totals={"revision": run.lines_revision, "departments": {}})
+        Employee.objects.filter(pk=employees[0].pk).update(department=sales)
+
+        totals = run_totals(run)  # the cached totals above predate the line-department grouping
+        self.assertEqual(list(totals["departments"]), [ops.pk])
+        self.assertEqual(totals["departments"][ops.pk]["lines"], 3)
+        self.assertEqual(totals["departments"][ops.pk]["total"], totals["grand"]["total"])
+
+        lines = report_lines(run).order_by(*report_order("name"))
+        rows = list(grouped_rows(lines, totals["departments"]))
+        self.assertEqual([kind for kind, _ in rows], ["department", "line", "line", "line"])
+        self.assertEqual(rows[0][1]["name"], "Ops")
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class LineBrowserTests(TestCase):
+    def test_department_filter_uses_the_line_department(self):
+        ops, sales = Department.objects.create(name="Ops"), Department.objects.create(name="Sales")
+        employees = make_employees(3, ops)
+        run = PayrollRun.objects.create(year=1404, month=2)
+        calculate_payroll(run)
+        Employee.objects.filter(pk=employees[0].pk).update(department=sales)
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "x"))
+
+        url = f"/admin/payroll/payrollrun/{run.pk}/lines/"
+        self.assertEqual(self.client.get(url, {"department": ops.pk}).context["totals"]["lines"], 3)
+        self.assertEqual(self.client.get(url, {"department": sales.pk}).context["totals"]["lines"], 0)
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class VarianceTests(TestCase):
+    def test_kinds_flags_and_departments(self):
+        ops, sales = Department.objects.create(name="Ops"), Department.objects.create(name="Sales")
+        same, changed, departed = make_employees(3, ops)
+        previous = PayrollRun.objects.create(year=1404, month=1)
+        calculate_payroll(previous)
+
+        new = make_employees(1, sales)[0]
+        absent(changed, 1404, 2, 4)
+        Employee.objects.filter(pk=departed.pk).update(status=Employee.Status.RESIGNED, department=sales)
+        Employee.objects.filter(pk=same.pk).update(department=sales)
+        run = PayrollRun.objects.create(year=1404, month=2)
+        calculate_payroll(run)
+        Employee.objects.filter(pk=changed.pk).update(department=sales)  # after the run: keeps Ops
+
+        rows = {row.employee_id: row for row in variance_rows(run, previous, changed_only=False)}
+        self.assertEqual(
+            {e.pk: (rows[e.pk].kind, rows[e.pk].flagged, rows[e.pk].department) for e in (same, changed, departed, new)},
+            {
+                same.pk: (SAME, False, "Sales"),
+                changed.pk: (CHANGED, True, "Ops"),
+                departed.pk: (DEPARTED, True, "Ops"),
+                new.pk: (NEW, True, "Sales"),
+            },
+        )
+        self.assertLess(rows[changed.pk].delta["amount_to_pay"], 0)
+        self.assertLess(rows[changed.pk].pct["amount_to_pay"], -10)
+
+        quiet = variance_rows(run, previous, threshold_pct=Decimal("50"))
+        self.assertEqual({row.employee_id for row in quiet}, {changed.pk, departed.pk, new.pk})
+        self.assertFalse(next(r for r in quiet if r.employee_id == changed.pk).flagged)
+        self.assertEqual(summarize(quiet)["counts"], {NEW: 1, DEPARTED: 1, CHANGED: 1, SAME: 0, "flagged": 2})
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False)
+class AnnualPivotTests(TestCase):
+    def test_months_subtotals_and_a_transfer(self):
+        ops, sales = Department.objects.create(name="Ops"), Department.objects.create(name="Sales")
+        employees = make_employees(3, ops)
+        calculate_payroll(PayrollRun.objects.create(year=1404, month=1))
+        Employee.objects.filter(pk=employees[0].pk).update(department=sales)
+        calculate_payroll(PayrollRun.objects.create(year=1404, month=2))
+
+        buffer = io.BytesIO()
+        build_annual_xlsx(1404).save(buffer)
+        rows = list(load_workbook(buffer, read_only=True).active.values)
+        header = header_row()
+        self.assertEqual(list(rows[0]), header)
+        self.assertEqual(
+            [(r[0], r[3]) for r in rows[1:]],
+            [
+                (employees[0].pk, "Ops"), (employees[1].pk, "Ops"), (employees[2].pk, "Ops"), ("Subtotal Ops", None),
+                (employees[0].pk, "Sales"), ("Subtotal Sales", None),
+                ("TOTALS", None),
+            ],
+        )
+
+        net = header.index("Year Net")
+        net_by_department = dict(
+            PayrollLine.objects.values_list("department__name").annotate(net=Sum("amount_to_pay")).order_by()
+        )
+        self.assertAlmostEqual(rows[4][net], float(net_by_department["Ops"]), places=2)
+        self.assertAlmostEqual(rows[6][net], float(net_by_department["Sales"]), places=2)
+        self.assertAlmostEqual(rows[7][net], float(sum(net_by_department.values())), places=2)
+
+        moved = rows[1]  # paid in Ops for the first month only
+        first_net, second_net = (header.index(f"{JALALI_MONTHS_DARI[m]} Net") for m in (1, 2))
+        self.assertIsNotNone(moved[first_net])
+        self.assertIsNone(moved[second_net])
+        self.assertIsNotNone(rows[5][second_net])
+
+
+@override_settings(PAYROLL_GC_IN_BACKGROUND=False, ROLLUPS_REFRESH_IN_BACKGROUND=False)
+class RollupRefreshTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(name="Ops")
+        self.employees = make_employees(2, self.department)
+        self.run = PayrollRun.objects.create(year=1404, month=2)
+
+    def rollup(self):
+        return DepartmentMonthRollup.objects.get(department=self.department, year=1404, month=2)
+
+    def calculate(self, **scope):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            calculate_payroll(self.run, **scope)
+        self.assertTrue(RollupMonth.objects.get(year=1404, month=2).stale)
+        for callback in callbacks:
+            callback()
+        self.assertFalse(RollupMonth.objects.get(year=1404, month=2).stale)
+
+    def test_swap_refreshes_the_month_after_commit(self):
+        self.calculate()
+        self.assertEqual(self.rollup().headcount, 2)
+        self.assertEqual(self.rollup().payroll_cost, self.run.active_lines().aggregate(t=Sum("total"))["t"])
+
+    def test_partial_calculation_refreshes_after_commit(self):
+        self.calculate()
+        self.calculate(employee_ids=[self.employees[0].id])
+        self.assertEqual(self.rollup().headcount, 2)
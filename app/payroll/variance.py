@@ -0,0 +1,160 @@
+"""
+Month-over-month variance between the active lines of two payroll runs.
+
+One SQL statement joins the lines of both runs on employee (over the union of their
+employee ids, so new and departed employees are included without FULL OUTER JOIN),
+computes per-field deltas, percentage changes, the kind of change and the
+threshold flag, and sorts by the chosen variance measure; Python only converts types.
+A row's department is the one its current line was calculated in (the previous
+line's for a departed employee), not the employee's department today.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import connection
+
+from employees.models import Employee
+from org.models import Department
+
+from .models import PayrollLine, PayrollRun
+from .reporting import TOTAL_FIELDS
+
+NEW, DEPARTED, CHANGED, SAME = "NEW", "DEPARTED", "CHANGED", "SAME"
+SORTS = {
+    "variance": "ABS(v.d_amount_to_pay) DESC, v.employee_id",
+    "pct": "ABS(v.p_amount_to_pay) DESC NULLS LAST, v.employee_id",
+    "name": "v.first_name, v.father_name, v.employee_id",
+    "department": "v.department, ABS(v.d_amount_to_pay) DESC, v.employee_id",
+}
+CENT = Decimal("0.01")
+TENTH = Decimal("0.1")
+
+
+@dataclass
+class VarianceRow:
+    employee_id: int
+    first_name: str
+    father_name: str
+    department: str
+    kind: str
+    flagged: bool
+    previous: dict = field(default_factory=dict)
+    current: dict = field(default_factory=dict)
+    delta: dict = field(default_factory=dict)
+    pct: dict = field(default_factory=dict)
+
+
+def previous_run(run: PayrollRun) -> PayrollRun | None:
+    year, month = (run.year, run.month - 1) if run.month > 1 else (run.year - 1, 12)
+    return PayrollRun.objects.filter(year=year, month=month).first()
+
+
+def _decimal(value, step=CENT):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(step)
+
+
+def _sql(sort: str, changed_only: bool) -> str:
+    qn = connection.ops.quote_name
+    lines = qn(PayrollLine._meta.db_table)
+    employees = qn(Employee._meta.db_table)
+    departments = qn(Department._meta.db_table)
+    # the run's active generation, read in the same statement
+    active = f"generation = (SELECT version FROM {qn(PayrollRun._meta.db_table)} WHERE id = %s)"
+
+    columns = []
+    for f in TOTAL_FIELDS:
+        cur, prev = f"COALESCE(c.{qn(f)}, 0)", f"COALESCE(p.{qn(f)}, 0)"
+        columns += [
+            f"p.{qn(f)} AS prev_{f}",
+            f"c.{qn(f)} AS cur_{f}",
+            f"{cur} - {prev} AS d_{f}",
+            f"CASE WHEN p.{qn(f)} <> 0 THEN ({cur} - p.{qn(f)}) * 100.0 / p.{qn(f)} END AS p_{f}",
+        ]
+    any_change = " OR ".join(f"c.{qn(f)} <> p.{qn(f)}" for f in TOTAL_FIELDS)
+
+    return f"""
+        SELECT v.*,
+            CASE
+                WHEN v.kind IN ('{NEW}', '{DEPARTED}') THEN 1
+                WHEN ABS(v.p_amount_to_pay) >= %s THEN 1
+                WHEN %s > 0 AND ABS(v.d_amount_to_pay) >= %s THEN 1
+                ELSE 0
+            END AS flagged
+        FROM (
+            SELECT
+                ids.employee_id,
+                e.first_name, e.father_name, d.name AS department,
+                CASE
+                    WHEN p.id IS NULL THEN '{NEW}'
+                    WHEN c.id IS NULL THEN '{DEPARTED}'
+                    WHEN {any_change} THEN '{CHANGED}'
+                    ELSE '{SAME}'
+                END AS kind,
+                {", ".join(columns)}
+            FROM (
+                SELECT employee_id FROM {lines} WHERE run_id = %s AND {active}
+                UNION
+                SELECT employee_id FROM {lines} WHERE run_id = %s AND {active}
+            ) ids
+            JOIN {employees} e ON e.id = ids.employee_id
+            LEFT JOIN {lines} c ON c.employee_id = ids.employee_id AND c.run_id = %s AND c.{active}
+            LEFT JOIN {lines} p ON p.employee_id = ids.employee_id AND p.run_id = %s AND p.{active}
+            LEFT JOIN {departments} d ON d.id = COALESCE(c.department_id, p.department_id)
+        ) v
+        {"WHERE v.kind <> '" + SAME + "'" if changed_only else ""}
+        ORDER BY {SORTS[sort]}
+    """
+
+
+def variance_rows(
+    run: PayrollRun,
+    previous: PayrollRun,
+    sort: str = "variance",
+    threshold_pct: Decimal = Decimal("10"),
+    threshold_amount: Decimal = Decimal("0"),
+    changed_only: bool = True,
+) -> list[VarianceRow]:
+    """
+    Rows of `run` vs `previous`. A row is flagged when the employee is new or departed,
+    or when amount_to_pay moved by at least `threshold_pct` percent or (when set)
+    `threshold_amount`.
+    """
+    # floats: SQLite would compare a numeric column with a Decimal bound as text
+    thresholds = [float(threshold_pct), float(threshold_amount), float(threshold_amount)]
+    cur, prev = [run.pk, run.pk], [previous.pk, previous.pk]
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(sort if sort in SORTS else "variance", changed_only), [*thresholds, *cur, *prev, *cur, *prev])
+        names = [c[0] for c in cursor.description]
+        records = [dict(zip(names, r)) for r in cursor.fetchall()]
+
+    rows = []
+    for rec in records:
+        row = VarianceRow(
+            employee_id=rec["employee_id"],
+            first_name=rec["first_name"],
+            father_name=rec["father_name"],
+            department=rec["department"],
+            kind=rec["kind"],
+            flagged=bool(rec["flagged"]),
+            previous={f: _decimal(rec[f"prev_{f}"]) for f in TOTAL_FIELDS},
+            current={f: _decimal(rec[f"cur_{f}"]) for f in TOTAL_FIELDS},
+            delta={f: _decimal(rec[f"d_{f}"]) for f in TOTAL_FIELDS},
+            pct={f: _decimal(rec[f"p_{f}"], TENTH) for f in TOTAL_FIELDS},
+        )
+        rows.append(row)
+    return rows
+
+
+def summarize(rows: list[VarianceRow]) -> dict:
+    counts = {NEW: 0, DEPARTED: 0, CHANGED: 0, SAME: 0, "flagged": 0}
+    delta = {f: Decimal("0.00") for f in TOTAL_FIELDS}
+    for row in rows:
+        counts[row.kind] += 1
+        counts["flagged"] += row.flagged
+        for f in TOTAL_FIELDS:
+            delta[f] += row.delta[f]
+    return {"counts": counts, "delta": delta}
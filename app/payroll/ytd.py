@@ -0,0 +1,99 @@
+"""
+Year-to-date accumulators (PayrollYtd): one row per employee and Jalali year.
+
+Every write to the active lines of a run passes the old and the new values of the
+lines it replaces to apply_delta inside the same transaction, which adds the
+difference to the employee's row; nothing re-sums the lines of the year.
+rebuild_ytd recomputes a year from the lines (after restoring a backup, say).
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import PayrollLine, PayrollYtd
+
+# PayrollYtd field -> PayrollLine field
+YTD_FIELDS = {
+    "gross": "total",
+    "overtime": "overtime",
+    "bonus": "bonus",
+    "tax": "tax",
+    "prepaid": "prepaid",
+    "net": "amount_to_pay",
+}
+ZERO = Decimal("0.00")
+
+
+def line_values(lines) -> dict[int, dict]:
+    """
+    {employee_id: {line field: value}} of a PayrollLine queryset.
+    """
+    return {
+        row["employee_id"]: row
+        for row in lines.values("employee_id", *YTD_FIELDS.values())
+    }
+
+
+def unsaved_values(lines: list[PayrollLine]) -> dict[int, dict]:
+    """
+    Same as line_values for PayrollLine instances (e.g. the ones just bulk-created).
+    """
+    return {
+        line.employee_id: {f: getattr(line, f) for f in YTD_FIELDS.values()}
+        for line in lines
+    }
+
+
+def apply_delta(year: int, old: dict[int, dict], new: dict[int, dict]) -> int:
+    """
+    Add new - old to the employees' rows of `year`; an employee only in `new` gains
+    a paid month, one only in `old` loses it. Must run in the transaction that
+    writes the lines. Returns the number of rows changed.
+    """
+    deltas = {}
+    for emp_id in old.keys() | new.keys():
+        before, after = old.get(emp_id), new.get(emp_id)
+        delta = {
+            ytd: (after[f] if after else ZERO) - (before[f] if before else ZERO)
+            for ytd, f in YTD_FIELDS.items()
+        }
+        delta["months_paid"] = (after is not None) - (before is not None)
+        if any(delta.values()):
+            deltas[emp_id] = delta
+    if not deltas:
+        return 0
+
+    with transaction.atomic():
+        # create missing rows first so the lock below covers every employee
+        PayrollYtd.objects.bulk_create(
+            [PayrollYtd(employee_id=emp_id, year=year) for emp_id in deltas],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        rows = list(PayrollYtd.objects.select_for_update().filter(year=year, employee_id__in=deltas))
+        for row in rows:
+            for name, value in deltas[row.employee_id].items():
+                setattr(row, name, getattr(row, name) + value)
+        PayrollYtd.objects.bulk_update(rows, [*YTD_FIELDS, "months_paid"], batch_size=1000)
+    return len(rows)
+
+
+@transaction.atomic
+def rebuild_ytd(year: int) -> int:
+    """
+    Recompute the rows of `year` from the active lines of its runs.
+    """
+    totals = (
+        PayrollLine.objects.filter(run__year=year, generation=F("run__version"))
+        .values("employee_id")
+        .annotate(months_paid=Count("id"), **{ytd: Sum(f) for ytd, f in YTD_FIELDS.items()})
+        .order_by()
+    )
+    PayrollYtd.objects.filter(year=year).delete()
+    return len(PayrollYtd.objects.bulk_create(
+        [PayrollYtd(year=year, **row) for row in totals],
+        batch_size=1000,
+    ))